@@ -0,0 +1,254 @@
+'''
+    Barnes-Hut approximation of a force law between every pair of dots, in O(N log N) instead of O(N^2).
+
+    The accuracy against the exact all-pairs forces can be printed for a few opening angles, e.g.
+
+        poetry run python src/barnes_hut.py --dots 2000 --thetas 0.3 0.5 0.8
+'''
+from line import ForceLaw, SoftenedGravity
+from particle_store import ParticleStore
+from force_engine import NumpyForceEngine
+import numpy as np
+import argparse
+import math
+import random
+import time
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    '''
+        Returns the concatenation of the ranges starts[k], ..., starts[k] + lengths[k] - 1
+    '''
+    if len(lengths) == 0:
+        return np.zeros(0, dtype=np.intp)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) - np.repeat(offsets, lengths) + np.repeat(starts, lengths)
+
+
+class QuadTree:
+    '''
+        A quadtree over the positions of the dots, built level by level with NumPy. Every node holds the dots
+        order[start[node]:end[node]], its square (center_x, center_y, half of the side) and its center of mass
+        (mass_x, mass_y, mass = the number of dots, since the dots have mass = 1).
+
+        x, y:
+            the positions of the dots
+        leaf_size:
+            nodes with at most leaf_size dots are not split
+        max_depth:
+            nodes are not split below this depth, e.g. for many dots at the same position
+
+        children[node] holds the 4 child nodes (-1 for an empty quadrant), all -1 for a leaf.
+    '''
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, leaf_size: int = 8, max_depth: int = 32):
+        count = len(x)
+        self.order = np.arange(count)
+
+        min_x, max_x = (float(x.min()), float(x.max())) if count else (0.0, 0.0)
+        min_y, max_y = (float(y.min()), float(y.max())) if count else (0.0, 0.0)
+        # a little larger than the dots, so the dots on the edges are inside
+        half = max(max_x - min_x, max_y - min_y) / 2 * 1.001 + 1e-9
+
+        start, end = [np.array([0])], [np.array([count])]
+        center_x, center_y = [np.array([(min_x + max_x) / 2])], [np.array([(min_y + max_y) / 2])]
+        halves, children = [np.array([half])], [np.full((1, 4), -1)]
+        node_count = 1
+
+        frontier = np.array([0])
+        depth = 0
+        while len(frontier) and depth < max_depth:
+            level_start = np.concatenate(start)
+            level_end = np.concatenate(end)
+            all_x, all_y = np.concatenate(center_x), np.concatenate(center_y)
+            all_half = np.concatenate(halves)
+
+            split = frontier[level_end[frontier] - level_start[frontier] > leaf_size]
+            if len(split) == 0:
+                break
+
+            # the positions in order of the dots of the split nodes, node by node
+            lengths = level_end[split] - level_start[split]
+            segment = np.repeat(np.arange(len(split)), lengths)
+            positions = _ranges(level_start[split], lengths)
+
+            # sorts the dots of each node by quadrant: 0 bottom left, 1 bottom right, 2 top left, 3 top right
+            dots = self.order[positions]
+            node = split[segment]
+            quadrant = (x[dots] >= all_x[node]).astype(np.intp) + 2 * (y[dots] >= all_y[node])
+            key = segment * 4 + quadrant
+            self.order[positions] = dots[np.argsort(key, kind='stable')]
+
+            quadrant_counts = np.bincount(key, minlength=4 * len(split)).reshape(-1, 4)
+            quadrant_start = level_start[split][:, None] + np.cumsum(quadrant_counts, axis=1) - quadrant_counts
+
+            parent, child_quadrant = np.nonzero(quadrant_counts)
+            new = node_count + np.arange(len(parent))
+            node_count += len(parent)
+
+            level_children = np.concatenate(children)
+            level_children[split[parent], child_quadrant] = new
+            children = [level_children, np.full((len(new), 4), -1)]
+
+            child_half = all_half[split[parent]] / 2
+            start.append(quadrant_start[parent, child_quadrant])
+            end.append(start[-1] + quadrant_counts[parent, child_quadrant])
+            center_x.append(all_x[split[parent]] + np.where(child_quadrant % 2 == 1, child_half, -child_half))
+            center_y.append(all_y[split[parent]] + np.where(child_quadrant >= 2, child_half, -child_half))
+            halves.append(child_half)
+
+            frontier = new
+            depth += 1
+
+        self.start = np.concatenate(start)
+        self.end = np.concatenate(end)
+        self.center_x = np.concatenate(center_x)
+        self.center_y = np.concatenate(center_y)
+        self.half = np.concatenate(halves)
+        self.children = np.concatenate(children)
+        self.leaf = np.all(self.children < 0, axis=1)
+
+        # the center of mass of every node from prefix sums over its contiguous dots
+        sum_x = np.concatenate(([0.0], np.cumsum(x[self.order])))
+        sum_y = np.concatenate(([0.0], np.cumsum(y[self.order])))
+        self.mass = (self.end - self.start).astype(np.float64)
+        mass = np.maximum(self.mass, 1)
+        self.mass_x = (sum_x[self.end] - sum_x[self.start]) / mass
+        self.mass_y = (sum_y[self.end] - sum_y[self.start]) / mass
+
+
+class BarnesHutForceEngine:
+    '''
+        Applies a force law between all the pairs of dots with the Barnes-Hut approximation: a node of a QuadTree
+        far enough from a dot (side / distance < theta) acts on it as one dot of mass = its number of dots at its
+        center of mass. Nearer nodes are opened, and the dots of the leaves are handled exactly.
+
+        force_law:
+            a long-range ForceLaw (without max_distance) like SoftenedGravity. The force of a node on a dot is the
+            force at the distance of its center of mass, which is wrong for a law with a cutoff or a sign change
+        theta:
+            the opening angle. 0 gives the exact forces, larger values are faster and less accurate
+        leaf_size:
+            see QuadTree
+
+        Each dot is walked down the tree on its own (there is no reaction force), all the dots at once level by
+        level with NumPy. The interface is the one of NumpyForceEngine.
+    '''
+
+    def __init__(self, force_law: ForceLaw, theta: float = 0.5, leaf_size: int = 8):
+        if not math.isinf(force_law.max_distance):
+            raise ValueError('The Barnes-Hut approximation needs a long-range force law, without max_distance')
+        self.force_law = force_law
+        self.theta = theta
+        self.leaf_size = leaf_size
+        # the number of interactions (with nodes or dots) at the last apply
+        self.active_pairs = 0
+
+    def _add(self, store: ParticleStore, dots: np.ndarray, target_x: np.ndarray, target_y: np.ndarray,
+             mass: np.ndarray):
+        '''
+            Protected method to add the force of a mass at each target to each dot
+        '''
+        delta_x = target_x - store.x[dots]
+        delta_y = target_y - store.y[dots]
+        distance = np.hypot(delta_x, delta_y)
+        apart = distance > 0
+        dots, delta_x, delta_y = dots[apart], delta_x[apart], delta_y[apart]
+        distance, mass = distance[apart], mass[apart]
+
+        strength = mass * self.force_law.calculate_many(distance) / distance
+        count = store.count
+        store.fx += np.bincount(dots, weights=strength * delta_x, minlength=count)
+        store.fy += np.bincount(dots, weights=strength * delta_y, minlength=count)
+        self.active_pairs += len(dots)
+
+    def apply(self, store: ParticleStore):
+        '''
+            Adds the forces between the dots to store.fx and store.fy
+        '''
+        self.active_pairs = 0
+        if store.count < 2:
+            return
+        x, y = store.x, store.y
+        tree = QuadTree(x, y, self.leaf_size)
+
+        # the (dot, node) pairs still to look at
+        dots = np.arange(store.count)
+        nodes = np.zeros(store.count, dtype=np.intp)
+        while len(dots):
+            distance = np.hypot(tree.mass_x[nodes] - x[dots], tree.mass_y[nodes] - y[dots])
+            inside = ((np.abs(x[dots] - tree.center_x[nodes]) <= tree.half[nodes]) &
+                      (np.abs(y[dots] - tree.center_y[nodes]) <= tree.half[nodes]))
+            far = ~inside & (2 * tree.half[nodes] < self.theta * distance)
+            leaf = ~far & tree.leaf[nodes]
+            opened = ~far & ~leaf
+
+            # far nodes act as one mass at their center of mass
+            self._add(store, dots[far], tree.mass_x[nodes[far]], tree.mass_y[nodes[far]], tree.mass[nodes[far]])
+
+            # the dots of the leaves act one by one (a dot at distance 0, e.g. the dot itself, is skipped)
+            leaf_dots, leaf_nodes = dots[leaf], nodes[leaf]
+            lengths = tree.end[leaf_nodes] - tree.start[leaf_nodes]
+            sources = tree.order[_ranges(tree.start[leaf_nodes], lengths)]
+            targets = np.repeat(leaf_dots, lengths)
+            self._add(store, targets, x[sources], y[sources], np.ones(len(sources)))
+
+            # the other nodes are replaced by their children
+            children = tree.children[nodes[opened]]
+            dots = np.repeat(dots[opened], 4)[children.ravel() >= 0]
+            nodes = children.ravel()[children.ravel() >= 0]
+
+
+def accuracy_report(store: ParticleStore, force_law: ForceLaw, thetas: tuple = (0.3, 0.5, 0.8, 1.0)) -> list:
+    '''
+        Compares the Barnes-Hut forces to the exact all-pairs forces (NumpyForceEngine without a grid, which needs
+        O(N^2) memory) on the dots of store, for every theta
+
+        Returns one dictionary per theta with the median and max error relative to the largest exact force, the
+        number of interactions (against N(N-1) for the exact forces) and the seconds both engines took
+    '''
+    def forces(engine) -> tuple:
+        store.clear_forces()
+        begin = time.perf_counter()
+        engine.apply(store)
+        seconds = time.perf_counter() - begin
+        result = np.hypot(store.fx, store.fy), store.fx.copy(), store.fy.copy(), seconds
+        store.clear_forces()
+        return result
+
+    magnitude, exact_x, exact_y, exact_seconds = forces(NumpyForceEngine(force_law))
+    scale = max(float(magnitude.max()), 1e-300)
+
+    rows = []
+    for theta in thetas:
+        engine = BarnesHutForceEngine(force_law, theta=theta)
+        _, force_x, force_y, seconds = forces(engine)
+        error = np.hypot(force_x - exact_x, force_y - exact_y) / scale
+        rows.append({'theta': theta, 'median_error': float(np.median(error)), 'max_error': float(error.max()),
+                     'interactions': engine.active_pairs, 'seconds': seconds, 'exact_seconds': exact_seconds})
+    return rows
+
+
+def main(arguments: list = None):
+    parser = argparse.ArgumentParser(description='Accuracy of the Barnes-Hut forces against the exact forces')
+    parser.add_argument('--dots', type=int, default=2000, help='number of dots')
+    parser.add_argument('--thetas', type=float, nargs='+', default=[0.3, 0.5, 0.8, 1.0], help='opening angles')
+    parser.add_argument('--width', type=float, default=1920, help='width of the area of the dots')
+    parser.add_argument('--height', type=float, default=1080, help='height of the area of the dots')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random dots')
+    args = parser.parse_args(arguments)
+
+    rng = random.Random(args.seed)
+    store = ParticleStore(capacity=args.dots)
+    for _ in range(args.dots):
+        store.add(rng.random() * args.width, rng.random() * args.height, 0.0, 0.0, 1.0)
+
+    print(f'{args.dots} dots, {args.dots * (args.dots - 1)} exact interactions')
+    for row in accuracy_report(store, SoftenedGravity(strength=2000, softening=30), tuple(args.thetas)):
+        print(f'theta {row["theta"]:.2f}: median error {row["median_error"]:.2e}, max error {row["max_error"]:.2e}, '
+              f'{row["interactions"]} interactions, {row["seconds"] * 1000:.1f} ms '
+              f'(exact {row["exact_seconds"] * 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
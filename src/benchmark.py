@@ -0,0 +1,234 @@
+'''
+    Reproducible benchmarks of the physics step (Simulation.step, which is what App.update_state runs) and of the
+    line draw update (App.update_line_draw_objects, with the batched LineRenderer and with one shape per line), e.g.
+
+        poetry run python src/benchmark.py run --output benchmark.json
+        poetry run python src/benchmark.py compare old.json benchmark.json --threshold 0.1
+
+    The dots are created from a fixed seed, so two runs time the same simulation. compare exits with status 1
+    when a benchmark got slower by more than the threshold.
+'''
+from simulation import create_simulation
+from numba_backend import NUMBA_AVAILABLE
+from config import DEFAULT_SCENARIO
+import numpy as np
+import argparse
+import json
+import platform
+import sys
+import time
+
+DEFAULT_SIZES = (100, 1000, 5000, 20000)
+
+# the ways App can draw the lines, see create_and_bind_app
+LINE_RENDERERS = ('batched', 'shapes')
+
+# (force_engine, physics_backend) of each backend that can run the physics step
+BACKENDS = {
+    'lines': ('lines', 'python'),
+    'numpy': ('numpy', 'python'),
+    'numba': ('numpy', 'numba'),
+    'parallel': ('numpy', 'parallel'),
+}
+
+
+def time_steps(function, steps: int, warmup: int = 1, setup=None) -> dict:
+    '''
+        Calls function steps times after warmup untimed calls (e.g. for the numba compilation)
+
+        setup: an optional function called (untimed) before each call, e.g. to step the simulation before the
+            lines are drawn
+
+        Returns the median, min and mean seconds per call
+    '''
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        function()
+
+    times = []
+    for _ in range(steps):
+        if setup is not None:
+            setup()
+        begin = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - begin)
+
+    return {'median_seconds': float(np.median(times)), 'min_seconds': min(times), 'mean_seconds': float(np.mean(times))}
+
+
+def benchmark_physics(backend: str, dot_count: int, steps: int, seed: int, width: float, height: float) -> dict:
+    '''
+        Times Simulation.step for the given backend (a key of BACKENDS) and number of dots
+    '''
+    force_engine, physics_backend = BACKENDS[backend]
+    simulation = create_simulation(width, height, dot_count=dot_count, force_engine=force_engine,
+                                   physics_backend=physics_backend, seed=seed)
+    return time_steps(lambda: simulation.step(1/120), steps)
+
+
+def benchmark_line_draw(dot_count: int, steps: int, seed: int, line_renderer: str = 'batched') -> dict:
+    '''
+        Times App.update_line_draw_objects in a hidden window, after an untimed physics step. This needs a display.
+
+        line_renderer: 'batched' for a LineRenderer, 'shapes' for a pyglet.shapes.Line per line
+    '''
+    # importing pyglet.window needs a display, so this is only done when the draw benchmarks run
+    import pyglet
+    from main import App, load_dot_image
+    from line_renderer import LineRenderer
+
+    window = pyglet.window.Window(width=1000, height=800, visible=False)
+    try:
+        line_batch = pyglet.graphics.Batch()
+        dot_batch = pyglet.graphics.Batch()
+        renderer = None
+        if line_renderer == 'batched':
+            lines = DEFAULT_SCENARIO.lines
+            renderer = LineRenderer(line_batch, lines.color, lines.min_scale_length, lines.max_scale_length,
+                                    color_steps=lines.color_steps)
+        # the lines of the simulation only need a draw object when they draw themselves
+        simulation = create_simulation(window.width, window.height, dot_count=dot_count, dot_image=load_dot_image(),
+                                       dot_batch=dot_batch, line_batch=line_batch if renderer is None else None,
+                                       seed=seed)
+        app = App(None, simulation, line_batch, dot_batch, line_renderer=renderer)
+        return time_steps(app.update_line_draw_objects, steps, setup=lambda: simulation.step(1/120))
+    finally:
+        window.close()
+
+
+def _no_display(exception: Exception) -> bool:
+    '''
+        Protected function telling whether exception says that there is no display. pyglet.window cannot be imported
+        without a display, so its NoSuchDisplayException is recognized by name
+    '''
+    return type(exception).__name__ == 'NoSuchDisplayException'
+
+
+def run_benchmarks(sizes: tuple = DEFAULT_SIZES, backends: tuple = tuple(BACKENDS), steps: int = 10, seed: int = 0,
+                   max_line_dots: int = 1000, draw: bool = True, width: float = 1920, height: float = 1080,
+                   max_shape_dots: int = 5000) -> dict:
+    '''
+        Runs the physics benchmarks of every backend and the line draw benchmarks for every number of dots in sizes
+
+        max_line_dots: the 'lines' backend updates a Line for every pair of nearby dots in Python, so it is skipped
+            above this number of dots
+        draw: whether to run the line draw benchmarks, which need a display. Without a display they are recorded
+            as None
+        max_shape_dots: the 'shapes' draw benchmark creates a pyglet.shapes.Line for every pair of nearby dots, so it
+            is skipped above this number of dots. The batched one runs for every size
+
+        Returns the results as a dictionary which can be saved as JSON. A benchmark which could not run has None
+        as result.
+    '''
+    results = {}
+    display_error = None
+    for dot_count in sizes:
+        for backend in backends:
+            if backend == 'lines' and dot_count > max_line_dots:
+                continue
+            if backend in ('numba', 'parallel') and not NUMBA_AVAILABLE:
+                continue
+            name = f'physics/{backend}/{dot_count}'
+            results[name] = benchmark_physics(backend, dot_count, steps, seed, width, height)
+            print(f'{name}: {results[name]["median_seconds"] * 1000:.2f} ms')
+
+        for line_renderer in LINE_RENDERERS if draw else ():
+            if line_renderer == 'shapes' and dot_count > max_shape_dots:
+                continue
+            name = f'draw/{line_renderer}/{dot_count}'
+            if display_error is not None:
+                results[name] = None
+                continue
+            try:
+                results[name] = benchmark_line_draw(dot_count, steps, seed, line_renderer)
+                print(f'{name}: {results[name]["median_seconds"] * 1000:.2f} ms')
+            except Exception as exception:
+                if not _no_display(exception):
+                    raise
+                # the other draw benchmarks cannot run either
+                print(f'{name}: skipped ({exception})')
+                display_error = exception
+                results[name] = None
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'numba': NUMBA_AVAILABLE,
+            'seed': seed,
+            'steps': steps,
+            'width': width,
+            'height': height,
+        },
+        'results': results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list:
+    '''
+        Compares two results of run_benchmarks by the median time of the benchmarks in both
+
+        threshold: a benchmark is flagged when it is slower by more than this fraction, e.g. 0.1 for 10%
+
+        Returns a list of (name, old seconds, new seconds, flagged) tuples
+    '''
+    rows = []
+    for name, new_result in new['results'].items():
+        old_result = old['results'].get(name)
+        if old_result is None or new_result is None:
+            continue
+        old_seconds = old_result['median_seconds']
+        new_seconds = new_result['median_seconds']
+        rows.append((name, old_seconds, new_seconds, new_seconds > old_seconds * (1 + threshold)))
+    return rows
+
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks of the dots and lines physics and drawing')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='runs the benchmarks')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='numbers of dots')
+    run_parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    run_parser.add_argument('--steps', type=int, default=10, help='timed steps per benchmark')
+    run_parser.add_argument('--seed', type=int, default=0, help='seed of the random dots')
+    run_parser.add_argument('--max-line-dots', type=int, default=1000,
+                            help='skips the lines physics backend, which updates a Line for every nearby pair, above '
+                                 'this number of dots')
+    run_parser.add_argument('--max-shape-dots', type=int, default=5000,
+                            help='skips the shapes draw benchmark, which creates a shape for every nearby pair, above '
+                                 'this number of dots')
+    run_parser.add_argument('--no-draw', action='store_true', help='skips the draw benchmarks (they need a display)')
+    run_parser.add_argument('--output', default='benchmark.json', help='JSON file for the results')
+
+    compare_parser = commands.add_parser('compare', help='flags the benchmarks which got slower')
+    compare_parser.add_argument('old', help='JSON file of the reference results')
+    compare_parser.add_argument('new', help='JSON file of the new results')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, 0.1 is 10%%')
+
+    args = parser.parse_args(arguments)
+
+    if args.command == 'run':
+        results = run_benchmarks(tuple(args.sizes), tuple(args.backends), args.steps, args.seed,
+                                 args.max_line_dots, not args.no_draw, max_shape_dots=args.max_shape_dots)
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'results written to {args.output}')
+        return 0
+
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+
+    rows = compare(old, new, args.threshold)
+    for name, old_seconds, new_seconds, flagged in rows:
+        print(f'{"SLOWER " if flagged else "       "}{name}: {old_seconds * 1000:.2f} ms -> {new_seconds * 1000:.2f} ms '
+              f'({new_seconds / old_seconds:.2f}x)')
+    return 1 if any(flagged for *_, flagged in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
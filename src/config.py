@@ -0,0 +1,197 @@
+'''
+    Scenarios: the tuning of the dots, the force law, the environment and the lines, read once from a TOML file and
+    checked up front into a frozen Scenario. The classes which get these values (DotForceCalculator, LineDrawObject,
+    EnvironmentDotUpdater, ...) compute their derived constants (squared cutoffs, inverse ranges, wrap bounds) once
+    when they are created.
+
+        poetry run python src/main.py --scenario scenarios/default.toml
+        poetry run python src/sim.py --scenario scenarios/crowded.toml --steps 1000
+
+    Every value has a default (the ones of scenarios/default.toml), so a scenario file only needs the values it
+    changes, e.g.
+
+        [dots]
+        count = 2000
+
+        [force]
+        law = "gravity"
+'''
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from dataclasses import dataclass
+from line import DotForceCalculator, ForceLaw, SoftenedGravity
+import math
+
+
+def _check(condition: bool, message: str):
+    if not condition:
+        raise ValueError(message)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_integer(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+@dataclass(frozen=True)
+class DotsConfig:
+    '''
+        How the random dots are created, see DotFactory
+
+        count: the number of dots
+        min_size, max_size: the range of the radius of the dots
+        max_velocity: the range of the initial velocity of the dots
+        seed: the seed of the random dots, None for a random seed
+    '''
+    count: int = 100
+    min_size: float = 5
+    max_size: float = 10
+    max_velocity: float = 50
+    seed: int = None
+
+    def __post_init__(self):
+        _check(_is_integer(self.count) and self.count >= 0, '[dots] count must be an integer >= 0')
+        _check(_is_number(self.min_size) and _is_number(self.max_size) and 0 < self.min_size <= self.max_size,
+               '[dots] min_size and max_size must be numbers with 0 < min_size <= max_size')
+        _check(_is_number(self.max_velocity) and self.max_velocity >= 0, '[dots] max_velocity must be a number >= 0')
+        _check(self.seed is None or (_is_integer(self.seed) and self.seed >= 0), '[dots] seed must be an integer >= 0')
+
+
+@dataclass(frozen=True)
+class ForceConfig:
+    '''
+        The force law between the dots
+
+        law: 'spring' for a DotForceCalculator, 'gravity' for a SoftenedGravity
+        neutral_distance, max_distance, coefficient: the parameters of the spring, see DotForceCalculator
+        strength, softening: the parameters of the gravity, see SoftenedGravity
+    '''
+    law: str = 'spring'
+    neutral_distance: float = 75
+    max_distance: float = 150
+    coefficient: float = 0.02
+    strength: float = 2000
+    softening: float = 30
+
+    def __post_init__(self):
+        _check(self.law in ('spring', 'gravity'), '[force] law must be "spring" or "gravity"')
+        for name in ('neutral_distance', 'max_distance', 'coefficient', 'strength', 'softening'):
+            _check(_is_number(getattr(self, name)), f'[force] {name} must be a number')
+        _check(0 <= self.neutral_distance <= self.max_distance,
+               '[force] neutral_distance must be between 0 and max_distance')
+        _check(self.softening > 0, '[force] softening must be > 0')
+
+    def create_force_law(self, law: str = None) -> ForceLaw:
+        '''
+            Returns the force law of the config, or the given one ('spring' or 'gravity') with the parameters of
+            the config
+        '''
+        law = self.law if law is None else law
+        if law == 'spring':
+            return DotForceCalculator(neutral_distance=self.neutral_distance, max_distance=self.max_distance,
+                                      force_coefficient=self.coefficient)
+        if law == 'gravity':
+            return SoftenedGravity(strength=self.strength, softening=self.softening)
+        raise ValueError(f'Unknown force law: {law}')
+
+
+@dataclass(frozen=True)
+class EnvironmentConfig:
+    '''
+        The forces and the wrapping of EnvironmentDotUpdater
+
+        margin: how far a dot can go out of the window before it is wrapped around to the other side
+        mouse_force_scale, max_mouse_force: the repelling force of the mouse is mouse_force_scale / distance^2,
+            but at most max_mouse_force
+        max_speed: above this speed a force slows the dot down
+    '''
+    margin: float = 50
+    mouse_force_scale: float = 1000000
+    max_mouse_force: float = 1000
+    max_speed: float = 50
+
+    def __post_init__(self):
+        for name in ('margin', 'mouse_force_scale', 'max_mouse_force', 'max_speed'):
+            _check(_is_number(getattr(self, name)) and getattr(self, name) >= 0,
+                   f'[environment] {name} must be a number >= 0')
+
+
+@dataclass(frozen=True)
+class LinesConfig:
+    '''
+        How the lines are drawn, see LineDrawObject and AlphaTable
+
+        color: the color of the lines (R, G, B, A)
+        min_scale_length, max_scale_length: the lengths between which the lines fade out
+        color_steps: the number of quantization steps of the colors of the lines
+    '''
+    color: tuple = (255, 255, 255, 255)
+    min_scale_length: float = 10
+    max_scale_length: float = 150
+    color_steps: int = 255
+
+    def __post_init__(self):
+        _check(isinstance(self.color, (tuple, list)) and len(self.color) == 4 and
+               all(_is_integer(value) and 0 <= value <= 255 for value in self.color),
+               '[lines] color must be 4 integers from 0 to 255')
+        _check(_is_number(self.min_scale_length) and _is_number(self.max_scale_length) and
+               0 <= self.min_scale_length < self.max_scale_length,
+               '[lines] min_scale_length and max_scale_length must be numbers with 0 <= min_scale_length < '
+               'max_scale_length')
+        _check(_is_integer(self.color_steps) and self.color_steps >= 1, '[lines] color_steps must be an integer >= 1')
+        object.__setattr__(self, 'color', tuple(self.color))
+
+
+@dataclass(frozen=True)
+class Scenario:
+    '''
+        A whole scenario, one config per section of the TOML file
+    '''
+    dots: DotsConfig = DotsConfig()
+    force: ForceConfig = ForceConfig()
+    environment: EnvironmentConfig = EnvironmentConfig()
+    lines: LinesConfig = LinesConfig()
+
+
+DEFAULT_SCENARIO = Scenario()
+
+_SECTIONS = {'dots': DotsConfig, 'force': ForceConfig, 'environment': EnvironmentConfig, 'lines': LinesConfig}
+
+
+def scenario_from_dict(data: dict) -> Scenario:
+    '''
+        Returns the Scenario of the sections of a parsed TOML file. Raises a ValueError naming the first value which
+        cannot work. Unknown sections and keys are errors too, so a typo does not silently fall back to a default.
+    '''
+    configs = {}
+    for section, values in data.items():
+        _check(section in _SECTIONS, f'Unknown section [{section}]')
+        _check(isinstance(values, dict), f'[{section}] must be a table')
+        config_class = _SECTIONS[section]
+        for name in values:
+            _check(name in config_class.__dataclass_fields__, f'Unknown key {name} in [{section}]')
+        configs[section] = config_class(**values)
+    return Scenario(**configs)
+
+
+def load_scenario(path: str) -> Scenario:
+    '''
+        Reads and checks a scenario file
+
+        Returns a Scenario
+    '''
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        # tomllib is only in the standard library from Python 3.11, tomli is a dependency of the older versions
+        import tomli as tomllib
+
+    with open(path, 'rb') as file:
+        data = tomllib.load(file)
+    try:
+        return scenario_from_dict(data)
+    except ValueError as error:
+        raise ValueError(f'{path}: {error}') from None
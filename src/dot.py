@@ -1,4 +1,7 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
 from vector import TwoDimensionalVector
+from particle_store import ParticleStore, ParticleVector
 from typing import Any
 import pyglet
 import random
@@ -6,6 +9,8 @@ import random
 
 class Dot:
     '''
+        A dot is a lightweight view into a ParticleStore: its state lives in the store columns at index.
+
         position:
             The current position of the dot expressed as a TwoDimensionalVector (x, y)
         force:
@@ -16,84 +21,220 @@ class Dot:
             Radius of the dot. It is only used to decide the thickness of the line between two dots.
         sprite:
             The pyglet Sprite which is used to draw the dot.
+        store:
+            The ParticleStore holding the state of the dot. When no store is given, the dot gets a store of its own.
+        index:
+            The index of the dot in the store.
+
+        position, velocity and force are live views: writing to e.g. dot.position.x writes to the store.
     '''
 
     def __init__(self, position: TwoDimensionalVector, velocity: TwoDimensionalVector,
-                 radius: float, sprite: pyglet.sprite.Sprite):
-        self.position = position
-        self.force = TwoDimensionalVector(0.0, 0.0)  # force
-        self.velocity = velocity
-        self.radius = radius
+                 radius: float, sprite: pyglet.sprite.Sprite, store: ParticleStore = None):
+        if store is None:
+            store = ParticleStore(capacity=1)
+        self.store = store
+        self.index = store.add(position.x, position.y, velocity.x, velocity.y, radius)
         self.sprite = sprite  # each sprite is an object from pyglet to draw the dot 
+        self._create_views()
+
+    @classmethod
+    def in_store(cls, store: ParticleStore, index: int, sprite: pyglet.sprite.Sprite = None) -> Dot:
+        '''
+            Returns a dot for the dot already in the store at index, e.g. a store loaded from a snapshot
+        '''
+        dot = cls.__new__(cls)
+        dot.store = store
+        dot.index = index
+        dot.sprite = sprite
+        dot._create_views()
+        return dot
+
+    def _create_views(self):
+        '''
+            Protected method to create the views of the position, velocity and force of the dot
+        '''
+        # the views only hold the store and the index, so we create them once and reuse them
+        self._position = ParticleVector(self.store, 'x', 'y', self.index)
+        self._velocity = ParticleVector(self.store, 'vx', 'vy', self.index)
+        self._force = ParticleVector(self.store, 'fx', 'fy', self.index)
+
+    @property
+    def position(self) -> TwoDimensionalVector:
+        return self._position
+
+    @position.setter
+    def position(self, value: TwoDimensionalVector):
+        self.store.x[self.index] = value.x
+        self.store.y[self.index] = value.y
+
+    @property
+    def velocity(self) -> TwoDimensionalVector:
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value: TwoDimensionalVector):
+        self.store.vx[self.index] = value.x
+        self.store.vy[self.index] = value.y
+
+    @property
+    def force(self) -> TwoDimensionalVector:
+        return self._force
+
+    @force.setter
+    def force(self, value: TwoDimensionalVector):
+        self.store.fx[self.index] = value.x
+        self.store.fy[self.index] = value.y
+
+    @property
+    def radius(self) -> float:
+        return float(self.store.radius[self.index])
+
+    @radius.setter
+    def radius(self, value: float):
+        self.store.radius[self.index] = value
 
     def add_force(self, force: TwoDimensionalVector):
         '''
             Adds force to the dot 
         '''
-        self.force = self.force + force
+        self.store.fx[self.index] += force.x
+        self.store.fy[self.index] += force.y
 
     def update_state(self, delta_time: float):
         '''
-            Updates the status of the dot object.
+            Updates the status of the dot object. ParticleStore.integrate does the same for all the dots at once.
 
             delta_time: time since last update
         '''
+        store = self.store
+        i = self.index
+
         # new position is decided by the distance covered (velocity * travelling time)
-        self.position = self.position + self.velocity * delta_time
+        store.x[i] += store.vx[i] * delta_time
+        store.y[i] += store.vy[i] * delta_time
 
         # assuming the dots have mass = 1, we have
         # acceleration = force / mass = force
         # we then apply this acceleration for delta_time to the dot
-        self.velocity = self.velocity + self.force * delta_time
+        store.vx[i] += store.fx[i] * delta_time
+        store.vy[i] += store.fy[i] * delta_time
 
         # after updating the state, force is set back to 0 to avoid accumlation in force
-        self.force = TwoDimensionalVector(0.0, 0.0)
+        store.fx[i] = 0.0
+        store.fy[i] = 0.0
 
     def update_sprite(self):
         '''
             Updates the position of the sprite
         '''
-        self.sprite.x = self.position.x
-        self.sprite.y = self.position.y
+        self.sprite.x = float(self.store.x[self.index])
+        self.sprite.y = float(self.store.y[self.index])
 
 
 class DotFactory:
     '''
         Dot factory to create random dots for the app
 
-        image: a pyglet.image that is used to draw the dot 
+        image: a pyglet.image that is used to draw the dot. Without an image the dots have no sprite, e.g. to run
+            the simulation without a window
         area_width: the width of the pyglet window, which is the maximum x coordinate where the dot can be 
         area_height: the height of the pyglet window, which is the maximum y coordinate where the dot can be
         min_size: the minimum size of the dot
         max_size: the maximum size of the dot 
         max_velocity: the maximum velocity of the dot
+        store: the ParticleStore in which the dots are created. A new store is used when none is given
+        rng: the random number generator, e.g. random.Random(seed) to create the same dots every time. Defaults to
+            the global random module
     '''
 
-    def __init__(self, image: pyglet.image, area_width: float, area_height: float, min_size: float, max_size: float, max_velocity: float):
+    def __init__(self, image: pyglet.image, area_width: float, area_height: float, min_size: float, max_size: float, max_velocity: float,
+                 store: ParticleStore = None, rng: random.Random = None):
         self.image = image
         self.area_width = area_width
         self.area_height = area_height
         self.min_size = min_size
         self.max_size = max_size
         self.max_velocity = max_velocity
+        self.store = store if store is not None else ParticleStore()
+        self.rng = rng if rng is not None else random
 
-    def create(self, batch: pyglet.graphics.Batch):
+    def create(self, batch: pyglet.graphics.Batch = None):
         '''
             Creates random dots in batch 
         '''
+        return self.restore(self.add(), batch)
+
+    def add(self) -> int:
+        '''
+            Adds a random dot to the store without creating its Dot (nor its sprite), see DotList
+
+            Returns the index of the dot in the store
+        '''
+
+        rng = self.rng
 
-        position = TwoDimensionalVector(
-            random.random()*self.area_width, random.random()*self.area_height)
-        
-        velocity = TwoDimensionalVector(
-            (random.random() - 0.5)*self.max_velocity, (random.random() - 0.5)*self.max_velocity)
-        
-        radius = (random.random()*(self.max_size - self.min_size) + self.min_size)
+        # the random numbers are drawn in the same order as always, so a seed still gives the same dots
+        x, y = rng.random()*self.area_width, rng.random()*self.area_height
+        vx, vy = (rng.random() - 0.5)*self.max_velocity, (rng.random() - 0.5)*self.max_velocity
+        radius = (rng.random()*(self.max_size - self.min_size) + self.min_size)
 
+        return self.store.add(x, y, vx, vy, radius)
+
+    def restore(self, index: int, batch: pyglet.graphics.Batch = None) -> Dot:
+        '''
+            Returns a dot (with its sprite) for the dot already in the store at index, instead of a random one
+        '''
+        return Dot.in_store(self.store, index, self._create_sprite(float(self.store.radius[index]), batch))
+
+    def _create_sprite(self, radius: float, batch: pyglet.graphics.Batch = None) -> pyglet.sprite.Sprite:
+        '''
+            Protected method to create the sprite of a dot of the given radius, None without an image
+        '''
+        if self.image is None:
+            return None
         sprite = pyglet.sprite.Sprite(self.image, batch=batch)
         # rescales the sprite to have a height that equals 2 * radius
         scale = radius * 2 / sprite.height
         sprite.scale_x = scale
         sprite.scale_y = scale
+        return sprite
+
 
-        return Dot(position, velocity, radius, sprite=sprite)
+class DotList:
+    '''
+        The dots of the store of a DotFactory, as a list whose Dot objects (with their sprites) are only created when
+        they are first used, e.g. by a DotRenderer of a window or by the lines of a LinePool. A run without a window
+        (or a large snapshot) works on the store only and never creates most of them.
+
+        factory: the DotFactory whose store holds the dots and which creates their sprites
+        batch: the drawing batch of the sprites
+    '''
+
+    def __init__(self, factory: DotFactory, batch: pyglet.graphics.Batch = None):
+        self.factory = factory
+        self.batch = batch
+        # the dots created so far, by index
+        self._dots = {}
+
+    def __len__(self) -> int:
+        return self.factory.store.count
+
+    def __getitem__(self, index: int) -> Dot:
+        # also checks the index, and counts a negative one from the end like a list
+        index = range(len(self))[index]
+        dot = self._dots.get(index)
+        if dot is None:
+            dot = self._dots[index] = self.factory.restore(index, self.batch)
+        return dot
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def created(self) -> int:
+        '''
+            The number of Dot objects created so far
+        '''
+        return len(self._dots)
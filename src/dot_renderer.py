@@ -0,0 +1,84 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+import numpy as np
+import pyglet
+
+
+class _DomainDots:
+    '''
+        The dots whose sprites share one vertex domain, see DotRenderer
+    '''
+
+    def __init__(self, domain, indices: np.ndarray, rows: np.ndarray):
+        self.domain = domain
+        # the indices of the dots in the store, one per vertex
+        self.indices = indices
+        # the vertices of the sprites in the domain buffers, a slice when they are contiguous and in order
+        self.rows = rows
+        if len(rows) and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+            self.rows = slice(int(rows[0]), int(rows[0]) + len(rows))
+        self.first = int(rows.min()) if len(rows) else 0
+        self.end = int(rows.max()) + 1 if len(rows) else 0
+        # the translate buffer as a NumPy array, which is replaced when the domain grows
+        self.version = None
+        self.translate = None
+
+
+class DotRenderer:
+    '''
+        Moves the sprites of all the dots with one write per vertex domain, instead of setting sprite.x and
+        sprite.y for each dot (which rebuilds the vertices of the sprite twice).
+
+        dots:
+            the dots to draw. Dots without a sprite are ignored.
+
+        The positions are written straight into the 'translate' attribute of the sprite vertex lists, so the
+        x, y and position properties of the sprites keep the position they were created at (or last set at): they
+        are stale, read the positions of the dots from the store instead. Setting them also moves the sprite back
+        until the next update. Call refresh when sprites are added, deleted, or moved to another batch or group.
+    '''
+
+    # vertices per sprite
+    VERTICES = 4
+
+    def __init__(self, dots: list):
+        self.dots = dots
+        self._domains = []
+        self.refresh()
+
+    def refresh(self):
+        '''
+            Finds where the vertices of each sprite live
+        '''
+        groups = {}
+        for dot in self.dots:
+            if dot.sprite is None:
+                continue
+            vertex_list = dot.sprite._vertex_list
+            indices, starts = groups.setdefault(vertex_list.domain, ([], []))
+            indices.append(dot.index)
+            starts.append(vertex_list.start)
+
+        self._domains = []
+        for domain, (indices, starts) in groups.items():
+            rows = (np.array(starts, dtype=np.intp)[:, None] + np.arange(self.VERTICES)).ravel()
+            self._domains.append(_DomainDots(domain, np.repeat(np.array(indices, dtype=np.intp), self.VERTICES),
+                                             rows))
+
+    def update(self, x: np.ndarray, y: np.ndarray):
+        '''
+            Moves the sprites to the positions of their dots
+
+            x, y: the positions of all the dots, e.g. the x and y columns of the store
+        '''
+        for dots in self._domains:
+            attribute = dots.domain.attribute_names['translate']
+            if dots.version != dots.domain.version:
+                dots.translate = np.ctypeslib.as_array(attribute.buffer.data).view(np.float32).reshape(-1, 3)
+                dots.version = dots.domain.version
+
+            dots.translate[dots.rows, 0] = x[dots.indices]
+            dots.translate[dots.rows, 1] = y[dots.indices]
+
+            # marks the written vertices to be uploaded with the next draw of the batch
+            attribute.get_region(attribute.buffer, dots.first, dots.end - dots.first).invalidate()
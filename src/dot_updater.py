@@ -1,9 +1,18 @@
 from vector import TwoDimensionalVector
 from dot import Dot
 from mouse import Mouse
+from config import EnvironmentConfig
+import numpy as np
 import math
 
-# TODO this need to be improved 
+# the velocity of a dot is compared to the max speed as its distance to the origin
+_ORIGIN = TwoDimensionalVector(0., 0.)
+
+
+def _fmod_positive(x: float, y: float) -> float:
+    return math.fmod(math.fmod(x, y) + y, y)
+
+
 class EnvironmentDotUpdater:
     '''
         This class groups together various dot updates not related to Lines.
@@ -12,43 +21,114 @@ class EnvironmentDotUpdater:
             the width of the pyglet window
         height:
             the height of the pyglet window
+        config:
+            the margin, the mouse force and the max speed, see EnvironmentConfig. Defaults to EnvironmentConfig()
 
+        The squared max speed and the size of the area in which the dots wrap around are computed once here, not at
+        every update. update_all does the same as update for all the dots at once on the columns of a ParticleStore
+        (as add_forces_all then wrap_all, which Simulation calls separately), update is kept as the reference for a
+        single Dot.
     '''
 
-    def __init__(self, width: float, height: float):
-        # TODO: add configuration for the constants used in the class
+    def __init__(self, width: float, height: float, config: EnvironmentConfig = None):
+        config = EnvironmentConfig() if config is None else config
         self.width = width
         self.height = height
-        
+        self.margin = config.margin
+        self.mouse_force_scale = config.mouse_force_scale
+        self.max_mouse_force = config.max_mouse_force
+        self.max_speed = config.max_speed
+        self._max_speed_squared = self.max_speed ** 2
+        self._wrap_width = width + 2 * self.margin
+        self._wrap_height = height + 2 * self.margin
+
     def update(self, dot: Dot, mouse: Mouse):
         '''
             Currently handles 3 unrelated updates:
             1. updates replusive force from clicking the mouse
             2. limits the velocity of a dot
             3. wraps the dots around the window
-            
+
             dot:
                 a dot object
             mouse:
                 a mouse object
 
         '''
-        
+
         # handles the mouse press
         if mouse.pressed:
             distance = mouse.position.distance(dot.position)
-            direction = (dot.position - mouse.position) * (1 / distance)
-            force_magnitude = min((1/distance)**2 * 1000000, 1000)
-            dot.force += direction * force_magnitude
+            force_magnitude = min((1/distance)**2 * self.mouse_force_scale, self.max_mouse_force)
+            # the force is force_magnitude along (dot.position - mouse.position) / distance, added in place
+            scale = force_magnitude / distance
+            dot.force.scale_add(scale, dot.position)
+            dot.force.scale_add(-scale, mouse.position)
 
-        # limits the velocity 
-        if TwoDimensionalVector(0, 0).distance(dot.velocity) > 50:
-            dot.force += -1 * dot.velocity
+        # limits the velocity
+        if _ORIGIN.distance_squared(dot.velocity) > self._max_speed_squared:
+            dot.force.scale_add(-1, dot.velocity)
 
         # when a dot goes out of the window from one side, it appears from another side
-        def fmod_positive(x, y):
-            return math.fmod(math.fmod(x, y) + y, y)
-        dot.position.x = fmod_positive(
-            dot.position.x + 50, self.width + 100) - 50
-        dot.position.y = fmod_positive(
-            dot.position.y + 50, self.height + 100) - 50
\ No newline at end of file
+        dot.position.x = _fmod_positive(dot.position.x + self.margin, self._wrap_width) - self.margin
+        dot.position.y = _fmod_positive(dot.position.y + self.margin, self._wrap_height) - self.margin
+
+    def update_all(self, positions: tuple, velocities: tuple, forces: tuple, mouse: Mouse):
+        '''
+            Same as update for all the dots at once, as array operations
+
+            positions, velocities, forces:
+                the (x, y) columns of all the dots, e.g. (store.x, store.y) of a ParticleStore. The forces and the
+                positions are updated in place
+            mouse:
+                a mouse object
+        '''
+        self.add_forces_all(positions, velocities, forces, mouse)
+        self.wrap_all(positions)
+
+    def add_forces_all(self, positions: tuple, velocities: tuple, forces: tuple, mouse: Mouse):
+        '''
+            The forces of update_all (the mouse repulsion and the velocity limiter) without the wrap, e.g. for the
+            stages of an integrator, which must not move the dots
+        '''
+        x, y = positions
+        vx, vy = velocities
+        fx, fy = forces
+
+        # handles the mouse press, a dot right under the mouse gets no force (update would divide by 0)
+        if mouse.pressed:
+            dx = x - mouse.position.x
+            dy = y - mouse.position.y
+            distance_squared = dx * dx + dy * dy
+            distance = np.sqrt(distance_squared)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                force_magnitude = np.minimum(self.mouse_force_scale / distance_squared, self.max_mouse_force)
+                scale = np.where(distance > 0, force_magnitude / distance, 0.0)
+            fx += scale * dx
+            fy += scale * dy
+
+        # limits the velocity
+        too_fast = vx * vx + vy * vy > self._max_speed_squared
+        fx[too_fast] -= vx[too_fast]
+        fy[too_fast] -= vy[too_fast]
+
+    def any_outside(self, positions: tuple) -> bool:
+        '''
+            Returns whether wrap_all would move any of the dots, i.e. whether one is out of the window and its margin
+        '''
+        x, y = positions
+        margin = self.margin
+        return bool(np.any((x < -margin) | (x >= self.width + margin) | (y < -margin) | (y >= self.height + margin)))
+
+    def wrap_all(self, positions: tuple):
+        '''
+            The wrap of update_all: moves the dots which went out of the window (and its margin) to the other side
+        '''
+        x, y = positions
+        # in place and in the same order of operations as update
+        for column, wrap in ((x, self._wrap_width), (y, self._wrap_height)):
+            column += self.margin
+            np.fmod(column, wrap, out=column)
+            column += wrap
+            np.fmod(column, wrap, out=column)
+            column -= self.margin
@@ -0,0 +1,67 @@
+from typing import Callable
+import numpy as np
+
+
+class FixedTimestep:
+    '''
+        Runs the physics with a fixed time step, whatever the time between two frames. The frame time is added to
+        an accumulator and as many fixed steps as fit in it are run; the rest waits for the next frame.
+
+        step:
+            the function running one physics step, called with the fixed time step
+        rate:
+            the number of physics steps per simulated second
+        max_steps:
+            the maximum number of steps run to catch up in one advance. When the physics falls further behind (e.g.
+            the window was dragged), the time it could not catch up is dropped and the simulation slows down
+            instead of spending every frame on catching up
+
+        alpha tells how far the accumulator is between the last step and the next one, to interpolate the drawing.
+    '''
+
+    def __init__(self, step: Callable[[float], None], rate: float = 120, max_steps: int = 5):
+        self.step = step
+        self.rate = rate
+        self.delta_time = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        # the number of steps run by the last advance
+        self.steps = 0
+
+    def advance(self, delta_time: float) -> int:
+        '''
+            Adds delta_time to the accumulator and runs the steps that fit in it
+
+            Returns the number of steps run
+        '''
+        self.accumulator += delta_time
+        steps = 0
+        while self.accumulator >= self.delta_time and steps < self.max_steps:
+            self.step(self.delta_time)
+            self.accumulator -= self.delta_time
+            steps += 1
+
+        if self.accumulator >= self.delta_time:
+            # too far behind, we only keep the part of a step
+            self.accumulator %= self.delta_time
+
+        self.steps = steps
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        '''
+            The time in the accumulator as a fraction of a step, between 0 (the last step) and 1 (the next one)
+        '''
+        return self.accumulator / self.delta_time
+
+
+def interpolate(previous: np.ndarray, current: np.ndarray, alpha: float, period: float) -> np.ndarray:
+    '''
+        Returns the positions alpha of the way from previous to current
+
+        period: the size of the area in which the positions wrap around. A position which moved more than half of
+            it was wrapped to the other side, so it is not interpolated (it would cross the whole window)
+    '''
+    delta = current - previous
+    return np.where(np.abs(delta) > period / 2, current, previous + alpha * delta)
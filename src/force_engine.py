@@ -0,0 +1,58 @@
+from line import ForceLaw
+from particle_store import ParticleStore
+from spatial_grid import SpatialGrid, close_pairs
+import numpy as np
+
+
+class NumpyForceEngine:
+    '''
+        Applies the forces between all the pairs of dots with a few NumPy operations per update, instead of one
+        Line.update_state call per pair. The forces match the ones applied by Line.update_state.
+
+        dot_force_calculator:
+            maps the dot distance to force magnitude, a DotForceCalculator or any other ForceLaw
+        grid:
+            an optional SpatialGrid to find the pairs within max_distance. Without a grid all the pairs are checked,
+            which is still vectorized but needs O(N^2) memory.
+    '''
+
+    def __init__(self, dot_force_calculator: ForceLaw, grid: SpatialGrid = None):
+        self.dot_force_calculator = dot_force_calculator
+        self.grid = grid
+        self._all_pairs = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+        # the number of pairs within max_distance at the last apply
+        self.active_pairs = 0
+
+    def _pairs(self, store: ParticleStore) -> tuple:
+        '''
+            Protected method to return the pairs (i, j, distance) of dots that are at most max_distance apart
+        '''
+        max_distance = self.dot_force_calculator.max_distance
+        if self.grid is not None:
+            return self.grid.pairs_within(store.x, store.y, max_distance)
+
+        # the pairs only depend on the number of dots, so we keep them between updates
+        if len(self._all_pairs[0]) != store.count * (store.count - 1) // 2:
+            self._all_pairs = np.triu_indices(store.count, 1)
+        i, j = self._all_pairs
+        return close_pairs(store.x, store.y, i, j, max_distance)
+
+    def apply(self, store: ParticleStore):
+        '''
+            Adds the forces between the dots to store.fx and store.fy
+
+            Pairs of dots at the exact same position are skipped, since there is no direction to push them in.
+        '''
+        i, j, distance = self._pairs(store)
+        apart = distance > 0
+        i, j, distance = i[apart], j[apart], distance[apart]
+        self.active_pairs = len(i)
+
+        # force on dot i towards dot j, dot j gets the opposite force
+        strength = self.dot_force_calculator.calculate_many(distance) / distance
+        force_x = strength * (store.x[j] - store.x[i])
+        force_y = strength * (store.y[j] - store.y[i])
+
+        count = store.count
+        store.fx += np.bincount(i, weights=force_x, minlength=count) - np.bincount(j, weights=force_x, minlength=count)
+        store.fy += np.bincount(i, weights=force_y, minlength=count) - np.bincount(j, weights=force_y, minlength=count)
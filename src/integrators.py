@@ -0,0 +1,97 @@
+'''
+    Integrators advancing all the dots of a ParticleStore by one time step. The dots have mass = 1, so the
+    acceleration is the force.
+
+    Every integrator is called as integrator(store, forces, delta_time), with the forces at the current state
+    already in store.fx and store.fy. forces(store) adds the forces at the current columns of the store (after
+    clearing them), for the integrators which need more than one evaluation per step. The forces are cleared
+    at the end of the step.
+'''
+from typing import Callable
+from particle_store import ParticleStore
+import numpy as np
+import math
+
+
+def euler(store: ParticleStore, forces: Callable[[ParticleStore], None], delta_time: float):
+    '''
+        Explicit Euler: the position moves with the old velocity, then the velocity with the force. This is
+        the integration of Dot.update_state and ParticleStore.integrate.
+    '''
+    store.integrate(delta_time)
+
+
+def semi_implicit_euler(store: ParticleStore, forces: Callable[[ParticleStore], None], delta_time: float):
+    '''
+        Semi-implicit (symplectic) Euler: the velocity moves with the force, then the position with the new
+        velocity. Same cost as euler, but the energy of the springs stays bounded instead of growing.
+    '''
+    store.vx += store.fx * delta_time
+    store.vy += store.fy * delta_time
+    store.x += store.vx * delta_time
+    store.y += store.vy * delta_time
+    store.clear_forces()
+
+
+def velocity_verlet(store: ParticleStore, forces: Callable[[ParticleStore], None], delta_time: float):
+    '''
+        Velocity Verlet: half a kick with the old force, a drift, then half a kick with the force at the new
+        position. Second order, two force evaluations per step.
+    '''
+    half = delta_time / 2
+    store.vx += store.fx * half
+    store.vy += store.fy * half
+    store.x += store.vx * delta_time
+    store.y += store.vy * delta_time
+
+    forces(store)
+    store.vx += store.fx * half
+    store.vy += store.fy * half
+    store.clear_forces()
+
+
+def rk4(store: ParticleStore, forces: Callable[[ParticleStore], None], delta_time: float):
+    '''
+        Classic fourth order Runge-Kutta on positions and velocities. Four force evaluations per step.
+    '''
+    x, y, vx, vy = store.x.copy(), store.y.copy(), store.vx.copy(), store.vy.copy()
+
+    # slopes of the 4 stages: (dx, dy, dvx, dvy) = (vx, vy, fx, fy) at the state of the stage
+    slopes = [(vx, vy, store.fx.copy(), store.fy.copy())]
+    for fraction in (0.5, 0.5, 1.0):
+        dx, dy, dvx, dvy = slopes[-1]
+        store.x[:] = x + dx * (fraction * delta_time)
+        store.y[:] = y + dy * (fraction * delta_time)
+        store.vx[:] = vx + dvx * (fraction * delta_time)
+        store.vy[:] = vy + dvy * (fraction * delta_time)
+        forces(store)
+        slopes.append((store.vx.copy(), store.vy.copy(), store.fx.copy(), store.fy.copy()))
+
+    weights = (1, 2, 2, 1)
+    for column, start, part in ((store.x, x, 0), (store.y, y, 1), (store.vx, vx, 2), (store.vy, vy, 3)):
+        column[:] = start + delta_time / 6 * sum(weight * slope[part] for weight, slope in zip(weights, slopes))
+    store.clear_forces()
+
+
+INTEGRATORS = {
+    'euler': euler,
+    'semi-implicit': semi_implicit_euler,
+    'verlet': velocity_verlet,
+    'rk4': rk4,
+}
+
+
+def substeps(store: ParticleStore, delta_time: float, max_displacement: float, max_substeps: int) -> int:
+    '''
+        Returns the number of substeps delta_time is split into, so that the dot with the largest acceleration
+        (the forces in store) moves at most max_displacement because of it in one substep: a * h^2 / 2 <= d
+
+        max_substeps: the upper bound of the number of substeps
+    '''
+    if store.count == 0:
+        return 1
+    acceleration = math.sqrt(float(np.max(store.fx * store.fx + store.fy * store.fy)))
+    if acceleration == 0:
+        return 1
+    step = math.sqrt(2 * max_displacement / acceleration)
+    return min(max(math.ceil(delta_time / step), 1), max_substeps)
@@ -1,9 +1,42 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
 from dot import Dot
-from typing import Any
+from typing import Any, Union
+from abc import ABC, abstractmethod
+import numpy as np
 import pyglet
+import math
 
 
-class DotForceCalculator:
+class ForceLaw(ABC):
+    '''
+        Maps the distance between two dots to the strength of the force between them. A positive force attracts
+        the dots, a negative one repels them. The force engines (Line, NumpyForceEngine, BarnesHutForceEngine) work
+        with any force law.
+
+        max_distance:
+            Maximum distance between two dots to have force interaction, math.inf for a long-range force law.
+        max_distance_squared:
+            max_distance^2, to compare squared distances against it without taking their square root.
+    '''
+
+    max_distance = math.inf
+    max_distance_squared = math.inf
+
+    @abstractmethod
+    def calculate(self, distance: float) -> float:
+        '''
+            Returns the force between two dots at the given distance
+        '''
+
+    @abstractmethod
+    def calculate_many(self, distance: np.ndarray) -> np.ndarray:
+        '''
+            Same as calculate, for an array of distances
+        '''
+
+
+class DotForceCalculator(ForceLaw):
     '''
         A calculator to calculate the force to be applied between two dots depending on their distance.
 
@@ -23,6 +56,7 @@ class DotForceCalculator:
     def __init__(self, neutral_distance: float, max_distance: float, force_coefficient: float):
         self.neutral_distance = neutral_distance
         self.max_distance = max_distance
+        self.max_distance_squared = max_distance * max_distance
         self.force_coefficient = force_coefficient
 
     def calculate(self, distance: float) -> float:
@@ -37,7 +71,107 @@ class DotForceCalculator:
         if distance <= self.max_distance:
             return self.force_coefficient * (distance - self.neutral_distance)
         return 0.0
-    
+
+    def calculate_many(self, distance: np.ndarray) -> np.ndarray:
+        '''
+            Same as calculate, for an array of distances
+
+            distance: the distances between pairs of dots
+
+            Returns the forces between the pairs of dots as an array
+        '''
+        return np.where(distance <= self.max_distance, self.force_coefficient * (distance - self.neutral_distance), 0.0)
+
+
+class SoftenedGravity(ForceLaw):
+    '''
+        A long-range attraction between every pair of dots: strength / distance^2 far away, softened near 0 so
+        that two close dots do not get an infinite force (strength * d / (d^2 + softening^2)^(3/2)).
+
+        strength:
+            Coefficient controlling the strength of the force.
+        softening:
+            The distance below which the force stops growing.
+    '''
+
+    def __init__(self, strength: float, softening: float):
+        self.strength = strength
+        self.softening = softening
+
+    def calculate(self, distance: float) -> float:
+        return self.strength * distance / (distance * distance + self.softening * self.softening) ** 1.5
+
+    def calculate_many(self, distance: np.ndarray) -> np.ndarray:
+        return self.strength * distance / (distance * distance + self.softening * self.softening) ** 1.5
+
+
+def line_width(start_radius: Union[float, np.ndarray], end_radius: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+    '''
+        Returns the width of the line between two dots of the given radiuses (floats or arrays)
+    '''
+    return (start_radius + end_radius) / 2 / 3
+
+
+class AlphaTable:
+    '''
+        The colors of the lines by length, precomputed for steps lengths between min_scale_length and
+        max_scale_length, so the color of a line is a table lookup instead of a new tuple per line and frame.
+
+        color:
+            the color of the lines, a tuple of integers (R, G, B, A). A is replaced by the alpha of each length.
+        min_scale_length, max_scale_length:
+            the lengths between which the lines fade out, see LineDrawObject
+        steps:
+            the number of quantization steps of the lengths. With 255 steps (the default) the alphas are the ones
+            of LineDrawObject._scaling; fewer steps fade the lines in coarser bands.
+
+        The length d is quantized to the step ceil((d - min_scale_length) / (max_scale_length - min_scale_length)
+        * steps), clipped to 0..steps, whose alpha is 255 * (steps - step) // steps.
+    '''
+
+    def __init__(self, color: tuple, min_scale_length: float, max_scale_length: float, steps: int = 255):
+        if steps < 1:
+            raise ValueError('The alpha table needs at least 1 step')
+        self.color = color
+        self.min_scale_length = min_scale_length
+        self.max_scale_length = max_scale_length
+        self.steps = steps
+        self._steps_per_length = steps / (max_scale_length - min_scale_length)
+
+        # one RGBA row per step, and the same rows as tuples for the pyglet shapes
+        # in integers, so 255 steps give exactly the alphas 255, 254, ..., 0
+        self.alphas = (255 * (steps - np.arange(steps + 1)) // steps).astype(np.uint8)
+        self.rgba = np.empty((steps + 1, 4), dtype=np.uint8)
+        self.rgba[:, :3] = color[:3]
+        self.rgba[:, 3] = self.alphas
+        self._colors = [tuple(row) for row in self.rgba.tolist()]
+
+    def step(self, distance: float) -> int:
+        '''
+            Returns the quantization step of a length
+        '''
+        step = math.ceil((distance - self.min_scale_length) * self._steps_per_length)
+        return min(max(step, 0), self.steps)
+
+    def color_of(self, distance: float) -> tuple:
+        '''
+            Returns the color of a line of the given length as a tuple (R, G, B, A)
+        '''
+        return self._colors[self.step(distance)]
+
+    def steps_of(self, distance: np.ndarray) -> np.ndarray:
+        '''
+            Same as step, for an array of lengths
+        '''
+        steps = np.ceil((distance - self.min_scale_length) * self._steps_per_length)
+        return np.clip(steps, 0, self.steps).astype(np.intp)
+
+    def colors_of(self, distance: np.ndarray) -> np.ndarray:
+        '''
+            Returns the colors of lines of the given lengths as an array of shape (len(distance), 4) of uint8
+        '''
+        return self.rgba[self.steps_of(distance)]
+
 
 class LineDrawObject:
     '''
@@ -55,16 +189,26 @@ class LineDrawObject:
             minimum length of the transparency scaling 
         max_scale_length: 
             maximum length of the transparency scaling, at which the line gets full transparent 
+        alpha_table:
+            the AlphaTable giving the color of the line by length, usually shared by all the lines. A table of
+            255 steps is created when none is given
 
     '''
 
-    def __init__(self, batch: pyglet.graphics.Batch, width: float, color: tuple, min_scale_length, max_scale_length):
+    def __init__(self, batch: pyglet.graphics.Batch, width: float, color: tuple, min_scale_length, max_scale_length,
+                 alpha_table: AlphaTable = None):
         self.batch = batch
         self.shape = None
         self.width = width
         self.color = color
         self.min_scale_length = min_scale_length
         self.max_scale_length = max_scale_length
+        if alpha_table is None:
+            alpha_table = AlphaTable(color, min_scale_length, max_scale_length)
+        self.alpha_table = alpha_table
+        # computed once instead of at every _scaling and update
+        self._inverse_scale_range = 1 / (max_scale_length - min_scale_length)
+        self._max_scale_length_squared = max_scale_length * max_scale_length
 
     def _get_color(self, distance: float) -> tuple:
         '''
@@ -74,7 +218,8 @@ class LineDrawObject:
 
             Returns the color of the line as a tuple 
         '''
-        return self.color[:-1] + (int(255*self._scaling(distance)), )
+        # the color comes from the table, _scaling is the exact alpha the table follows
+        return self.alpha_table.color_of(distance)
 
     def _scaling(self, distance: float) -> float:
         '''
@@ -88,16 +233,22 @@ class LineDrawObject:
 
         '''
         if distance > self.min_scale_length:
-            return max(1 - (distance - self.min_scale_length) * (1 / (self.max_scale_length - self.min_scale_length)), 0)
+            return max(1 - (distance - self.min_scale_length) * self._inverse_scale_range, 0)
         return 1.0
 
-    def update(self, start: Dot, end: Dot):
+    def update(self, start: Dot, end: Dot, distance: float = None):
         '''
             Updates the position of the line based on the start dot and end dot 
+
+            distance: the distance between the dots when it is already known (see Line.distance), otherwise it is
+                measured here
         '''
 
-        distance = start.position.distance(end.position)
-        
+        if distance is None:
+            # the square root is only needed for the visible lines
+            distance_squared = start.position.distance_squared(end.position)
+            distance = math.sqrt(distance_squared) if distance_squared <= self._max_scale_length_squared else math.inf
+
         # drawing invisible lines makes the code very slow!
         if distance > self.max_scale_length:
             # assigning None to shape also deletes the shape from the batch
@@ -133,6 +284,12 @@ class Line:
         line_draw_object:
             to draw the lines 
 
+        distance:
+            the distance between the start and end dots of the current frame, shared by update_state and
+            update_draw_object so it is computed once per pair. LinePool.update sets it for all its lines at once
+            (from the distances of the grid); it is None when it has not been measured, and then each method
+            measures it itself.
+
     '''
 
     def __init__(self, start: Dot, end: Dot, dot_force_calculator: DotForceCalculator, line_draw_object: LineDrawObject = None):
@@ -140,13 +297,20 @@ class Line:
         self.end = end
         self.dot_force_calculator = dot_force_calculator
         self.line_draw_object = line_draw_object
+        self.distance = None
 
     def update_state(self):
         '''
             Update the state of the start and end dots 
         '''
 
-        distance = self.start.position.distance(self.end.position)
+        distance = self.distance
+        if distance is None:
+            # Optimization: the squared distance is enough to skip the dots which are too far apart
+            distance_squared = self.start.position.distance_squared(self.end.position)
+            if distance_squared > self.dot_force_calculator.max_distance_squared:
+                return
+            distance = math.sqrt(distance_squared)
 
         # Optimization: skip calculations when the distance is too large
         if distance > self.dot_force_calculator.max_distance:
@@ -160,12 +324,14 @@ class Line:
             Protected method to apply the force to the dot1 based on the distance
         '''
 
-        force_strength = self.dot_force_calculator.calculate(distance)
-        dot1.force += force_strength * (dot2.position - dot1.position) / distance
+        # force_strength * (dot2.position - dot1.position) / distance, added in place without temporary vectors
+        scale = self.dot_force_calculator.calculate(distance) / distance
+        dot1.force.scale_add(scale, dot2.position)
+        dot1.force.scale_add(-scale, dot1.position)
 
     def update_draw_object(self):
         '''
             Update the line draw object depending on the start dot and end dot 
         '''
 
-        self.line_draw_object.update(self.start, self.end)
+        self.line_draw_object.update(self.start, self.end, self.distance)
@@ -0,0 +1,129 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from line import AlphaTable, Line, LineDrawObject, ForceLaw, line_width
+import numpy as np
+import pyglet
+
+
+def pair_index(i: np.ndarray, j: np.ndarray, count: int) -> np.ndarray:
+    '''
+        Returns the index of the pair of dot i and dot j (i != j) in the list of all the pairs
+        (0, 1), (0, 2), ..., (0, count - 1), (1, 2), ... in this order
+
+        i, j: integer arrays of dot indices
+        count: the number of dots
+    '''
+    first = np.minimum(i, j)
+    second = np.maximum(i, j)
+    return first * (2 * count - first - 1) // 2 + (second - first - 1)
+
+
+class LinePool:
+    '''
+        The lines between the pairs of dots which are close to each other. A Line (and its LineDrawObject) is only
+        created when its dots come close, and it goes back to a free list when they move apart, to be reused for
+        the next pair which comes close. The number of Line objects follows the number of nearby pairs instead of
+        N * (N - 1) / 2.
+
+        dots:
+            the dots
+        dot_force_calculator:
+            the ForceLaw shared by the lines
+        batch:
+            a pyglet batch in which the lines are drawn. Without a batch, the lines have no draw object
+        color, min_scale_length, max_scale_length:
+            how the lines are drawn, see LineDrawObject
+        color_steps:
+            the number of quantization steps of the AlphaTable shared by the draw objects of the lines
+
+        Iterating over the pool gives the lines of the last update, in the order of pair_index. When update is given
+        the distances of the pairs, they are the Line.distance of the frame shared by the forces and the drawing.
+    '''
+
+    def __init__(self, dots: list, dot_force_calculator: ForceLaw, batch: pyglet.graphics.Batch = None,
+                 color: tuple = (255, 255, 255, 255), min_scale_length: float = 10, max_scale_length: float = 150,
+                 color_steps: int = 255):
+        self.dots = dots
+        self.dot_force_calculator = dot_force_calculator
+        self.batch = batch
+        self.color = color
+        self.min_scale_length = min_scale_length
+        self.max_scale_length = max_scale_length
+        self.alpha_table = AlphaTable(color, min_scale_length, max_scale_length, steps=color_steps)
+        # the lines in use by pair_index, and the lines waiting to be reused
+        self._active = {}
+        self._free = []
+        # the number of Line objects created so far
+        self.created = 0
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __iter__(self):
+        return iter(self._active.values())
+
+    def update(self, i: np.ndarray, j: np.ndarray, distance: np.ndarray = None) -> list:
+        '''
+            Makes the lines between the pairs (i[k], j[k]) the lines in use. The lines of the pairs which are not
+            given anymore go back to the free list (and stop being drawn).
+
+            distance: the current distances of the pairs (e.g. from SpatialGrid.pairs_within), which become the
+                Line.distance of the lines. Without distances the lines measure them themselves
+
+            Returns the lines of the pairs, in the order of pair_index
+        '''
+        keys = pair_index(i, j, len(self.dots))
+        order = np.argsort(keys)
+        first = np.minimum(i, j)[order].tolist()
+        second = np.maximum(i, j)[order].tolist()
+        keys = keys[order].tolist()
+        distances = distance[order].tolist() if distance is not None else [None] * len(keys)
+
+        # the lines of the pairs which moved apart are released first, so the new pairs can reuse them
+        kept = set(keys)
+        for key in [key for key in self._active if key not in kept]:
+            self._release(self._active.pop(key))
+
+        active = {}
+        for key, start, end, pair_distance in zip(keys, first, second, distances):
+            line = self._active.get(key)
+            if line is None:
+                line = self._acquire(start, end)
+            line.distance = pair_distance
+            active[key] = line
+
+        self._active = active
+        return list(active.values())
+
+    def _acquire(self, start: int, end: int) -> Line:
+        '''
+            Protected method to return a line between the dots start and end, from the free list when possible
+        '''
+        start_dot = self.dots[start]
+        end_dot = self.dots[end]
+        if self._free:
+            line = self._free.pop()
+            line.start = start_dot
+            line.end = end_dot
+            if line.line_draw_object is not None:
+                line.line_draw_object.width = line_width(start_dot.radius, end_dot.radius)
+            return line
+
+        line_draw_object = None
+        if self.batch is not None:
+            line_draw_object = LineDrawObject(batch=self.batch, width=line_width(start_dot.radius, end_dot.radius),
+                                              color=self.color, min_scale_length=self.min_scale_length,
+                                              max_scale_length=self.max_scale_length, alpha_table=self.alpha_table)
+        self.created += 1
+        return Line(start=start_dot, end=end_dot, dot_force_calculator=self.dot_force_calculator,
+                    line_draw_object=line_draw_object)
+
+    def _release(self, line: Line):
+        '''
+            Protected method to put a line back to the free list
+        '''
+        if line.line_draw_object is not None:
+            # assigning None to shape also deletes the shape from the batch
+            line.line_draw_object.shape = None
+        line.distance = None
+        self._free.append(line)
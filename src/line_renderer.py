@@ -0,0 +1,137 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from line import AlphaTable
+import numpy as np
+import pyglet
+
+
+class LineRenderer:
+    '''
+        Draws all the lines from one pre-allocated vertex list, instead of one pyglet.shapes.Line per pair of dots.
+        Each frame, the end points, widths and alphas of the visible lines are turned into triangles with NumPy and
+        written to the vertex list in one go, so the batch uploads them in a single buffer update.
+
+        batch:
+            a pyglet batch in which we will draw the lines
+        color:
+            the color of the lines, a tuple of integers (R, G, B, A). A is replaced by the alpha of each line.
+        min_scale_length:
+            minimum length of the transparency scaling, see LineDrawObject
+        max_scale_length:
+            maximum length of the transparency scaling, at which the line gets full transparent
+        capacity:
+            the number of lines the vertex list has room for. It grows (doubling) when more lines are visible.
+        color_steps:
+            the number of quantization steps of the AlphaTable which gives the colors of the lines
+
+        The lines look like the ones of LineDrawObject: the same shader as pyglet.shapes, two triangles per line.
+    '''
+
+    # vertices per line: two triangles
+    VERTICES = 6
+
+    def __init__(self, batch: pyglet.graphics.Batch, color: tuple, min_scale_length: float, max_scale_length: float,
+                 capacity: int = 1024, color_steps: int = 255):
+        self.batch = batch
+        self.color = color
+        self.min_scale_length = min_scale_length
+        self.max_scale_length = max_scale_length
+        self.alpha_table = AlphaTable(color, min_scale_length, max_scale_length, steps=color_steps)
+        self.capacity = 0
+        # the number of lines drawn at the last update
+        self.count = 0
+
+        self._group = None
+        self._vertex_list = None
+        self._allocate(capacity)
+
+    def _create_vertex_list(self, count: int):
+        '''
+            Protected method to return a vertex list of count invisible vertices in the batch, drawn like
+            pyglet.shapes
+        '''
+        if self._group is None:
+            # _ShapeGroup is private, but it is the group of pyglet.shapes (same shader and blending, and batched
+            # together with the shapes). pyglet is pinned to 2.0.0 in pyproject.toml, so it does not change under us
+            program = pyglet.shapes.get_default_shader()
+            self._group = pyglet.shapes._ShapeGroup(pyglet.gl.GL_SRC_ALPHA, pyglet.gl.GL_ONE_MINUS_SRC_ALPHA,
+                                                    program)
+
+        # the triangles are written in window coordinates, so translation and rotation stay 0
+        return self._group.program.vertex_list(count, pyglet.gl.GL_TRIANGLES, self.batch, self._group,
+                                               vertices=('f', (0.0, 0.0) * count),
+                                               colors=('Bn', (0, 0, 0, 0) * count),
+                                               translation=('f', (0.0, 0.0) * count),
+                                               rotation=('f', (0.0,) * count))
+
+    def _allocate(self, capacity: int):
+        '''
+            Protected method to (re)create the vertex list with room for capacity lines, all of them invisible
+        '''
+        if self._vertex_list is not None:
+            self._vertex_list.delete()
+
+        count = capacity * self.VERTICES
+        self._vertex_list = self._create_vertex_list(count)
+        self.capacity = capacity
+        self._vertices = np.zeros((count, 2), dtype=np.float32)
+        self._colors = np.zeros((count, 4), dtype=np.uint8)
+
+    def alphas(self, distance: np.ndarray) -> np.ndarray:
+        '''
+            Returns the alpha (0 to 255) of lines of the given lengths, like LineDrawObject._get_color
+        '''
+        return self.alpha_table.alphas[self.alpha_table.steps_of(distance)]
+
+    def update(self, x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray, width: np.ndarray,
+               distance: np.ndarray):
+        '''
+            Replaces the drawn lines by the lines from (x1, y1) to (x2, y2). Lines longer than max_scale_length
+            are not drawn.
+
+            width: the width of each line
+            distance: the length of each line
+        '''
+        visible = distance <= self.max_scale_length
+        x1, y1, x2, y2 = x1[visible], y1[visible], x2[visible], y2[visible]
+        width, distance = width[visible], distance[visible]
+
+        count = len(distance)
+        if count > self.capacity:
+            self._allocate(max(count, 2 * self.capacity))
+
+        # half the width along the normal of each line
+        length = np.where(distance > 0, distance, 1.0)
+        normal_x = -(y2 - y1) / length * width / 2
+        normal_y = (x2 - x1) / length * width / 2
+
+        # corners a, b, c, d of each line, as two triangles (a, b, c) and (a, c, d)
+        corners = np.empty((count, self.VERTICES, 2), dtype=np.float32)
+        corners[:, 0, 0] = corners[:, 3, 0] = x1 - normal_x
+        corners[:, 0, 1] = corners[:, 3, 1] = y1 - normal_y
+        corners[:, 1, 0] = x2 - normal_x
+        corners[:, 1, 1] = y2 - normal_y
+        corners[:, 2, 0] = corners[:, 4, 0] = x2 + normal_x
+        corners[:, 2, 1] = corners[:, 4, 1] = y2 + normal_y
+        corners[:, 5, 0] = x1 + normal_x
+        corners[:, 5, 1] = y1 + normal_y
+
+        used = count * self.VERTICES
+        self._vertices[:used] = corners.reshape(-1, 2)
+        # the slots of lines which are not visible anymore become empty triangles
+        self._vertices[used:self.count * self.VERTICES] = 0.0
+
+        self._colors[:used] = np.repeat(self.alpha_table.colors_of(distance), self.VERTICES, axis=0)
+        self._colors[used:self.count * self.VERTICES] = 0
+
+        # getting an attribute of the vertex list marks it to be uploaded with the next draw of the batch
+        np.ctypeslib.as_array(self._vertex_list.vertices)[:] = self._vertices.ravel()
+        np.ctypeslib.as_array(self._vertex_list.colors)[:] = self._colors.ravel()
+        self.count = count
+
+    def delete(self):
+        '''
+            Removes the lines from the batch
+        '''
+        self._vertex_list.delete()
+        self._vertex_list = None
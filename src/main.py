@@ -5,54 +5,35 @@ import random
 from mouse import create_and_bind_mouse, Mouse
 from vector import TwoDimensionalVector
 from dot import Dot, DotFactory
-from line import Line, LineDrawObject, DotForceCalculator
+from line import Line, LineDrawObject, DotForceCalculator, line_width
 from dot_updater import EnvironmentDotUpdater
+from simulation import Simulation, create_simulation, report_backend
+from config import Scenario, DEFAULT_SCENARIO, load_scenario
+from line_renderer import LineRenderer
+from dot_renderer import DotRenderer
+from fixed_timestep import FixedTimestep, interpolate
+from physics_worker import PhysicsWorker
+from snapshot import Snapshot, load_snapshot, save_snapshot
+from recorder import TrajectoryRecorder, TrajectoryReader
+from replay import Replay
+from integrators import INTEGRATORS
+from profiler import FrameProfiler, NULL_PROFILER
+import numpy as np
+import argparse
 import os
+import time
 
 script_dir = os.path.dirname(__file__) 
 
-def create_dots_and_lines(window: pyglet.window, line_batch: pyglet.graphics.Batch, dot_batch: pyglet.graphics.Batch):
+def load_dot_image() -> pyglet.image.AbstractImage:
     '''
-        Constructs the Dot and Line objects for the app. We configure everythihg we need here. Later it can take an external configure file (e.g. .toml)
-
-        window: a pyglet window 
-        line_batch: a drawing batch for the lines, it is faster to render the lines in batch
-        dot_batch: a drawing batch for the dots 
-
-        Returns a pair of lists: (dots, lines)
-
+        Loads the image used to draw the dots
     '''
-
     dot_image = pyglet.image.load(script_dir + '/../images/dot_2.png')
     # uses dot image's center as the position of the dot
     dot_image.anchor_x = dot_image.width//2
     dot_image.anchor_y = dot_image.height//2
-
-    # configures DotFactory to create dots 
-    dot_factory = DotFactory(image=dot_image, area_width=window.width, area_height=window.height, 
-                             min_size=5, max_size=10, max_velocity=50)
-
-    dots = []
-    lines = []
-
-    # creates dots 
-    for _ in range(100):
-        dots.append(dot_factory.create(dot_batch))
-    
-    # configures the DotForceCalculator, which will be used by lines to apply forces to the dots
-    dot_force_calculator = DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02)
-
-    # creates lines
-    for i in range(len(dots)):
-        for j in range(i+1, len(dots)):
-            start = dots[i]
-            end = dots[j]
-            line_draw_object = LineDrawObject(batch=line_batch, width=(start.radius + end.radius) / 2 / 3, color=(
-                255, 255, 255, 255), min_scale_length=10, max_scale_length=150)
-            lines.append(
-                Line(start=start, end=end, dot_force_calculator=dot_force_calculator, line_draw_object=line_draw_object))
-            
-    return dots, lines
+    return dot_image
 
 
 class App:
@@ -61,70 +42,209 @@ class App:
 
         backgroud:
             the background of the app
-        dots:
-            dots to be drawn in the app
-        lines:
-            lines to be drawn in the app
-        mouse:
-            a mouse object through which we can click and apply a repelling force
-        dot_updater:
-            a EnvironmentDotUpdater that handles 3 different updates
+        simulation:
+            the Simulation which moves the dots. The app draws its dots and lines
         line_batch:
             a pyglet batch in which we would draw the lines
         dot_batch:
             a pyglet batch in which we would draw the dots 
+        profiler:
+            times the phases of the draws and counts the line shapes. Defaults to NULL_PROFILER, which does nothing
+        line_renderer:
+            an optional LineRenderer which draws all the lines from one vertex list. Without it, each line of the
+            simulation draws itself with its LineDrawObject
+        dot_renderer:
+            an optional DotRenderer which moves all the dot sprites at once. Without it, each dot moves its sprite
+        physics_rate:
+            the number of physics steps per simulated second, see FixedTimestep
+        max_catch_up_steps:
+            the maximum number of physics steps run in one update, see FixedTimestep
+        physics_worker:
+            an optional PhysicsWorker running the physics in another process. The app then draws the positions
+            it publishes (with the renderers, which are needed) and forwards the mouse to it, and simulation is
+            only used for the dots and the grid
+        recorder:
+            an optional TrajectoryRecorder which records the dots after every physics step (not with a
+            physics_worker)
+        replay:
+            an optional Replay of a recording. The app then draws the recorded positions (with the renderers, which
+            are needed) and runs no physics at all: simulation is only used for the dots and the grid
+
+        The renderers draw the dots and the lines between the last two physics steps, according to how far the
+        time of the frame is between them, so the motion is smooth whatever the physics rate. The dot sprites and
+        line shapes moved one by one (without renderers) show the last step.
 
     '''
 
-    def __init__(self, background: pyglet.sprite.Sprite, dots: Dot, lines: Line, mouse: Mouse,
-                 dot_updater: EnvironmentDotUpdater,
-                 line_batch: pyglet.graphics.Batch, dot_batch: pyglet.graphics.Batch):
+    def __init__(self, background: pyglet.sprite.Sprite, simulation: Simulation,
+                 line_batch: pyglet.graphics.Batch, dot_batch: pyglet.graphics.Batch,
+                 profiler: FrameProfiler = NULL_PROFILER, line_renderer: LineRenderer = None,
+                 dot_renderer: DotRenderer = None, physics_rate: float = 120, max_catch_up_steps: int = 5,
+                 physics_worker: PhysicsWorker = None, recorder: TrajectoryRecorder = None, replay: Replay = None):
 
         self.background = background
-        self.dots = dots
-        self.lines = lines
-        self.mouse = mouse
-        self.dot_updater = dot_updater
+        self.simulation = simulation
 
         self.line_batch = line_batch
         self.dot_batch = dot_batch
+        self.profiler = profiler
+        self.line_renderer = line_renderer
+        self.dot_renderer = dot_renderer
+        self.physics_worker = physics_worker
+        self.recorder = recorder
+        self.replay = replay
+
+        self.timestep = FixedTimestep(self._physics_step, rate=physics_rate, max_steps=max_catch_up_steps)
+        # the positions of the dots before the last physics step, to interpolate the drawing
+        self._previous_x = None
+        self._previous_y = None
+
+    def _physics_step(self, delta_time: float):
+        '''
+            Protected method to run one fixed physics step, keeping the positions before it
+        '''
+        store = self.simulation.store
+        self._previous_x = store.x.copy()
+        self._previous_y = store.y.copy()
+        self.simulation.step(delta_time)
+        if self.recorder is not None:
+            self.recorder.record(store)
 
     def update_state(self, delta_time: float):
         '''
             Updates the internal state of the app
 
             delta_time:
-                the time passed since last state update 
+                the time passed since last state update. The physics runs the fixed steps that fit in it
 
         '''
-
-        for line in self.lines:
-            line.update_state()
-
-        for dot in self.dots:
-            self.dot_updater.update(dot, self.mouse)
-            # Update internal state of the dot
-            dot.update_state(delta_time)
+        if self.replay is not None:
+            self.replay.advance(delta_time)
+            return
+        if self.physics_worker is not None:
+            self.physics_worker.send_mouse(self.simulation.mouse)
+            return
+        self.timestep.advance(delta_time)
+
+    def save(self, path: str):
+        '''
+            Saves the state of the simulation (as of the last physics step, or the current tick of a replay) to a
+            snapshot file, see snapshot.py
+        '''
+        if self.replay is not None:
+            save_snapshot(path, self.replay.reader.snapshot(self.replay.tick))
+            return
+        if self.physics_worker is not None:
+            raise ValueError('The state of a physics process cannot be saved')
+        save_snapshot(path, Snapshot.of(self.simulation))
+
+    def render_positions(self) -> tuple:
+        '''
+            Returns the x and y positions at which the dots are drawn, between the last two physics steps
+        '''
+        if self.replay is not None:
+            return self.replay.positions()
+        if self.physics_worker is not None:
+            return self.physics_worker.positions()
+
+        store = self.simulation.store
+        if self._previous_x is None or len(self._previous_x) != store.count:
+            return store.x, store.y
+
+        updater = self.simulation.dot_updater
+        alpha = self.timestep.alpha
+        # the dots wrap around the window and its margins, see EnvironmentDotUpdater
+        x = interpolate(self._previous_x, store.x, alpha, updater.width + 2 * updater.margin)
+        y = interpolate(self._previous_y, store.y, alpha, updater.height + 2 * updater.margin)
+        return x, y
 
     def draw(self):
         '''
             Draws all the objects in the app
         '''
-        self.background.draw()
+        profiler = self.profiler
+        x, y = self.render_positions()
+
+        with profiler.phase('background_draw'):
+            self.background.draw()
+
+        with profiler.phase('line_draw_objects'):
+            self.update_line_draw_objects(x, y)
+        with profiler.phase('line_batch_draw'):
+            self.line_batch.draw()
+
+        with profiler.phase('dot_sprites'):
+            if self.dot_renderer is not None:
+                self.dot_renderer.update(x, y)
+            else:
+                for dot in self.simulation.dots:
+                    dot.update_sprite()
+        with profiler.phase('dot_batch_draw'):
+            self.dot_batch.draw()
+
+        if profiler.enabled:
+            profiler.count('line_shapes', self.line_shape_count())
+
+    def line_shape_count(self) -> int:
+        '''
+            Returns the number of pyglet.shapes.Line objects alive in the line batch (or the number of lines drawn
+            by the line renderer)
+        '''
+        if self.line_renderer is not None:
+            return self.line_renderer.count
+        # the lines which are not in use have no shape, see LinePool
+        return sum(1 for line in self.simulation.lines if line.line_draw_object.shape is not None)
 
-        for line in self.lines:
-            line.update_draw_object()
-        self.line_batch.draw()
+    def update_line_draw_objects(self, x: np.ndarray = None, y: np.ndarray = None):
+        '''
+            Updates the shapes of the lines to the current position of the dots
 
-        for dot in self.dots:
-            dot.update_sprite()
-        self.dot_batch.draw()
+            x, y: the positions at which the line renderer draws the dots, see render_positions. Defaults to the
+                positions in the store
+        '''
+        if self.line_renderer is not None:
+            store = self.simulation.store
+            if x is None:
+                x, y = store.x, store.y
+            i, j, distance = self.simulation.grid.pairs_within(x, y, self.line_renderer.max_scale_length)
+            self.line_renderer.update(x[i], y[i], x[j], y[j], line_width(store.radius[i], store.radius[j]), distance)
+            return
+
+        # the lines of the dots which moved apart lose their shape when they go back to the pool
+        for line in self.simulation.nearby_lines():
+            line.update_draw_object()
 
 
-def create_and_bind_app(window: pyglet.window):
+def create_and_bind_app(window: pyglet.window, force_engine: str = 'numpy', physics_backend: str = 'python',
+                        workers: int = None, profile: bool = False, profile_log: str = None,
+                        line_renderer: str = 'batched', physics_rate: float = 120, max_catch_up_steps: int = 5,
+                        physics_process: bool = False, integrator: str = 'euler', max_displacement: float = None,
+                        force_law: str = None, theta: float = 0.5, skin: float = None,
+                        color_steps: int = None, snapshot: Snapshot = None, save_path: str = None,
+                        record_path: str = None, replay_path: str = None, replay_speed: float = 1.0,
+                        scenario: Scenario = None):
     '''
         Creates an app and binds it to the given window
+
+        force_engine, physics_backend, workers: see create_simulation
+        profile: shows the time of each phase of a frame and the number of active pairs and line shapes on screen
+        profile_log: optional CSV or JSON file to which the profile of the last frames is written, see FrameProfiler
+        line_renderer: 'batched' draws all the lines with one LineRenderer, 'shapes' draws each line with its own
+            pyglet.shapes.Line
+        physics_rate, max_catch_up_steps: see App
+        physics_process: runs the physics in a PhysicsWorker process instead of between the frames
+        integrator, max_displacement: see Simulation
+        force_law, theta, skin, color_steps, snapshot: see create_simulation
+        save_path: the snapshot file to which the state is saved when S is pressed and when the window is closed
+        record_path: the directory to which the dots are recorded at every physics step, see TrajectoryRecorder
+        replay_path: the directory of a recording to play back instead of running the physics (the physics options
+            are then ignored). Space pauses, left and right seek by a second, up and down change the speed, home
+            goes back to the start
+        replay_speed: the speed of the replay, see Replay
+        scenario: the Scenario of the dots, the force law, the environment and the lines, see create_simulation
     '''
+    scenario = DEFAULT_SCENARIO if scenario is None else scenario
+    color_steps = scenario.lines.color_steps if color_steps is None else color_steps
 
     background = pyglet.image.load(script_dir + '/../images/starry_sky_3.png')
     background_sprite = pyglet.sprite.Sprite(background)
@@ -134,26 +254,172 @@ def create_and_bind_app(window: pyglet.window):
     line_batch = pyglet.graphics.Batch()
     dot_batch = pyglet.graphics.Batch()
 
-    dots, lines = create_dots_and_lines(window, line_batch, dot_batch)
-
     mouse = create_and_bind_mouse(window)
-    dot_updater = EnvironmentDotUpdater(window.width, window.height)
 
-    app = App(background_sprite, dots, lines, mouse,
-              dot_updater, line_batch, dot_batch)
+    if line_renderer == 'batched':
+        lines = scenario.lines
+        renderer = LineRenderer(line_batch, lines.color, lines.min_scale_length, lines.max_scale_length,
+                                color_steps=color_steps)
+    elif line_renderer == 'shapes':
+        renderer = None
+    else:
+        raise ValueError(f'Unknown line renderer: {line_renderer}')
+
+    if physics_process and renderer is None:
+        raise ValueError('The physics process only works with the batched line renderer')
+    if physics_process and (save_path is not None or record_path is not None):
+        raise ValueError('The state of a physics process cannot be saved or recorded')
+
+    reader = None
+    if replay_path is not None:
+        if renderer is None or physics_process or record_path is not None:
+            raise ValueError('The replay only works with the batched line renderer, without physics or recording')
+        reader = TrajectoryReader(replay_path)
+        # the dots of the first tick, with their radius, only to create the sprites; the physics never runs
+        snapshot = reader.snapshot(0)
+        force_engine, physics_backend, skin = 'numpy', 'python', None
+
+    # the lines of the simulation only need a draw object when they draw themselves
+    simulation = create_simulation(window.width, window.height, force_engine=force_engine,
+                                   physics_backend=physics_backend, workers=workers, mouse=mouse,
+                                   dot_image=load_dot_image(), dot_batch=dot_batch,
+                                   line_batch=line_batch if renderer is None else None,
+                                   integrator=integrator, max_displacement=max_displacement, force_law=force_law,
+                                   theta=theta, skin=skin, color_steps=color_steps, snapshot=snapshot,
+                                   scenario=scenario)
+    report_backend(simulation)
+
+    profiler = FrameProfiler(log_path=profile_log) if profile or profile_log else NULL_PROFILER
+    simulation.profiler = profiler
+
+    app = App(background_sprite, simulation, line_batch, dot_batch, profiler=profiler, line_renderer=renderer,
+              dot_renderer=DotRenderer(simulation.dots), physics_rate=physics_rate,
+              max_catch_up_steps=max_catch_up_steps)
+    if reader is not None:
+        updater = simulation.dot_updater
+        app.replay = Replay(reader, updater.width + 2 * updater.margin, updater.height + 2 * updater.margin,
+                            speed=replay_speed)
+    if record_path is not None:
+        app.recorder = TrajectoryRecorder.for_simulation(record_path, simulation, app.timestep.delta_time)
+
+    if physics_process:
+        # the worker creates its own simulation, the same seed (or snapshot) gives both the same dots
+        app.physics_worker = PhysicsWorker(window.width, window.height, dot_count=len(simulation.dots),
+                                           rate=physics_rate, max_steps=max_catch_up_steps, force_engine=force_engine,
+                                           physics_backend=physics_backend, workers=workers, seed=simulation.seed,
+                                           integrator=integrator, max_displacement=max_displacement,
+                                           force_law=force_law, theta=theta, skin=skin, snapshot=snapshot,
+                                           scenario=scenario)
+        app.physics_worker.start(simulation.store.x, simulation.store.y)
+
+    @window.event
+    def on_key_press(symbol, modifiers):
+        key = pyglet.window.key
+        if symbol == key.S and save_path is not None:
+            app.save(save_path)
+
+        replay = app.replay
+        if replay is None:
+            return
+        if symbol == key.SPACE:
+            replay.toggle_pause()
+        elif symbol in (key.LEFT, key.RIGHT):
+            second = 1 / replay.delta_time
+            replay.seek(replay.position + (second if symbol == key.RIGHT else -second))
+        elif symbol == key.UP:
+            replay.speed *= 2
+        elif symbol == key.DOWN:
+            replay.speed /= 2
+        elif symbol == key.HOME:
+            replay.seek(0)
+
+    @window.event
+    def on_close():
+        if app.physics_worker is not None:
+            app.physics_worker.close()
+        if save_path is not None:
+            app.save(save_path)
+        if app.recorder is not None:
+            app.recorder.close()
 
     fps_display = pyglet.window.FPSDisplay(window)
 
+    profile_label = pyglet.text.Label('', x=10, y=window.height - 10, anchor_y='top', multiline=True, width=400,
+                                      font_size=10)
+    frame_count = 0
+    last_frame = time.perf_counter()
+
     @window.event
     def on_draw():
+        nonlocal frame_count, last_frame
+        # the physics catches up with the time of the frame in fixed steps, right before the frame is drawn
+        now = time.perf_counter()
+        app.update_state(now - last_frame)
+        last_frame = now
+
         window.clear()
         app.draw()
         fps_display.draw()
 
-    pyglet.clock.schedule_interval(app.update_state, 1/120)
+        if profile:
+            frame_count += 1
+            # changing the text of a label is slow, so the overlay is refreshed a few times per second
+            if frame_count % 30 == 0:
+                profile_label.text = profiler.report()
+            profile_label.draw()
+        profiler.end_frame()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dots and lines')
+    parser.add_argument('--force-engine', choices=['numpy', 'lines', 'barnes-hut'], default='numpy',
+                        help='how the forces between the dots are applied')
+    parser.add_argument('--scenario', default=None,
+                        help='TOML file with the tuning of the dots, the force law, the environment and the lines')
+    parser.add_argument('--force-law', choices=['spring', 'gravity'], default=None,
+                        help='the springs between nearby dots or a long-range attraction between every pair of dots '
+                             '(defaults to the one of the scenario)')
+    parser.add_argument('--theta', type=float, default=0.5, help='opening angle of the barnes-hut force engine')
+    parser.add_argument('--backend', choices=['python', 'numba', 'parallel'], default='python',
+                        help='runs the physics step in Python/NumPy, with numba or with numba on several cores')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of threads of the parallel backend, at most and by default the threads '
+                             'of numba (the number of cores, or NUMBA_NUM_THREADS)')
+    parser.add_argument('--line-renderer', choices=['batched', 'shapes'], default='batched',
+                        help='draws all the lines from one vertex list or each line as a pyglet.shapes.Line')
+    parser.add_argument('--color-steps', type=int, default=None,
+                        help='number of steps in which the lines fade out with their length (defaults to the one '
+                             'of the scenario)')
+    parser.add_argument('--physics-rate', type=float, default=120,
+                        help='physics steps per simulated second, independent of the frame rate')
+    parser.add_argument('--max-catch-up-steps', type=int, default=5,
+                        help='maximum number of physics steps per frame, the simulation slows down beyond it')
+    parser.add_argument('--skin', type=float, default=None,
+                        help='finds the pairs of dots with a neighbour list of this skin instead of the grid')
+    parser.add_argument('--integrator', choices=list(INTEGRATORS), default='euler',
+                        help='how the dots are advanced by a physics step')
+    parser.add_argument('--max-displacement', type=float, default=None,
+                        help='splits the physics steps into substeps in which the largest acceleration moves a dot '
+                             'at most this distance')
+    parser.add_argument('--physics-process', action='store_true',
+                        help='runs the physics in a separate process, so a slow step does not drop frames')
+    parser.add_argument('--load', default=None, help='snapshot to start from, instead of random dots')
+    parser.add_argument('--save', default=None,
+                        help='snapshot file to which the state is saved when S is pressed and when the window closes')
+    parser.add_argument('--record', default=None,
+                        help='directory to which the dots are recorded at every physics step, for the analysis')
+    parser.add_argument('--replay', default=None,
+                        help='directory of a recording to play back without running the physics')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='recorded seconds played per second, negative to play backwards')
+    parser.add_argument('--profile', action='store_true',
+                        help='shows the time of each phase of a frame on screen')
+    parser.add_argument('--profile-log', default=None,
+                        help='CSV or JSON file to which the profile of the last frames is written')
+    args = parser.parse_args()
+    # the scenario is read and checked before the window is opened
+    scenario = load_scenario(args.scenario) if args.scenario is not None else DEFAULT_SCENARIO
+
     # Create a pyglet window 
     window = pyglet.window.Window(width=1000, height=800, fullscreen=True)
     # Hack, pyglet has a bug that on MacOS it sometimes fails to focus on the window
@@ -161,7 +427,15 @@ if __name__ == '__main__':
     window.set_fullscreen(False)
     
     # Create an app and bind it to the window 
-    create_and_bind_app(window)
+    create_and_bind_app(window, force_engine=args.force_engine, physics_backend=args.backend, workers=args.workers,
+                        profile=args.profile, profile_log=args.profile_log, line_renderer=args.line_renderer,
+                        physics_rate=args.physics_rate, max_catch_up_steps=args.max_catch_up_steps,
+                        physics_process=args.physics_process, integrator=args.integrator,
+                        max_displacement=args.max_displacement, force_law=args.force_law, theta=args.theta,
+                        skin=args.skin, color_steps=args.color_steps,
+                        snapshot=load_snapshot(args.load) if args.load is not None else None, save_path=args.save,
+                        record_path=args.record, replay_path=args.replay, replay_speed=args.replay_speed,
+                        scenario=scenario)
 
     # Play background music
     player = pyglet.media.Player()
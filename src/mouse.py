@@ -1,3 +1,5 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
 from vector import TwoDimensionalVector
 import pyglet
 
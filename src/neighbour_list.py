@@ -0,0 +1,73 @@
+from spatial_grid import SpatialGrid, close_pairs
+import numpy as np
+
+
+class NeighbourList:
+    '''
+        A Verlet neighbour list: keeps the pairs of dots within cutoff + skin and only looks for new pairs when
+        some dot moved more than skin / 2 since the last rebuild. Until then no two dots can have come from
+        further than cutoff + skin to within cutoff, so the kept pairs still hold every pair within cutoff.
+
+        grid:
+            the SpatialGrid of the simulation. Its area is used for the grid of the rebuilds, whose cells are
+            at least cutoff + skin large
+        cutoff:
+            the largest distance asked for with pairs_within, e.g. DotForceCalculator.max_distance
+        skin:
+            the extra distance of the kept pairs. A larger skin means fewer rebuilds but more pairs to check
+            at every step
+
+        pairs_within has the interface of SpatialGrid.pairs_within, so a NeighbourList can be given to the force
+        engines instead of the grid. rebuilds counts the rebuilds since the list was created.
+    '''
+
+    def __init__(self, grid: SpatialGrid, cutoff: float, skin: float):
+        self.cutoff = cutoff
+        self.skin = skin
+        cell_size = max(grid.cell_size, cutoff + skin)
+        self.grid = SpatialGrid(cell_size, grid.min_x, grid.min_y,
+                                grid.min_x + grid.columns * grid.cell_size, grid.min_y + grid.rows * grid.cell_size)
+        self.first = np.zeros(0, dtype=np.intp)
+        self.second = np.zeros(0, dtype=np.intp)
+        self.rebuilds = 0
+        # the positions of the dots at the last rebuild
+        self._x = None
+        self._y = None
+
+    def needs_rebuild(self, x: np.ndarray, y: np.ndarray) -> bool:
+        '''
+            Returns whether a dot moved more than skin / 2 since the last rebuild (or the dots changed)
+        '''
+        if self._x is None or len(self._x) != len(x):
+            return True
+        moved = (x - self._x) ** 2 + (y - self._y) ** 2
+        return bool(moved.max(initial=0.0) > (self.skin / 2) ** 2)
+
+    def rebuild(self, x: np.ndarray, y: np.ndarray):
+        '''
+            Finds the pairs of dots within cutoff + skin
+        '''
+        i, j, _ = self.grid.pairs_within(x, y, self.cutoff + self.skin)
+        # sorted by first dot, so the forces of a dot are summed one after the other
+        order = np.argsort(i, kind='stable')
+        self.first, self.second = i[order], j[order]
+        self._x = x.copy()
+        self._y = y.copy()
+        self.rebuilds += 1
+
+    def pairs(self, x: np.ndarray, y: np.ndarray) -> tuple:
+        '''
+            Returns the kept pairs (i, j), after a rebuild when needed. They hold every pair within cutoff
+        '''
+        if self.needs_rebuild(x, y):
+            self.rebuild(x, y)
+        return self.first, self.second
+
+    def pairs_within(self, x: np.ndarray, y: np.ndarray, distance: float) -> tuple:
+        '''
+            Finds every pair of dots that are at most distance apart. distance must not be larger than cutoff.
+
+            Returns a tuple of arrays (i, j, pair_distance)
+        '''
+        i, j = self.pairs(x, y)
+        return close_pairs(x, y, i, j, distance)
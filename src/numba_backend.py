@@ -0,0 +1,409 @@
+from line import DotForceCalculator
+from dot_updater import EnvironmentDotUpdater
+from particle_store import ParticleStore
+from spatial_grid import SpatialGrid
+from neighbour_list import NeighbourList
+from mouse import Mouse
+import numpy as np
+import math
+import time
+
+try:
+    from numba import njit, prange, get_num_threads, set_num_threads, config as numba_config
+    NUMBA_AVAILABLE = True
+    # numba cannot use more threads than it started with (the cores, or NUMBA_NUM_THREADS)
+    MAX_WORKERS = numba_config.NUMBA_NUM_THREADS
+except ImportError:
+    NUMBA_AVAILABLE = False
+    MAX_WORKERS = 1
+    prange = range
+
+    def njit(*args, **kwargs):
+        '''
+            Stand-in for numba.njit when numba is not installed: the functions stay plain Python
+        '''
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+@njit(cache=True)
+def sort_into_cells(x, y, min_x, min_y, cell_size, columns, rows):
+    '''
+        Counting sort of the dots into the cells of a uniform grid, see SpatialGrid. Dots outside the grid are put
+        in the nearest border cell.
+
+        Returns (order, start): the dots of cell c are order[start[c]:start[c + 1]]
+    '''
+    n = x.shape[0]
+    cell = np.empty(n, np.int64)
+    start = np.zeros(columns * rows + 1, np.int64)
+    for k in range(n):
+        column = min(max(int(math.floor((x[k] - min_x) / cell_size)), 0), columns - 1)
+        row = min(max(int(math.floor((y[k] - min_y) / cell_size)), 0), rows - 1)
+        cell[k] = row * columns + column
+        start[cell[k] + 1] += 1
+
+    for c in range(columns * rows):
+        start[c + 1] += start[c]
+
+    order = np.empty(n, np.int64)
+    filled = start[:-1].copy()
+    for k in range(n):
+        order[filled[cell[k]]] = k
+        filled[cell[k]] += 1
+    return order, start
+
+
+@njit(cache=True)
+def _pair_force(i, j, x, y, neutral_distance, max_distance, force_coefficient):
+    '''
+        Protected function to return the force of DotForceCalculator on dot i from dot j, like Line.update_state,
+        and 1 when the dots are close enough to apply a force on each other (0 otherwise). Dot j gets the
+        opposite force.
+    '''
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    distance = math.sqrt(dx * dx + dy * dy)
+    if distance > max_distance or distance == 0.0:
+        return 0.0, 0.0, 0
+    strength = force_coefficient * (distance - neutral_distance) / distance
+    return strength * dx, strength * dy, 1
+
+
+@njit(cache=True)
+def pair_forces(x, y, fx, fy, neutral_distance, max_distance, force_coefficient,
+                min_x, min_y, cell_size, columns, rows):
+    '''
+        Adds the forces between all the pairs of dots within max_distance to fx and fy, using a cell list with
+        cells of cell_size (at least max_distance) to skip the pairs that are far apart. The force on the outer dot
+        is summed in locals and written once, and each dot only visits the neighbouring cells after its own, so
+        every pair is handled once
+
+        Returns the number of pairs within max_distance (for the profiler)
+    '''
+    order, start = sort_into_cells(x, y, min_x, min_y, cell_size, columns, rows)
+    active_pairs = 0
+
+    for row in range(rows):
+        for column in range(columns):
+            cell = row * columns + column
+            for a in range(start[cell], start[cell + 1]):
+                i = order[a]
+                force_x = 0.0
+                force_y = 0.0
+                # pairs inside the cell
+                for b in range(a + 1, start[cell + 1]):
+                    j = order[b]
+                    pair_x, pair_y, active = _pair_force(i, j, x, y, neutral_distance, max_distance, force_coefficient)
+                    active_pairs += active
+                    force_x += pair_x
+                    force_y += pair_y
+                    fx[j] -= pair_x
+                    fy[j] -= pair_y
+
+                # pairs with the neighbouring cells that come after this cell, so every pair of cells is visited once
+                for neighbour_row in range(row, min(row + 2, rows)):
+                    for neighbour_column in range(max(column - 1, 0), min(column + 2, columns)):
+                        neighbour = neighbour_row * columns + neighbour_column
+                        if neighbour <= cell:
+                            continue
+                        for b in range(start[neighbour], start[neighbour + 1]):
+                            j = order[b]
+                            pair_x, pair_y, active = _pair_force(i, j, x, y, neutral_distance, max_distance,
+                                                                 force_coefficient)
+                            active_pairs += active
+                            force_x += pair_x
+                            force_y += pair_y
+                            fx[j] -= pair_x
+                            fy[j] -= pair_y
+
+                fx[i] += force_x
+                fy[i] += force_y
+
+    return active_pairs
+
+
+@njit(cache=True)
+def listed_pair_forces(x, y, fx, fy, first, second, neutral_distance, max_distance, force_coefficient):
+    '''
+        Same as pair_forces for the pairs (first[k], second[k]) of a NeighbourList instead of the pairs found
+        with the cells
+
+        Returns the number of pairs within max_distance
+    '''
+    active_pairs = 0
+    for k in range(first.shape[0]):
+        i = first[k]
+        j = second[k]
+        pair_x, pair_y, active = _pair_force(i, j, x, y, neutral_distance, max_distance, force_coefficient)
+        active_pairs += active
+        fx[i] += pair_x
+        fy[i] += pair_y
+        fx[j] -= pair_x
+        fy[j] -= pair_y
+    return active_pairs
+
+
+@njit(parallel=True, cache=True)
+def parallel_pair_forces(x, y, fx, fy, neutral_distance, max_distance, force_coefficient,
+                         min_x, min_y, cell_size, columns, rows):
+    '''
+        Same as pair_forces, with each row of cells (a tile) handled by its own thread. Every dot sums up the forces
+        from all its neighbours and only writes its own force, so the threads never write to the same dot. The price
+        is that every pair is computed twice, once for each dot.
+
+        Returns the number of pairs within max_distance
+    '''
+    order, start = sort_into_cells(x, y, min_x, min_y, cell_size, columns, rows)
+    # each tile counts its own pairs, so the threads do not share a counter
+    active_pairs = np.zeros(rows, np.int64)
+
+    for row in prange(rows):
+        for column in range(columns):
+            cell = row * columns + column
+            for a in range(start[cell], start[cell + 1]):
+                i = order[a]
+                force_x = 0.0
+                force_y = 0.0
+                for neighbour_row in range(max(row - 1, 0), min(row + 2, rows)):
+                    for neighbour_column in range(max(column - 1, 0), min(column + 2, columns)):
+                        neighbour = neighbour_row * columns + neighbour_column
+                        for b in range(start[neighbour], start[neighbour + 1]):
+                            j = order[b]
+                            dx = x[j] - x[i]
+                            dy = y[j] - y[i]
+                            distance = math.sqrt(dx * dx + dy * dy)
+                            # this also skips j == i
+                            if distance > max_distance or distance == 0.0:
+                                continue
+                            strength = force_coefficient * (distance - neutral_distance) / distance
+                            force_x += strength * dx
+                            force_y += strength * dy
+                            active_pairs[row] += 1
+                fx[i] += force_x
+                fy[i] += force_y
+
+    # every pair was counted by both of its dots
+    return active_pairs.sum() // 2
+
+
+@njit(cache=True)
+def _fmod_positive(x, y):
+    '''
+        Protected function for the positive remainder used by EnvironmentDotUpdater (numba has no math.fmod)
+    '''
+    return np.fmod(np.fmod(x, y) + y, y)
+
+
+@njit(cache=True)
+def environment_forces(x, y, vx, vy, fx, fy, mouse_pressed, mouse_x, mouse_y, mouse_force_scale, max_mouse_force,
+                       max_speed):
+    '''
+        Same as EnvironmentDotUpdater.add_forces_all: the mouse repulsion and the velocity limiter
+    '''
+    for k in range(x.shape[0]):
+        if mouse_pressed:
+            dx = x[k] - mouse_x
+            dy = y[k] - mouse_y
+            distance = math.sqrt(dx * dx + dy * dy)
+            if distance > 0.0:
+                force_magnitude = min((1 / distance) ** 2 * mouse_force_scale, max_mouse_force)
+                fx[k] += dx / distance * force_magnitude
+                fy[k] += dy / distance * force_magnitude
+
+        if math.sqrt(vx[k] * vx[k] + vy[k] * vy[k]) > max_speed:
+            fx[k] -= vx[k]
+            fy[k] -= vy[k]
+
+
+@njit(cache=True)
+def wrap_positions(x, y, width, height, margin):
+    '''
+        Same as EnvironmentDotUpdater.wrap_all: the wrap around the window
+    '''
+    for k in range(x.shape[0]):
+        x[k] = _fmod_positive(x[k] + margin, width + 2 * margin) - margin
+        y[k] = _fmod_positive(y[k] + margin, height + 2 * margin) - margin
+
+
+@njit(cache=True)
+def integrate(x, y, vx, vy, fx, fy, delta_time):
+    '''
+        Same as Dot.update_state for all the dots: explicit Euler, then the forces are set back to 0
+    '''
+    for k in range(x.shape[0]):
+        x[k] += vx[k] * delta_time
+        y[k] += vy[k] * delta_time
+        vx[k] += fx[k] * delta_time
+        vy[k] += fy[k] * delta_time
+        fx[k] = 0.0
+        fy[k] = 0.0
+
+
+class NumbaPhysicsBackend:
+    '''
+        Runs the whole physics step of the app (the forces between the dots, EnvironmentDotUpdater and the
+        integration) as compiled functions on the ParticleStore columns. The compiled functions are cached on disk,
+        so only the first launch pays for the compilation. When numba is not installed the same functions run as
+        plain Python, which gives the same result but is slow (see NUMBA_AVAILABLE).
+
+        dot_force_calculator:
+            maps the dot distance to force magnitude
+        dot_updater:
+            provides the window size and the constants of the environment updates
+        grid:
+            provides the cells used to find the pairs of dots within max_distance
+        neighbour_list:
+            an optional NeighbourList. With it, the forces are computed for its pairs instead of the pairs in the
+            cells of grid
+    '''
+
+    def __init__(self, dot_force_calculator: DotForceCalculator, dot_updater: EnvironmentDotUpdater, grid: SpatialGrid,
+                 neighbour_list: NeighbourList = None):
+        self.dot_force_calculator = dot_force_calculator
+        self.dot_updater = dot_updater
+        self.grid = grid
+        self.neighbour_list = neighbour_list
+        # the number of pairs within max_distance at the last apply_forces
+        self.active_pairs = 0
+
+    def _force_arguments(self, store: ParticleStore) -> tuple:
+        '''
+            Protected method to return the arguments of pair_forces and parallel_pair_forces after x, y, fx and fy
+        '''
+        calculator = self.dot_force_calculator
+        grid = self.grid
+        return (float(calculator.neutral_distance), float(calculator.max_distance), float(calculator.force_coefficient),
+                float(grid.min_x), float(grid.min_y), float(grid.cell_size), grid.columns, grid.rows)
+
+    def apply_forces(self, store: ParticleStore):
+        '''
+            Adds the forces between the dots to store.fx and store.fy
+        '''
+        if self.neighbour_list is not None:
+            self._listed_forces(store)
+            return
+        self.active_pairs = int(pair_forces(store.x, store.y, store.fx, store.fy, *self._force_arguments(store)))
+
+    def _listed_forces(self, store: ParticleStore):
+        '''
+            Protected method to add the forces between the pairs of the neighbour list
+        '''
+        first, second = self.neighbour_list.pairs(store.x, store.y)
+        calculator = self.dot_force_calculator
+        self.active_pairs = int(listed_pair_forces(store.x, store.y, store.fx, store.fy, first, second,
+                                                   float(calculator.neutral_distance), float(calculator.max_distance),
+                                                   float(calculator.force_coefficient)))
+
+    def update_environment(self, store: ParticleStore, mouse: Mouse):
+        '''
+            Applies EnvironmentDotUpdater.update to all the dots
+        '''
+        self.add_environment_forces(store, mouse)
+        self.wrap(store)
+
+    def add_environment_forces(self, store: ParticleStore, mouse: Mouse):
+        '''
+            Applies EnvironmentDotUpdater.add_forces_all to all the dots
+        '''
+        updater = self.dot_updater
+        environment_forces(store.x, store.y, store.vx, store.vy, store.fx, store.fy,
+                           mouse.pressed, float(mouse.position.x), float(mouse.position.y),
+                           float(updater.mouse_force_scale), float(updater.max_mouse_force), float(updater.max_speed))
+
+    def wrap(self, store: ParticleStore):
+        '''
+            Applies EnvironmentDotUpdater.wrap_all to all the dots
+        '''
+        updater = self.dot_updater
+        wrap_positions(store.x, store.y, float(updater.width), float(updater.height), float(updater.margin))
+
+    def integrate(self, store: ParticleStore, delta_time: float):
+        '''
+            Applies Dot.update_state to all the dots
+        '''
+        integrate(store.x, store.y, store.vx, store.vy, store.fx, store.fy, float(delta_time))
+
+    def step(self, store: ParticleStore, mouse: Mouse, delta_time: float):
+        '''
+            Advances all the dots by delta_time
+
+            store: the state of the dots
+            mouse: the mouse repelling the dots while it is pressed
+            delta_time: time since last update
+        '''
+        self.apply_forces(store)
+        self.update_environment(store, mouse)
+        self.integrate(store, delta_time)
+
+
+class ParallelPhysicsBackend(NumbaPhysicsBackend):
+    '''
+        A NumbaPhysicsBackend which computes the forces between the dots on several cores, see parallel_pair_forces.
+        Without numba it runs on one core as plain Python.
+
+        workers:
+            the number of threads used for the forces, at most MAX_WORKERS (the threads numba started with).
+            Defaults to MAX_WORKERS. Without numba it is always 1.
+
+        With a neighbour list the forces are computed on one core, see listed_pair_forces.
+    '''
+
+    def __init__(self, dot_force_calculator: DotForceCalculator, dot_updater: EnvironmentDotUpdater, grid: SpatialGrid,
+                 workers: int = None, neighbour_list: NeighbourList = None):
+        super().__init__(dot_force_calculator, dot_updater, grid, neighbour_list)
+        if NUMBA_AVAILABLE and workers is not None and not 1 <= workers <= MAX_WORKERS:
+            raise ValueError(f'The parallel backend runs with 1 to {MAX_WORKERS} workers (the threads of numba, '
+                             f'see NUMBA_NUM_THREADS), not {workers}')
+        self.workers = workers if workers is not None and NUMBA_AVAILABLE else MAX_WORKERS
+
+    def apply_forces(self, store: ParticleStore):
+        '''
+            Adds the forces between the dots to store.fx and store.fy using self.workers threads
+        '''
+        if self.neighbour_list is not None:
+            self._listed_forces(store)
+            return
+        self.active_pairs = self._parallel_forces(store.x, store.y, store.fx, store.fy, self._force_arguments(store))
+
+    def _parallel_forces(self, x: np.ndarray, y: np.ndarray, fx: np.ndarray, fy: np.ndarray, arguments: tuple) -> int:
+        '''
+            Protected method to run parallel_pair_forces with self.workers threads
+
+            Returns the number of pairs within max_distance
+        '''
+        if not NUMBA_AVAILABLE:
+            return int(parallel_pair_forces(x, y, fx, fy, *arguments))
+
+        threads = get_num_threads()
+        set_num_threads(self.workers)
+        try:
+            return int(parallel_pair_forces(x, y, fx, fy, *arguments))
+        finally:
+            set_num_threads(threads)
+
+    def measure_speedup(self, store: ParticleStore, repeats: int = 5) -> float:
+        '''
+            Times the forces of the serial path (pair_forces) against the parallel one on the dots of store. The
+            forces are written to scratch arrays, store is not changed. The first run of each is not timed, so the
+            compilation does not count.
+
+            Returns how many times faster the parallel path is
+        '''
+        arguments = self._force_arguments(store)
+        fx = np.zeros(store.count)
+        fy = np.zeros(store.count)
+
+        def best_time(function) -> float:
+            function()
+            times = []
+            for _ in range(repeats):
+                begin = time.perf_counter()
+                function()
+                times.append(time.perf_counter() - begin)
+            return min(times)
+
+        serial = best_time(lambda: pair_forces(store.x, store.y, fx, fy, *arguments))
+        parallel = best_time(lambda: self._parallel_forces(store.x, store.y, fx, fy, arguments))
+        return serial / parallel
@@ -0,0 +1,146 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from vector import TwoDimensionalVector
+import numpy as np
+
+
+class ParticleStore:
+    '''
+        Stores the state of all the dots as contiguous NumPy columns (structure of arrays), so that the hot loops
+        can work on flat buffers instead of allocating a TwoDimensionalVector for every update.
+
+        x, y:
+            position of the dots
+        vx, vy:
+            velocity of the dots
+        fx, fy:
+            force accumulated on the dots since the last update
+        radius:
+            radius of the dots
+        count:
+            the number of dots in the store
+
+        The columns are views of length count into larger buffers. They are replaced when the store grows, so do
+        not keep a reference to a column across calls to add.
+    '''
+
+    COLUMNS = ('x', 'y', 'vx', 'vy', 'fx', 'fy', 'radius')
+
+    def __init__(self, capacity: int = 16):
+        self.count = 0
+        self._buffers = {name: np.zeros(max(capacity, 1)) for name in self.COLUMNS}
+        self._update_views()
+
+    @classmethod
+    def from_columns(cls, x: np.ndarray, y: np.ndarray, vx: np.ndarray, vy: np.ndarray,
+                     radius: np.ndarray) -> ParticleStore:
+        '''
+            Creates a store holding the dots of the given columns (copied), with no force, in one go instead of
+            one add per dot
+        '''
+        store = cls(capacity=len(x))
+        for name, column in (('x', x), ('y', y), ('vx', vx), ('vy', vy), ('radius', radius)):
+            store._buffers[name][:len(x)] = column
+        store.count = len(x)
+        store._update_views()
+        return store
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _update_views(self):
+        '''
+            Protected method to point the public columns at the first count entries of the buffers
+        '''
+        for name in self.COLUMNS:
+            setattr(self, name, self._buffers[name][:self.count])
+
+    def _grow(self, capacity: int):
+        '''
+            Protected method to reallocate the buffers with the given capacity, keeping the existing dots
+        '''
+        for name in self.COLUMNS:
+            buffer = np.zeros(capacity)
+            buffer[:self.count] = self._buffers[name][:self.count]
+            self._buffers[name] = buffer
+
+    def add(self, x: float, y: float, vx: float, vy: float, radius: float) -> int:
+        '''
+            Adds a dot to the store. The force of the new dot starts at 0.
+
+            Returns the index of the new dot
+        '''
+        index = self.count
+        if index == len(self._buffers['x']):
+            # doubling keeps adding n dots O(n) overall
+            self._grow(2 * index)
+
+        self._buffers['x'][index] = x
+        self._buffers['y'][index] = y
+        self._buffers['vx'][index] = vx
+        self._buffers['vy'][index] = vy
+        self._buffers['fx'][index] = 0.0
+        self._buffers['fy'][index] = 0.0
+        self._buffers['radius'][index] = radius
+
+        self.count += 1
+        self._update_views()
+        return index
+
+    def clear_forces(self):
+        '''
+            Sets the force of every dot back to 0
+        '''
+        self.fx[:] = 0.0
+        self.fy[:] = 0.0
+
+    def integrate(self, delta_time: float):
+        '''
+            Updates the position and velocity of every dot at once. This is the same explicit Euler step as
+            Dot.update_state, run on the whole columns.
+
+            delta_time: time since last update
+        '''
+        self.x += self.vx * delta_time
+        self.y += self.vy * delta_time
+        self.vx += self.fx * delta_time
+        self.vy += self.fy * delta_time
+        self.clear_forces()
+
+
+class ParticleVector(TwoDimensionalVector):
+    '''
+        A TwoDimensionalVector that reads and writes two columns of a ParticleStore for one dot, so that code
+        like dot.position.x = ... keeps working on top of the store.
+
+        store:
+            the ParticleStore holding the dot
+        x_column, y_column:
+            names of the columns backing x and y, e.g. 'vx' and 'vy'
+        index:
+            the index of the dot in the store
+    '''
+
+    __slots__ = ('store', 'x_column', 'y_column', 'index')
+
+    def __init__(self, store: ParticleStore, x_column: str, y_column: str, index: int):
+        self.store = store
+        self.x_column = x_column
+        self.y_column = y_column
+        self.index = index
+
+    @property
+    def x(self) -> float:
+        return float(getattr(self.store, self.x_column)[self.index])
+
+    @x.setter
+    def x(self, value: float):
+        getattr(self.store, self.x_column)[self.index] = value
+
+    @property
+    def y(self) -> float:
+        return float(getattr(self.store, self.y_column)[self.index])
+
+    @y.setter
+    def y(self, value: float):
+        getattr(self.store, self.y_column)[self.index] = value
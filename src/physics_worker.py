@@ -0,0 +1,176 @@
+from multiprocessing import shared_memory
+from fixed_timestep import FixedTimestep
+from mouse import Mouse
+from simulation import create_simulation
+import multiprocessing
+import numpy as np
+import time
+
+# slots of the header of the shared block
+FRONT = 0
+TICK = 1
+STOP = 2
+MOUSE_PRESSED = 3
+MOUSE_X = 4
+MOUSE_Y = 5
+# the sequence numbers of the two position buffers, odd while the worker writes the buffer
+SEQUENCE = 6
+HEADER_SIZE = 8
+
+# how many times positions tries to copy the front buffer before it shows the last frame again
+READ_ATTEMPTS = 3
+
+
+def _block(buffer, dot_count: int) -> tuple:
+    '''
+        Returns the header and the two position buffers (each of shape (2, dot_count), x then y) of a shared block
+    '''
+    data = np.ndarray((HEADER_SIZE + 2 * 2 * dot_count,), dtype=np.float64, buffer=buffer)
+    return data[:HEADER_SIZE], data[HEADER_SIZE:].reshape(2, 2, dot_count)
+
+
+def _run_worker(name: str, width: float, height: float, dot_count: int, rate: float, max_steps: int,
+                options: dict):
+    '''
+        The loop of the worker process: runs the simulation in fixed steps in real time and publishes the positions
+        after each batch of steps, until the STOP slot is set
+    '''
+    memory = shared_memory.SharedMemory(name=name)
+    header, buffers = _block(memory.buf, dot_count)
+    try:
+        simulation = create_simulation(width, height, dot_count=dot_count, mouse=Mouse(), **options)
+        mouse = simulation.mouse
+
+        def step(delta_time: float):
+            mouse.pressed = bool(header[MOUSE_PRESSED])
+            mouse.position.x = header[MOUSE_X]
+            mouse.position.y = header[MOUSE_Y]
+            simulation.step(delta_time)
+
+        timestep = FixedTimestep(step, rate=rate, max_steps=max_steps)
+        last = time.perf_counter()
+        while not header[STOP]:
+            now = time.perf_counter()
+            steps = timestep.advance(now - last)
+            last = now
+
+            if steps:
+                # the back buffer is written and then flipped to the front. Its sequence number is odd while it is
+                # written, so a reader still copying it (from before the last flip) sees that its copy is torn
+                back = 1 - int(header[FRONT])
+                header[SEQUENCE + back] += 1
+                buffers[back, 0] = simulation.store.x
+                buffers[back, 1] = simulation.store.y
+                header[SEQUENCE + back] += 1
+                header[TICK] += steps
+                header[FRONT] = back
+            else:
+                time.sleep(timestep.delta_time - timestep.accumulator)
+    finally:
+        del header, buffers
+        memory.close()
+
+
+class PhysicsWorker:
+    '''
+        Runs a simulation in a separate process, so a slow physics step does not drop frames. The positions are
+        published in a double-buffered block of shared memory which the renderer copies without locking, and the
+        mouse is forwarded through a few slots of the same block.
+
+        width, height, dot_count:
+            see create_simulation
+        rate:
+            the number of physics steps per second, see FixedTimestep. The worker runs in real time
+        max_steps:
+            the maximum number of steps the worker runs to catch up, see FixedTimestep
+        options:
+            the other arguments of create_simulation (force_engine, physics_backend, workers, seed). Pass a seed
+            and use the same one for the simulation which draws the dots, so both have the same dots
+
+        The worker writes the positions to the back buffer and then flips FRONT. When a draw takes longer than a
+        physics step, the worker may already write the buffer which positions is reading, so each buffer has a
+        sequence number (a seqlock): positions keeps its copy only when the number was even and did not change
+        during the copy, and otherwise tries again or shows the last frame again.
+    '''
+
+    def __init__(self, width: float, height: float, dot_count: int = 100, rate: float = 120, max_steps: int = 5,
+                 **options):
+        self.dot_count = dot_count
+        self._memory = shared_memory.SharedMemory(create=True,
+                                                  size=8 * (HEADER_SIZE + 2 * 2 * dot_count))
+        self._header, self._buffers = _block(self._memory.buf, dot_count)
+        self._header[:] = 0.0
+        # the copies of the last frame returned by positions and the one being filled, swapped after each copy
+        self._positions = np.zeros((2, dot_count))
+        self._scratch = np.zeros((2, dot_count))
+
+        # spawn does not copy the window and GL state of this process into the worker
+        context = multiprocessing.get_context('spawn')
+        self._process = context.Process(target=_run_worker, daemon=True,
+                                        args=(self._memory.name, width, height, dot_count, rate, max_steps, options))
+
+    def start(self, x: np.ndarray = None, y: np.ndarray = None):
+        '''
+            Starts the worker
+
+            x, y: the positions shown until the worker published its first step, e.g. the positions of the dots of
+                the simulation created with the same seed
+        '''
+        if x is not None:
+            self._buffers[:, 0] = x
+            self._buffers[:, 1] = y
+            self._positions[0] = x
+            self._positions[1] = y
+        self._process.start()
+
+    @property
+    def tick(self) -> int:
+        '''
+            The number of steps run by the worker so far
+        '''
+        return int(self._header[TICK])
+
+    def positions(self) -> tuple:
+        '''
+            Returns the x and y positions of the last published step, copied out of the shared memory so they do
+            not change while they are drawn. The arrays stay valid until the next call after this one
+        '''
+        header = self._header
+        for _ in range(READ_ATTEMPTS):
+            front = int(header[FRONT])
+            sequence = header[SEQUENCE + front]
+            if sequence % 2:
+                continue
+            np.copyto(self._scratch, self._buffers[front])
+            if header[SEQUENCE + front] == sequence:
+                self._positions, self._scratch = self._scratch, self._positions
+                break
+        # after READ_ATTEMPTS torn copies, the positions of the last frame are shown again
+        return self._positions[0], self._positions[1]
+
+    def send_mouse(self, mouse: Mouse):
+        '''
+            Forwards the state of the mouse to the worker, which reads it before each step
+        '''
+        self._header[MOUSE_X] = mouse.position.x
+        self._header[MOUSE_Y] = mouse.position.y
+        self._header[MOUSE_PRESSED] = float(mouse.pressed)
+
+    def stop(self, timeout: float = 5):
+        '''
+            Stops the worker. The last published positions can still be read
+        '''
+        self._header[STOP] = 1.0
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+
+    def close(self):
+        '''
+            Stops the worker and frees the shared memory
+        '''
+        if self._process.is_alive():
+            self.stop()
+        self._header = self._buffers = None
+        self._memory.close()
+        self._memory.unlink()
@@ -0,0 +1,167 @@
+import collections
+import csv
+import json
+import time
+
+
+class _Phase:
+    '''
+        Context manager timing one phase of a frame, see FrameProfiler.phase
+    '''
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.begin = 0.0
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.add(self.name, time.perf_counter() - self.begin)
+        return False
+
+
+class FrameProfiler:
+    '''
+        Times the phases of each frame (e.g. the forces, the integration, the draws) and keeps the last frames to
+        show rolling averages on screen and to write them to a log file.
+
+        history:
+            the number of frames kept for the averages and the log
+        log_path:
+            optional path of the log. A .json path is written as a list of frames, anything else as CSV. The log
+            holds the last history frames and is rewritten every log_every frames.
+        log_every:
+            how often the log is written, in frames
+
+        Phases are timed with
+
+            with profiler.phase('forces'):
+                ...
+
+        and counts (e.g. the number of active pairs) are set with profiler.count. A phase which runs several times
+        in a frame (e.g. two physics steps) adds up. end_frame closes the frame.
+    '''
+
+    enabled = True
+
+    def __init__(self, history: int = 240, log_path: str = None, log_every: int = 120):
+        self.frames = collections.deque(maxlen=history)
+        self.log_path = log_path
+        self.log_every = log_every
+        self.frame = {}
+        self.count_names = set()
+        self._frame_begin = time.perf_counter()
+        self._frames_since_log = 0
+
+    def phase(self, name: str) -> _Phase:
+        '''
+            Returns a context manager adding the time spent in it to the phase name of the current frame
+        '''
+        return _Phase(self, name)
+
+    def add(self, name: str, seconds: float):
+        '''
+            Adds seconds to the phase name of the current frame, for a time which is not measured with phase
+        '''
+        self.frame[name] = self.frame.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int):
+        '''
+            Sets a count of the current frame, e.g. the number of active pairs
+        '''
+        self.frame[name] = value
+        self.count_names.add(name)
+
+    def end_frame(self):
+        '''
+            Closes the current frame and writes the log when it is due
+        '''
+        now = time.perf_counter()
+        self.frame['frame'] = now - self._frame_begin
+        self._frame_begin = now
+        self.frames.append(self.frame)
+        self.frame = {}
+
+        self._frames_since_log += 1
+        if self.log_path is not None and self._frames_since_log >= self.log_every:
+            self.write_log()
+            self._frames_since_log = 0
+
+    def averages(self) -> dict:
+        '''
+            Returns the average of every phase and count over the kept frames
+        '''
+        totals = collections.defaultdict(float)
+        for frame in self.frames:
+            for name, value in frame.items():
+                totals[name] += value
+        return {name: total / len(self.frames) for name, total in totals.items()}
+
+    def report(self) -> str:
+        '''
+            Returns the averages as text, one line per phase (in milliseconds) or count
+        '''
+        lines = []
+        for name, value in sorted(self.averages().items()):
+            if name in self.count_names:
+                lines.append(f'{name}: {value:.0f}')
+            else:
+                lines.append(f'{name}: {value * 1000:.2f} ms')
+        return '\n'.join(lines)
+
+    def write_log(self):
+        '''
+            Writes the kept frames to log_path
+        '''
+        frames = list(self.frames)
+        if self.log_path.endswith('.json'):
+            with open(self.log_path, 'w') as file:
+                json.dump(frames, file)
+            return
+
+        names = sorted({name for frame in frames for name in frame})
+        with open(self.log_path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=names)
+            writer.writeheader()
+            writer.writerows(frames)
+
+
+class _NullPhase:
+    '''
+        Context manager which does nothing, see NullProfiler
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+class NullProfiler:
+    '''
+        A profiler which does nothing, used when profiling is disabled. phase always returns the same context
+        manager, so a disabled profiler costs about one method call per phase.
+    '''
+
+    enabled = False
+
+    _phase = _NullPhase()
+
+    def phase(self, name: str) -> _NullPhase:
+        return self._phase
+
+    def add(self, name: str, seconds: float):
+        pass
+
+    def count(self, name: str, value: int):
+        pass
+
+    def end_frame(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
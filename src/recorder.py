@@ -0,0 +1,237 @@
+'''
+    Records the positions and velocities of the dots at every physics step to a directory, and reads them back at
+    any tick, e.g. for an analysis or to replay a simulation without running its physics.
+
+        poetry run python src/sim.py --dots 5000 --steps 10000 --record run_1
+
+    A recording is a directory with
+
+        recording.json      the number of dots and ticks, the size of the chunks, the area of the dots, ...
+        radius.npy          the radius of every dot
+        chunk_000000.npz    the ticks 0 to chunk_ticks - 1, as an array of shape (ticks, 4, dots) holding x, y,
+        chunk_000001.npz    vx and vy (.npy instead of .npz for a recording which is not compressed)
+        ...
+'''
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from particle_store import ParticleStore
+from snapshot import Snapshot, describe_force_law
+import numpy as np
+import json
+import os
+import queue
+import threading
+
+# the version of the format of the recordings, saved in recording.json
+VERSION = 1
+
+# the rows of a tick in a chunk
+X, Y, VX, VY = range(4)
+
+
+def _chunk_path(path: str, chunk: int, compress: bool) -> str:
+    return os.path.join(path, f'chunk_{chunk:06d}.{"npz" if compress else "npy"}')
+
+
+class TrajectoryRecorder:
+    '''
+        Appends the state of the dots at each tick to a preallocated ring of chunks. A background thread writes the
+        full chunks to disk while the next ones are filled, so record only copies 4 columns.
+
+        path:
+            the directory of the recording, created if needed
+        store:
+            the ParticleStore of the dots (their count and radius are fixed for the whole recording)
+        chunk_ticks:
+            the number of ticks per chunk (and file)
+        chunks:
+            the number of chunks of the ring. When the writer is behind by that many chunks, record waits for it
+        compress:
+            writes the chunks compressed (.npz), or as plain .npy files which the reader memory-maps
+        dtype:
+            the type in which the columns are recorded, float32 halves the size of float64
+        metadata:
+            anything else saved in recording.json, e.g. the area of the dots or the time step
+
+        close writes the last (partial) chunk and recording.json, and waits for the writer. A recording made with
+        for_simulation also holds what TrajectoryReader.snapshot needs to restore the simulation at any tick.
+    '''
+
+    def __init__(self, path: str, store: ParticleStore, chunk_ticks: int = 256, chunks: int = 4,
+                 compress: bool = True, dtype: type = np.float32, metadata: dict = None):
+        if chunks < 2:
+            raise ValueError('The recorder needs at least 2 chunks, one to fill while the other one is written')
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dot_count = store.count
+        self.chunk_ticks = chunk_ticks
+        self.compress = compress
+        self.dtype = np.dtype(dtype)
+        self.metadata = dict(metadata or {})
+        np.save(os.path.join(path, 'radius.npy'), store.radius)
+
+        # the ring of chunks, and the chunks which can be filled again
+        self._ring = np.empty((chunks, chunk_ticks, 4, self.dot_count), dtype=self.dtype)
+        self._free = queue.Queue()
+        for chunk in range(chunks):
+            self._free.put(chunk)
+        # the full chunks waiting for the writer, as (slot in the ring, number of the chunk, ticks), None to stop
+        self._full = queue.Queue()
+        self._error = None
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+        # the number of ticks recorded so far, the chunk being filled and the number of ticks in it
+        self.ticks = 0
+        self._slot = self._free.get()
+        self._filled = 0
+
+    @classmethod
+    def for_simulation(cls, path: str, simulation, delta_time: float, **options) -> TrajectoryRecorder:
+        '''
+            Returns a recorder of the dots of a Simulation stepped by delta_time, whose metadata holds the area of
+            the dots, the time step, the seed, the first tick and the force law
+
+            options: the other arguments of TrajectoryRecorder
+        '''
+        force_law, force_parameters = describe_force_law(simulation.dot_force_calculator)
+        updater = simulation.dot_updater
+        metadata = {'width': updater.width, 'height': updater.height, 'delta_time': delta_time,
+                    'seed': simulation.seed, 'first_tick': simulation.tick, 'force_law': force_law,
+                    'force_parameters': force_parameters}
+        return cls(path, simulation.store, metadata=metadata, **options)
+
+    def record(self, store: ParticleStore):
+        '''
+            Appends the current positions and velocities of the dots of store
+        '''
+        if self._error is not None:
+            raise self._error
+        tick = self._ring[self._slot, self._filled]
+        tick[X] = store.x
+        tick[Y] = store.y
+        tick[VX] = store.vx
+        tick[VY] = store.vy
+        self._filled += 1
+        self.ticks += 1
+
+        if self._filled == self.chunk_ticks:
+            self._full.put((self._slot, self.ticks // self.chunk_ticks - 1, self._filled))
+            self._slot = self._free.get()
+            self._filled = 0
+
+    def close(self):
+        '''
+            Writes the last chunk and the metadata of the recording, and stops the writer
+        '''
+        if self._filled:
+            self._full.put((self._slot, self.ticks // self.chunk_ticks, self._filled))
+        self._filled = 0
+        self._full.put(None)
+        self._writer.join()
+        if self._error is not None:
+            raise self._error
+
+        metadata = dict(self.metadata, version=VERSION, dot_count=self.dot_count, ticks=self.ticks,
+                        chunk_ticks=self.chunk_ticks, compress=self.compress, dtype=self.dtype.name)
+        with open(os.path.join(self.path, 'recording.json'), 'w') as file:
+            json.dump(metadata, file, indent=2)
+
+    def _write(self):
+        '''
+            Protected method, the loop of the writer thread
+        '''
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            slot, chunk, ticks = item
+            try:
+                if self._error is None:
+                    path = _chunk_path(self.path, chunk, self.compress)
+                    if self.compress:
+                        np.savez_compressed(path, ticks=self._ring[slot, :ticks])
+                    else:
+                        np.save(path, self._ring[slot, :ticks])
+            except Exception as error:
+                # record and close raise it in the thread of the simulation
+                self._error = error
+            finally:
+                self._free.put(slot)
+
+
+class TrajectoryReader:
+    '''
+        Reads a recording of a TrajectoryRecorder at any tick
+
+        path:
+            the directory of the recording
+
+        The chunks of a recording which is not compressed are memory-mapped, so only the ticks which are read are
+        loaded from disk. A compressed chunk is decompressed when one of its ticks is read. Only the last chunk
+        read is kept, since replays read the chunks one after the other.
+    '''
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, 'recording.json')) as file:
+            self.metadata = json.load(file)
+        if self.metadata['version'] != VERSION:
+            raise ValueError(f'{path} is a recording of version {self.metadata["version"]}, not {VERSION}')
+        self.path = path
+        self.dot_count = self.metadata['dot_count']
+        self.chunk_ticks = self.metadata['chunk_ticks']
+        self.compress = self.metadata['compress']
+        self.radius = np.load(os.path.join(path, 'radius.npy'))
+        # the number and the array of the last chunk read
+        self._chunk_number = None
+        self._chunk_array = None
+
+    def __len__(self) -> int:
+        return self.metadata['ticks']
+
+    def _chunk(self, chunk: int) -> np.ndarray:
+        '''
+            Protected method to return the array of a chunk, of shape (ticks, 4, dots)
+        '''
+        if chunk != self._chunk_number:
+            path = _chunk_path(self.path, chunk, self.compress)
+            if self.compress:
+                with np.load(path) as data:
+                    self._chunk_array = data['ticks']
+            else:
+                self._chunk_array = np.load(path, mmap_mode='r')
+            self._chunk_number = chunk
+        return self._chunk_array
+
+    def tick(self, tick: int) -> np.ndarray:
+        '''
+            Returns the state of the dots at tick as an array of shape (4, dots) holding x, y, vx and vy
+        '''
+        if not 0 <= tick < len(self):
+            raise IndexError(f'tick {tick} is not in the recording of {len(self)} ticks')
+        return self._chunk(tick // self.chunk_ticks)[tick % self.chunk_ticks]
+
+    def positions(self, tick: int) -> tuple:
+        '''
+            Returns the x and y positions of the dots at tick
+        '''
+        state = self.tick(tick)
+        return state[X], state[Y]
+
+    def velocities(self, tick: int) -> tuple:
+        '''
+            Returns the x and y velocities of the dots at tick
+        '''
+        state = self.tick(tick)
+        return state[VX], state[VY]
+
+    def snapshot(self, tick: int) -> Snapshot:
+        '''
+            Returns the state of the simulation at tick as a Snapshot, e.g. to continue it or to create the dots of
+            a replay. The recording must have been made with TrajectoryRecorder.for_simulation
+        '''
+        state = self.tick(tick).astype(np.float64)
+        metadata = self.metadata
+        return Snapshot(state[X], state[Y], state[VX], state[VY], self.radius, metadata['force_law'],
+                        metadata['force_parameters'], metadata['seed'], metadata['first_tick'] + tick + 1,
+                        metadata['width'], metadata['height'])
@@ -0,0 +1,87 @@
+from recorder import TrajectoryReader
+from fixed_timestep import interpolate
+import numpy as np
+
+
+class Replay:
+    '''
+        Plays a recording back in real time: the position in the recording moves with the time of the frames, and
+        the dots are drawn between the two recorded ticks around it, like App draws them between two physics steps.
+
+        reader:
+            the TrajectoryReader of the recording
+        period_x, period_y:
+            the size of the area in which the dots wrap around (the window plus the margins of
+            EnvironmentDotUpdater), so the dots which wrapped between two ticks are not drawn across the window
+        speed:
+            how many recorded seconds are played per second. Negative speeds play backwards
+        loop:
+            starts again from the beginning (or the end, backwards) at the end of the recording, instead of stopping
+
+        The ticks are recorded delta_time apart (from the metadata of the recording). position is the current
+        tick as a float.
+    '''
+
+    def __init__(self, reader: TrajectoryReader, period_x: float, period_y: float, speed: float = 1.0,
+                 loop: bool = True):
+        if len(reader) == 0:
+            raise ValueError('The recording has no tick')
+        self.reader = reader
+        self.period_x = period_x
+        self.period_y = period_y
+        self.speed = speed
+        self.loop = loop
+        self.delta_time = reader.metadata['delta_time']
+        self.paused = False
+        self.position = 0.0
+
+    @property
+    def last_tick(self) -> int:
+        return len(self.reader) - 1
+
+    @property
+    def tick(self) -> int:
+        '''
+            The recorded tick at or before the current position
+        '''
+        return int(self.position)
+
+    def advance(self, delta_time: float):
+        '''
+            Moves the position by the recorded ticks played in delta_time seconds, unless paused
+        '''
+        if self.paused or self.last_tick == 0:
+            return
+        position = self.position + delta_time * self.speed / self.delta_time
+        if self.loop:
+            # one extra tick to go from the last tick back to the first one
+            position %= self.last_tick + 1
+            if position > self.last_tick:
+                position = 0.0 if self.speed > 0 else float(self.last_tick)
+        self.seek(position)
+
+    def seek(self, position: float):
+        '''
+            Moves to a (fractional) tick, clipped to the recording
+        '''
+        self.position = min(max(float(position), 0.0), float(self.last_tick))
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+
+    def positions(self) -> tuple:
+        '''
+            Returns the x and y positions of the dots at the current position, between the two recorded ticks
+            around it
+        '''
+        tick = self.tick
+        x, y = self.reader.positions(tick)
+        alpha = self.position - tick
+        if alpha == 0:
+            return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+
+        next_x, next_y = self.reader.positions(tick + 1)
+        # float64, like the columns of the store which the renderers usually get
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        return (interpolate(x, np.asarray(next_x, dtype=np.float64), alpha, self.period_x),
+                interpolate(y, np.asarray(next_y, dtype=np.float64), alpha, self.period_y))
@@ -0,0 +1,128 @@
+'''
+    Runs the simulation without a pyglet window (no display or audio needed) as fast as possible and prints
+    the number of steps per second, e.g.
+
+        poetry run python src/sim.py --dots 5000 --steps 10000 --dt 0.0083
+
+    --save writes the state at the end of the run to a snapshot, and --load continues from one (see snapshot.py).
+    --record records the dots at every step, see recorder.py. --scenario reads the tuning of the simulation from a
+    TOML file (see config.py), the other options override it.
+'''
+from simulation import create_simulation, report_backend
+from snapshot import Snapshot, load_snapshot, save_snapshot
+from config import DEFAULT_SCENARIO, load_scenario
+from recorder import TrajectoryRecorder
+from integrators import INTEGRATORS
+from profiler import FrameProfiler
+import argparse
+import time
+
+
+def run(simulation, steps: int, delta_time: float, report_every: int = 0,
+        recorder: TrajectoryRecorder = None) -> float:
+    '''
+        Advances the simulation steps times by delta_time
+
+        report_every: prints the progress every report_every steps, 0 to only print at the end
+        recorder: an optional TrajectoryRecorder which records the dots after every step
+
+        Returns the number of steps per second
+    '''
+    begin = time.perf_counter()
+    for step in range(1, steps + 1):
+        simulation.step(delta_time)
+        if recorder is not None:
+            recorder.record(simulation.store)
+        simulation.profiler.end_frame()
+        if report_every and step % report_every == 0:
+            elapsed = time.perf_counter() - begin
+            print(f'step {step}/{steps}: {step / elapsed:.1f} steps/sec')
+
+    return steps / (time.perf_counter() - begin)
+
+
+def main(arguments: list = None):
+    parser = argparse.ArgumentParser(description='Runs the dots and lines simulation without a window')
+    parser.add_argument('--scenario', default=None,
+                        help='TOML file with the tuning of the dots, the force law, the environment and the lines')
+    parser.add_argument('--dots', type=int, default=None, help='number of dots, defaults to the one of the scenario')
+    parser.add_argument('--steps', type=int, default=1000, help='number of steps to run')
+    parser.add_argument('--dt', type=float, default=1/120, help='time step of the simulation')
+    parser.add_argument('--width', type=float, default=1920, help='width of the area of the dots')
+    parser.add_argument('--height', type=float, default=1080, help='height of the area of the dots')
+    parser.add_argument('--force-engine', choices=['numpy', 'lines', 'barnes-hut'], default='numpy',
+                        help='how the forces between the dots are applied')
+    parser.add_argument('--force-law', choices=['spring', 'gravity'], default=None,
+                        help='the springs of the app or a long-range attraction between every pair of dots '
+                             '(defaults to the one of the scenario)')
+    parser.add_argument('--theta', type=float, default=0.5, help='opening angle of the barnes-hut force engine')
+    parser.add_argument('--backend', choices=['python', 'numba', 'parallel'], default='python',
+                        help='runs the physics step in Python/NumPy, with numba or with numba on several cores')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of threads of the parallel backend, at most and by default the threads '
+                             'of numba (the number of cores, or NUMBA_NUM_THREADS)')
+    parser.add_argument('--skin', type=float, default=None,
+                        help='finds the pairs of dots with a neighbour list of this skin instead of the grid')
+    parser.add_argument('--integrator', choices=list(INTEGRATORS), default='euler',
+                        help='how the dots are advanced by a step')
+    parser.add_argument('--max-displacement', type=float, default=None,
+                        help='splits the steps into substeps in which the largest acceleration moves a dot at most '
+                             'this distance')
+    parser.add_argument('--max-substeps', type=int, default=8, help='maximum number of substeps of a step')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the random dots, defaults to the one of the scenario or a random one')
+    parser.add_argument('--load', default=None,
+                        help='snapshot to continue from, instead of random dots (replaces --dots, --width, --height '
+                             'and --force-law)')
+    parser.add_argument('--save', default=None, help='snapshot file to which the state is written after the run')
+    parser.add_argument('--record', default=None, help='directory to which the dots are recorded at every step')
+    parser.add_argument('--uncompressed', action='store_true',
+                        help='records plain .npy chunks, larger but memory-mapped when read')
+    parser.add_argument('--report-every', type=int, default=0, help='prints the progress every N steps')
+    parser.add_argument('--profile', action='store_true', help='prints the average time of each phase of a step')
+    parser.add_argument('--profile-log', default=None,
+                        help='CSV or JSON file to which the profile of the last steps is written')
+    args = parser.parse_args(arguments)
+    scenario = load_scenario(args.scenario) if args.scenario is not None else DEFAULT_SCENARIO
+
+    snapshot = None
+    if args.load is not None:
+        begin = time.perf_counter()
+        snapshot = load_snapshot(args.load)
+        print(f'loaded {snapshot.dot_count} dots at tick {snapshot.tick} in '
+              f'{(time.perf_counter() - begin) * 1000:.1f} ms')
+        args.dots, args.width, args.height = snapshot.dot_count, snapshot.width, snapshot.height
+
+    simulation = create_simulation(args.width, args.height, dot_count=args.dots, force_engine=args.force_engine,
+                                   physics_backend=args.backend, workers=args.workers, integrator=args.integrator,
+                                   max_displacement=args.max_displacement, max_substeps=args.max_substeps,
+                                   force_law=args.force_law, theta=args.theta, skin=args.skin, seed=args.seed,
+                                   snapshot=snapshot, scenario=scenario)
+    report_backend(simulation)
+    if args.profile or args.profile_log:
+        simulation.profiler = FrameProfiler(log_path=args.profile_log)
+
+    recorder = None
+    if args.record is not None:
+        recorder = TrajectoryRecorder.for_simulation(args.record, simulation, args.dt, compress=not args.uncompressed)
+
+    steps_per_second = run(simulation, args.steps, args.dt, args.report_every, recorder)
+    if recorder is not None:
+        recorder.close()
+        print(f'recorded {recorder.ticks} ticks to {args.record}')
+    print(f'{len(simulation.dots)} dots, {args.steps} steps: {steps_per_second:.1f} steps/sec')
+    if simulation.neighbour_list is not None:
+        print(f'neighbour list rebuilt {simulation.neighbour_list.rebuilds} times '
+              f'({simulation.neighbour_list.rebuilds / args.steps:.2f} per step)')
+
+    if args.profile:
+        print(simulation.profiler.report())
+    if args.profile_log:
+        simulation.profiler.write_log()
+    if args.save is not None:
+        save_snapshot(args.save, Snapshot.of(simulation))
+        print(f'saved tick {simulation.tick} to {args.save}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from mouse import Mouse
+from dot import Dot, DotFactory, DotList
+from particle_store import ParticleStore
+from line import ForceLaw
+from dot_updater import EnvironmentDotUpdater
+from spatial_grid import SpatialGrid, close_pairs
+from neighbour_list import NeighbourList
+from force_engine import NumpyForceEngine
+from line_pool import LinePool, pair_index
+from barnes_hut import BarnesHutForceEngine
+from numba_backend import NumbaPhysicsBackend, ParallelPhysicsBackend, NUMBA_AVAILABLE
+from profiler import FrameProfiler, NULL_PROFILER
+from integrators import INTEGRATORS, euler, substeps
+from snapshot import Snapshot
+from config import Scenario, DEFAULT_SCENARIO
+import numpy as np
+import pyglet
+import math
+import random
+import time
+
+
+class Simulation:
+    '''
+        The physics of the app, without anything to do with drawing. It runs with or without a pyglet window.
+
+        store:
+            the ParticleStore holding the state of the dots
+        dots:
+            the dots, as a DotList (or a list) of the dots of store
+        lines:
+            a LinePool which creates the lines between the pairs of nearby dots when they are needed, see
+            nearby_lines. It is None when no line is needed (nothing is drawn and the forces are not applied by the
+            lines).
+        mouse:
+            a mouse object through which we can click and apply a repelling force
+        dot_updater:
+            a EnvironmentDotUpdater that handles 3 different updates
+        dot_force_calculator:
+            the DotForceCalculator (or other ForceLaw) shared by the lines
+        grid:
+            an optional SpatialGrid. With a grid, only the lines between nearby dots are updated, instead of
+            all of them
+        force_engine:
+            an optional NumpyForceEngine which applies the forces between the dots. Without it, each line applies
+            the force between its two dots
+        physics_backend:
+            an optional NumbaPhysicsBackend which runs the whole physics step (forces, dot_updater and integration)
+            instead of force_engine, the lines and dot_updater
+        profiler:
+            times the phases of each step (forces, environment, integration) and counts the active pairs.
+            Defaults to NULL_PROFILER, which does nothing
+        integrator:
+            the name of the integrator, see integrators.INTEGRATORS. Defaults to 'euler', the integration of
+            Dot.update_state
+        max_displacement:
+            optional adaptive substepping: each step is split into as many substeps as needed for the largest
+            acceleration to move a dot at most max_displacement per substep, see integrators.substeps
+        max_substeps:
+            the maximum number of substeps of a step
+        neighbour_list:
+            the NeighbourList used by force_engine or physics_backend, if any. Its number of rebuilds is counted
+            by the profiler
+        seed:
+            the seed the dots were created with, if known. It is saved with the snapshots of the simulation
+
+        tick counts the steps of the simulation (including the ones before the snapshot it was restored from).
+    '''
+
+    def __init__(self, store: ParticleStore, dots: DotList, lines: LinePool, mouse: Mouse, dot_updater: EnvironmentDotUpdater,
+                 dot_force_calculator: ForceLaw, grid: SpatialGrid = None,
+                 force_engine: NumpyForceEngine = None, physics_backend: NumbaPhysicsBackend = None,
+                 profiler: FrameProfiler = NULL_PROFILER, integrator: str = 'euler', max_displacement: float = None,
+                 max_substeps: int = 8, neighbour_list: NeighbourList = None, seed: int = None):
+        if integrator not in INTEGRATORS:
+            raise ValueError(f'Unknown integrator: {integrator}')
+
+        self.store = store
+        self.dots = dots
+        self.lines = lines
+        self.mouse = mouse
+        self.dot_updater = dot_updater
+        self.dot_force_calculator = dot_force_calculator
+        self.grid = grid
+        self.force_engine = force_engine
+        self.physics_backend = physics_backend
+        self.profiler = profiler
+        self.integrator = INTEGRATORS[integrator]
+        self.max_displacement = max_displacement
+        self.max_substeps = max_substeps
+        self.neighbour_list = neighbour_list
+        self.seed = seed
+        self.tick = 0
+        # the number of substeps of the last step
+        self.substeps = 1
+        # the time spent in the force evaluations of the stages of the current integration
+        self._stage_seconds = 0.0
+        # the nearby pairs (i, j, distance) and their lines, kept from the force pass of the lines for the drawing
+        # until the dots move, see nearby_lines
+        self._nearby = None
+
+    def active_pairs(self) -> int:
+        '''
+            Returns the number of pairs of dots close enough to apply a force on each other, as of the last step
+            for the engines and as of the pairs of nearby_lines for the lines
+        '''
+        if self.physics_backend is not None:
+            return self.physics_backend.active_pairs
+        if self.force_engine is not None:
+            return self.force_engine.active_pairs
+        if self._nearby is not None:
+            distance = self._nearby[2]
+            return int(np.count_nonzero(distance <= self.dot_force_calculator.max_distance))
+        if self.grid is not None:
+            return len(self.grid.pairs_within(self.store.x, self.store.y, self.dot_force_calculator.max_distance)[0])
+        return sum(1 for line in self.nearby_lines() if line.distance <= self.dot_force_calculator.max_distance)
+
+    def nearby_lines(self) -> list:
+        '''
+            Returns the lines whose dots are within the cell size of the grid, in the order of pair_index (so the
+            forces add up in the same order as when updating all the lines). Without a grid the lines of all the
+            pairs are returned. The lines of the pairs which moved apart go back to the pool.
+
+            The pairs and their distances (the Line.distance of the lines) are found once and kept until the dots
+            move: the lines applying the forces of a step and the drawing of the frame after it share them, so each
+            pair is measured once per step. The force pass is the last one of the step, before the integration, so
+            the lines are drawn with the distances of the step they applied. When a dot wraps around the window,
+            the pairs are found again for the drawing.
+        '''
+        if self.lines is None:
+            return []
+        if self._nearby is None:
+            x, y = self.store.x, self.store.y
+            if self.grid is None:
+                i, j = np.triu_indices(len(self.dots), 1)
+                i, j, distance = close_pairs(x, y, i, j, math.inf)
+            else:
+                i, j, distance = self.grid.pairs_within(x, y, self.grid.cell_size)
+            self._nearby = i, j, distance, self.lines.update(i, j, distance)
+        return self._nearby[3]
+
+    def step(self, delta_time: float):
+        '''
+            Advances the simulation by delta_time
+
+            delta_time:
+                the time passed since last state update
+        '''
+
+        profiler = self.profiler
+        rebuilds = self.neighbour_list.rebuilds if self.neighbour_list is not None else 0
+
+        self._apply_forces(profiler)
+        count = 1
+        if self.max_displacement is not None:
+            count = substeps(self.store, delta_time, self.max_displacement, self.max_substeps)
+        self.substeps = count
+
+        for substep in range(count):
+            if substep > 0:
+                self._apply_forces(profiler)
+            self._integrate(delta_time / count, profiler)
+            # the dots are only wrapped around the window once the integrator is done with them
+            with profiler.phase('environment'):
+                self._wrap()
+        self.tick += 1
+
+        if profiler.enabled:
+            profiler.count('active_pairs', self.active_pairs())
+            profiler.count('substeps', count)
+            if self.neighbour_list is not None:
+                # the rebuilds of this step, so the average is the number of rebuilds per step
+                profiler.count('neighbour_rebuilds', self.neighbour_list.rebuilds - rebuilds)
+
+    def _apply_forces(self, profiler: FrameProfiler = NULL_PROFILER):
+        '''
+            Protected method to add the forces between the dots and the forces of EnvironmentDotUpdater (the mouse
+            and the velocity limiter) to the store. The dots are not moved, see _wrap
+        '''
+        # the dots moved since the last force pass
+        self._nearby = None
+        if self.physics_backend is not None:
+            backend = self.physics_backend
+            with profiler.phase('forces'):
+                backend.apply_forces(self.store)
+            with profiler.phase('environment'):
+                backend.add_environment_forces(self.store, self.mouse)
+            return
+
+        with profiler.phase('forces'):
+            if self.force_engine is None:
+                for line in self.nearby_lines():
+                    line.update_state()
+            else:
+                self.force_engine.apply(self.store)
+
+        with profiler.phase('environment'):
+            store = self.store
+            self.dot_updater.add_forces_all((store.x, store.y), (store.vx, store.vy), (store.fx, store.fy),
+                                            self.mouse)
+
+    def _wrap(self):
+        '''
+            Protected method to wrap the dots around the window, see EnvironmentDotUpdater.wrap_all
+        '''
+        store = self.store
+        # the lines of a dot which wraps around would be drawn across the window with their old distance
+        if self._nearby is not None and self.dot_updater.any_outside((store.x, store.y)):
+            self._nearby = None
+        if self.physics_backend is not None:
+            self.physics_backend.wrap(store)
+        else:
+            self.dot_updater.wrap_all((store.x, store.y))
+
+    def _evaluate_forces(self, store: ParticleStore):
+        '''
+            Protected method to replace the forces by the ones at the current state, for the stages of the
+            integrators. The time spent here goes to the forces and environment phases, not to the integration
+        '''
+        begin = time.perf_counter()
+        store.clear_forces()
+        self._apply_forces(self.profiler)
+        self._stage_seconds += time.perf_counter() - begin
+
+    def _integrate(self, delta_time: float, profiler: FrameProfiler = NULL_PROFILER):
+        '''
+            Protected method to advance the dots by delta_time with the forces in the store
+        '''
+        self._stage_seconds = 0.0
+        begin = time.perf_counter()
+        if self.integrator is euler and self.physics_backend is not None:
+            self.physics_backend.integrate(self.store, delta_time)
+        else:
+            self.integrator(self.store, self._evaluate_forces, delta_time)
+        profiler.add('integration', time.perf_counter() - begin - self._stage_seconds)
+
+
+def create_simulation(width: float, height: float, dot_count: int = None, force_engine: str = 'numpy',
+                      physics_backend: str = 'python', workers: int = None, mouse: Mouse = None,
+                      dot_image: pyglet.image.AbstractImage = None, dot_batch: pyglet.graphics.Batch = None,
+                      line_batch: pyglet.graphics.Batch = None, seed: int = None, integrator: str = 'euler',
+                      max_displacement: float = None, max_substeps: int = 8, force_law: str = None,
+                      theta: float = 0.5, skin: float = None, color_steps: int = None, snapshot: Snapshot = None,
+                      scenario: Scenario = None) -> Simulation:
+    '''
+        Constructs the Dot and Line objects and the physics. The tuning of the dots, the force law, the environment
+        and the lines comes from a Scenario (see config), whose values are overridden by the arguments which are
+        given
+
+        width, height: the size of the area of the dots, e.g. the size of the pyglet window
+        dot_count: the number of dots, defaults to the count of the scenario
+        force_engine: how the forces between the dots are applied. 'numpy' applies them all at once with a
+            NumpyForceEngine, 'lines' calls Line.update_state for each line and 'barnes-hut' approximates them with
+            a BarnesHutForceEngine (only with a long-range force law like 'gravity' and the 'python' backend)
+        physics_backend: 'python' runs the physics step with force_engine and EnvironmentDotUpdater, 'numba' runs the
+            whole step with a NumbaPhysicsBackend and 'parallel' with a ParallelPhysicsBackend
+        workers: the number of threads of the 'parallel' backend, see ParallelPhysicsBackend
+        mouse: the mouse repelling the dots. Without a window, pass nothing and the mouse is never pressed
+        dot_image: the image of the dots. Without an image, the dots have no sprite
+        dot_batch: a drawing batch for the dots
+        line_batch: a drawing batch for the lines. Without a batch, the lines have no draw object and they are only
+            needed when force_engine is 'lines'
+        seed: the seed of the random dots, defaults to the seed of the scenario. Without a seed, one is drawn from
+            the global random module (and kept as Simulation.seed, so the same dots can be created again)
+        integrator, max_displacement, max_substeps: see Simulation
+        force_law: 'spring' for the DotForceCalculator of the app, 'gravity' for a SoftenedGravity between every
+            pair of dots (only with the 'numpy' and 'barnes-hut' force engines and the 'python' backend). Defaults
+            to the law of the scenario, and uses its parameters
+        theta: the opening angle of the 'barnes-hut' force engine
+        skin: with a skin, the 'numpy' force engine and the numba backends find the pairs of dots with a
+            NeighbourList of this skin instead of the grid (only with the 'spring' force law)
+        color_steps: the number of quantization steps of the colors of the lines (see AlphaTable), defaults to the
+            one of the scenario
+        snapshot: a Snapshot to restore instead of creating random dots. Its dots, force law, seed and tick replace
+            dot_count, force_law and seed
+        scenario: the Scenario of the simulation, DEFAULT_SCENARIO without one
+
+        Returns a Simulation
+    '''
+
+    scenario = DEFAULT_SCENARIO if scenario is None else scenario
+    dot_count = scenario.dots.count if dot_count is None else dot_count
+    force_law = scenario.force.law if force_law is None else force_law
+    color_steps = scenario.lines.color_steps if color_steps is None else color_steps
+    seed = scenario.dots.seed if seed is None else seed
+
+    if snapshot is not None:
+        seed = snapshot.seed
+        force_law = snapshot.force_law
+    elif seed is None:
+        seed = random.randrange(2**32)
+
+    # all the dots share one ParticleStore, so their state is kept in flat arrays
+    store = ParticleStore(capacity=dot_count) if snapshot is None else snapshot.create_store()
+
+    # configures DotFactory to create dots
+    dot_factory = DotFactory(image=dot_image, area_width=width, area_height=height,
+                             min_size=scenario.dots.min_size, max_size=scenario.dots.max_size,
+                             max_velocity=scenario.dots.max_velocity, store=store, rng=random.Random(seed))
+
+    # creates the random dots in the store (a snapshot already holds its dots). Their Dot objects and sprites are
+    # only created when they are needed, see DotList
+    if snapshot is None:
+        for _ in range(dot_count):
+            dot_factory.add()
+    dots = DotList(dot_factory, dot_batch)
+
+    # configures the DotForceCalculator, which will be used by lines to apply forces to the dots
+    if force_law == 'gravity' and (force_engine not in ('numpy', 'barnes-hut') or physics_backend != 'python'):
+        raise ValueError('The gravity force law needs the numpy or barnes-hut force engine and the python backend')
+    if snapshot is not None:
+        dot_force_calculator = snapshot.create_force_law()
+    else:
+        dot_force_calculator = scenario.force.create_force_law(force_law)
+
+    # the lines are only created for the pairs of nearby dots, see Simulation.nearby_lines
+    lines = None
+    if line_batch is not None or force_engine == 'lines':
+        lines = LinePool(dots, dot_force_calculator, batch=line_batch, color=scenario.lines.color,
+                         min_scale_length=scenario.lines.min_scale_length,
+                         max_scale_length=scenario.lines.max_scale_length, color_steps=color_steps)
+
+    dot_updater = EnvironmentDotUpdater(width, height, scenario.environment)
+
+    # the grid covers the area in which EnvironmentDotUpdater keeps the dots. Its cells are as large as the
+    # longest distance at which a line matters, so only dots in neighbouring cells need to be checked
+    # (a long-range force law does not use the grid, which is then only used to draw the lines)
+    margin = dot_updater.margin
+    long_range = math.isinf(dot_force_calculator.max_distance)
+    max_scale_length = scenario.lines.max_scale_length
+    grid = SpatialGrid(cell_size=max_scale_length if long_range else max(dot_force_calculator.max_distance,
+                                                                           max_scale_length),
+                       min_x=-margin, min_y=-margin, max_x=width + margin, max_y=height + margin)
+
+    neighbour_list = None
+    if skin is not None:
+        if force_engine != 'numpy' and physics_backend == 'python':
+            raise ValueError('The neighbour list is only used by the numpy force engine and the numba backends')
+        if long_range:
+            raise ValueError('The neighbour list needs a force law with a max_distance')
+        neighbour_list = NeighbourList(grid, dot_force_calculator.max_distance, skin)
+
+    if force_engine == 'numpy':
+        pair_finder = neighbour_list if neighbour_list is not None else grid
+        engine = NumpyForceEngine(dot_force_calculator, grid=None if long_range else pair_finder)
+    elif force_engine == 'barnes-hut':
+        if physics_backend != 'python':
+            raise ValueError('The barnes-hut force engine only runs with the python backend, the other backends '
+                             'replace the force engine')
+        if not long_range:
+            raise ValueError('The barnes-hut force engine needs a long-range force law, e.g. gravity')
+        engine = BarnesHutForceEngine(dot_force_calculator, theta=theta)
+    elif force_engine == 'lines':
+        engine = None
+    else:
+        raise ValueError(f'Unknown force engine: {force_engine}')
+
+    if physics_backend == 'numba':
+        backend = NumbaPhysicsBackend(dot_force_calculator, dot_updater, grid, neighbour_list=neighbour_list)
+    elif physics_backend == 'parallel':
+        backend = ParallelPhysicsBackend(dot_force_calculator, dot_updater, grid, workers=workers,
+                                         neighbour_list=neighbour_list)
+    elif physics_backend == 'python':
+        backend = None
+    else:
+        raise ValueError(f'Unknown physics backend: {physics_backend}')
+
+    simulation = Simulation(store, dots, lines, mouse if mouse is not None else Mouse(), dot_updater,
+                            dot_force_calculator, grid=grid, force_engine=engine, physics_backend=backend,
+                            integrator=integrator, max_displacement=max_displacement, max_substeps=max_substeps,
+                            neighbour_list=neighbour_list, seed=seed)
+    if snapshot is not None:
+        simulation.tick = snapshot.tick
+    return simulation
+
+
+def report_backend(simulation: Simulation):
+    '''
+        Prints what the user should know about the physics backend of the simulation
+    '''
+    backend = simulation.physics_backend
+    if backend is not None and not NUMBA_AVAILABLE:
+        print('numba is not installed, the physics backend runs as plain Python')
+
+    if isinstance(backend, ParallelPhysicsBackend):
+        print(f'parallel forces with {backend.workers} workers: '
+              f'{backend.measure_speedup(simulation.store):.2f}x faster than the serial path')
@@ -0,0 +1,125 @@
+'''
+    Saves and loads the full state of a simulation (the columns of the dots, the force law, the seed and the tick)
+    as an uncompressed NumPy .npz file. The columns are stored as flat float64 arrays, so loading a snapshot is
+    a few array reads, without creating any Python object per dot.
+
+        poetry run python src/sim.py --dots 5000 --steps 1000 --save state.npz
+        poetry run python src/sim.py --load state.npz --steps 1000
+'''
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from line import DotForceCalculator, ForceLaw, SoftenedGravity
+from particle_store import ParticleStore
+import numpy as np
+
+# the force laws which can be saved, with the names of their parameters
+FORCE_LAWS = {
+    'spring': (DotForceCalculator, ('neutral_distance', 'max_distance', 'force_coefficient')),
+    'gravity': (SoftenedGravity, ('strength', 'softening')),
+}
+
+# the version of the file format, saved with every snapshot
+VERSION = 1
+
+
+def describe_force_law(law: ForceLaw) -> tuple:
+    '''
+        Returns the name (a key of FORCE_LAWS) and the parameters by name of a force law which can be saved
+    '''
+    for name, (law_class, parameters) in FORCE_LAWS.items():
+        if type(law) is law_class:
+            return name, {parameter: getattr(law, parameter) for parameter in parameters}
+    raise ValueError(f'The force law {type(law).__name__} cannot be saved')
+
+
+class Snapshot:
+    '''
+        The state of a simulation at one tick
+
+        x, y, vx, vy, radius:
+            the columns of the dots, see ParticleStore. The forces are not saved, they are 0 between two steps
+        force_law:
+            the name of the force law, a key of FORCE_LAWS
+        force_parameters:
+            the parameters of the force law by name
+        seed:
+            the seed the dots were created with
+        tick:
+            the number of steps the simulation ran
+        width, height:
+            the size of the area of the dots
+    '''
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, vx: np.ndarray, vy: np.ndarray, radius: np.ndarray,
+                 force_law: str, force_parameters: dict, seed: int, tick: int, width: float, height: float):
+        if force_law not in FORCE_LAWS:
+            raise ValueError(f'Unknown force law: {force_law}')
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.radius = radius
+        self.force_law = force_law
+        self.force_parameters = force_parameters
+        self.seed = seed
+        self.tick = tick
+        self.width = width
+        self.height = height
+
+    @property
+    def dot_count(self) -> int:
+        return len(self.x)
+
+    @classmethod
+    def of(cls, simulation) -> Snapshot:
+        '''
+            Returns a snapshot of the current state of a Simulation (the columns are copied)
+        '''
+        force_law, force_parameters = describe_force_law(simulation.dot_force_calculator)
+        store = simulation.store
+        updater = simulation.dot_updater
+        return cls(store.x.copy(), store.y.copy(), store.vx.copy(), store.vy.copy(), store.radius.copy(),
+                   force_law, force_parameters, simulation.seed, simulation.tick, updater.width, updater.height)
+
+    def create_store(self) -> ParticleStore:
+        '''
+            Returns a ParticleStore holding the dots of the snapshot
+        '''
+        return ParticleStore.from_columns(self.x, self.y, self.vx, self.vy, self.radius)
+
+    def create_force_law(self) -> ForceLaw:
+        '''
+            Returns the force law of the snapshot
+        '''
+        law_class, _ = FORCE_LAWS[self.force_law]
+        return law_class(**self.force_parameters)
+
+
+def save_snapshot(path: str, snapshot: Snapshot):
+    '''
+        Writes a snapshot to path, an .npz file (np.savez adds the extension when it is missing)
+    '''
+    _, parameters = FORCE_LAWS[snapshot.force_law]
+    np.savez(path, version=VERSION, x=snapshot.x, y=snapshot.y, vx=snapshot.vx, vy=snapshot.vy,
+             radius=snapshot.radius, force_law=snapshot.force_law,
+             force_parameters=np.array([snapshot.force_parameters[name] for name in parameters], dtype=np.float64),
+             seed=-1 if snapshot.seed is None else snapshot.seed, tick=snapshot.tick,
+             area=np.array([snapshot.width, snapshot.height], dtype=np.float64))
+
+
+def load_snapshot(path: str) -> Snapshot:
+    '''
+        Reads a snapshot written by save_snapshot
+    '''
+    with np.load(path) as data:
+        if int(data['version']) != VERSION:
+            raise ValueError(f'{path} is a snapshot of version {int(data["version"])}, not {VERSION}')
+        force_law = str(data['force_law'])
+        if force_law not in FORCE_LAWS:
+            raise ValueError(f'Unknown force law: {force_law}')
+        _, parameters = FORCE_LAWS[force_law]
+        seed = int(data['seed'])
+        width, height = data['area'].tolist()
+        return Snapshot(data['x'], data['y'], data['vx'], data['vy'], data['radius'], force_law,
+                        dict(zip(parameters, data['force_parameters'].tolist())), None if seed < 0 else seed,
+                        int(data['tick']), width, height)
@@ -0,0 +1,117 @@
+import numpy as np
+import math
+
+
+def close_pairs(x: np.ndarray, y: np.ndarray, i: np.ndarray, j: np.ndarray, distance: float) -> tuple:
+    '''
+        Keeps the pairs (i[k], j[k]) of dots that are at most distance apart. The squared distances are compared
+        to distance^2, so the square root is only taken for the pairs which are kept.
+
+        Returns a tuple of arrays (i, j, pair_distance)
+    '''
+    delta_x = x[j] - x[i]
+    delta_y = y[j] - y[i]
+    squared = delta_x * delta_x + delta_y * delta_y
+    close = squared <= distance * distance
+    return i[close], j[close], np.sqrt(squared[close])
+
+
+class SpatialGrid:
+    '''
+        A uniform grid (cell list) to find the pairs of dots that are close to each other without checking all
+        the N * (N - 1) / 2 pairs.
+
+        cell_size:
+            the size of the grid cells. It should be at least the largest distance at which two dots interact
+            (e.g. DotForceCalculator.max_distance), so that every such pair is in the same or in adjacent cells.
+        min_x, min_y, max_x, max_y:
+            the area covered by the grid. With EnvironmentDotUpdater this is the window plus the wrap margin
+            on each side. Dots outside the area are put in the nearest border cell, which keeps the result correct.
+
+        The grid does not match dots across the wrap-around edges, because the forces and the lines use the plain
+        distance between two dots: two dots on opposite sides of the window never interact.
+    '''
+
+    # half of the 3x3 neighbourhood (plus the cell itself), so that each pair of cells is visited once
+    _NEIGHBOUR_OFFSETS = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, cell_size: float, min_x: float, min_y: float, max_x: float, max_y: float):
+        self.cell_size = cell_size
+        self.min_x = min_x
+        self.min_y = min_y
+        self.columns = max(int(math.ceil((max_x - min_x) / cell_size)), 1)
+        self.rows = max(int(math.ceil((max_y - min_y) / cell_size)), 1)
+
+    def cell_coordinates(self, x: np.ndarray, y: np.ndarray) -> tuple:
+        '''
+            Returns the column and row of the cell of every dot as a pair of integer arrays
+        '''
+        column = np.clip(((x - self.min_x) // self.cell_size).astype(np.intp), 0, self.columns - 1)
+        row = np.clip(((y - self.min_y) // self.cell_size).astype(np.intp), 0, self.rows - 1)
+        return column, row
+
+    def candidate_pairs(self, x: np.ndarray, y: np.ndarray) -> tuple:
+        '''
+            Finds every pair of dots in the same or in adjacent cells. Each pair is returned once.
+
+            x, y: the positions of the dots, e.g. ParticleStore.x and ParticleStore.y
+
+            Returns a pair of integer arrays (i, j) with the indices of the two dots of each pair
+        '''
+        column, row = self.cell_coordinates(x, y)
+        cell = row * self.columns + column
+
+        # counting sort of the dots by cell: the dots of cell c are order[start[c]:start[c] + count[c]]
+        order = np.argsort(cell, kind='stable')
+        count = np.bincount(cell, minlength=self.columns * self.rows)
+        start = np.cumsum(count) - count
+
+        sorted_column = column[order]
+        sorted_row = row[order]
+        sorted_cell = cell[order]
+        position = np.arange(len(order))
+
+        first = []
+        second = []
+        for offset_column, offset_row in self._NEIGHBOUR_OFFSETS:
+            if (offset_column, offset_row) == (0, 0):
+                # within a cell, pair each dot only with the dots after it
+                partner_start = position + 1
+                partner_count = start[sorted_cell] + count[sorted_cell] - partner_start
+            else:
+                neighbour_column = sorted_column + offset_column
+                neighbour_row = sorted_row + offset_row
+                valid = ((neighbour_column >= 0) & (neighbour_column < self.columns) &
+                         (neighbour_row >= 0) & (neighbour_row < self.rows))
+                neighbour = np.where(valid, neighbour_row * self.columns + neighbour_column, 0)
+                partner_start = start[neighbour]
+                partner_count = np.where(valid, count[neighbour], 0)
+
+            i, j = self._expand(position, partner_start, partner_count)
+            first.append(order[i])
+            second.append(order[j])
+
+        return np.concatenate(first), np.concatenate(second)
+
+    def pairs_within(self, x: np.ndarray, y: np.ndarray, distance: float) -> tuple:
+        '''
+            Finds every pair of dots that are at most distance apart. distance must not be larger than cell_size.
+
+            Returns a tuple of arrays (i, j, pair_distance)
+        '''
+        i, j = self.candidate_pairs(x, y)
+        return close_pairs(x, y, i, j, distance)
+
+    @staticmethod
+    def _expand(position: np.ndarray, partner_start: np.ndarray, partner_count: np.ndarray) -> tuple:
+        '''
+            Protected method to turn "dot p pairs with partner_count[p] dots starting at partner_start[p]" into
+            two flat arrays of sorted positions, without a Python loop over the dots
+        '''
+        partner_count = np.maximum(partner_count, 0)
+        total = int(partner_count.sum())
+        first = np.repeat(position, partner_count)
+        # the offset of each pair inside the group of its first dot
+        group_start = np.repeat(np.cumsum(partner_count) - partner_count, partner_count)
+        second = np.repeat(partner_start, partner_count) + (np.arange(total) - group_start)
+        return first, second
@@ -0,0 +1,266 @@
+'''
+    Runs the simulation headless for every combination of a grid of scenario values and a list of seeds, over a pool
+    of worker processes, and prints one table of the results averaged over the seeds, e.g.
+
+        poetry run python src/sweep.py --param force.neutral_distance 50 75 --param force.max_distance 100 150 \
+            --param force.coefficient 0.01 0.02 --seeds 1 2 3 --steps 1000 --backend numba --output sweep.csv
+
+    The values are named by their section and key in a scenario file (see config.py), e.g. dots.count or
+    force.max_distance, and replace the ones of --scenario. Every scenario is checked before any run starts.
+
+    The worker processes live for the whole sweep: each one imports the simulation and compiles the numba functions
+    (or loads them from the numba cache) once, before its first run, so the steps per second of every run only
+    measure the physics. The processes are spawned, like the PhysicsWorker, so numba's threads are never forked.
+'''
+# TODO: this should not be needed in Python >= 3.10
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from config import DEFAULT_SCENARIO, Scenario, load_scenario
+from simulation import Simulation, create_simulation
+from sim import run
+import numpy as np
+import argparse
+import csv
+import dataclasses
+import itertools
+import json
+import math
+import multiprocessing
+import os
+
+# the metrics of a run, with the heading of their column in the table
+METRICS = {
+    'mean_speed': 'mean speed',
+    'clusters': 'clusters',
+    'active_pairs': 'active pairs',
+    'steps_per_second': 'steps/sec',
+}
+
+
+def parameter_grid(grid: dict) -> list:
+    '''
+        Returns every combination of the values of grid (a dictionary of lists of values by name), as dictionaries
+        of one value by name, in the order of itertools.product
+    '''
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def scenario_with(scenario: Scenario, parameters: dict) -> Scenario:
+    '''
+        Returns a copy of scenario with the given values, named 'section.key' (e.g. 'force.max_distance'). The
+        changed sections are checked again, so an invalid value raises a ValueError
+    '''
+    changes = {}
+    for name, value in parameters.items():
+        section, _, key = name.partition('.')
+        config = getattr(scenario, section, None)
+        if not dataclasses.is_dataclass(config) or key not in {field.name for field in dataclasses.fields(config)
+                                                                if field.init}:
+            raise ValueError(f'Unknown scenario value {name}, expected section.key (e.g. force.max_distance)')
+        changes.setdefault(section, {})[key] = value
+    return dataclasses.replace(scenario, **{section: dataclasses.replace(getattr(scenario, section), **values)
+                                            for section, values in changes.items()})
+
+
+def count_clusters(count: int, i: np.ndarray, j: np.ndarray) -> int:
+    '''
+        Returns the number of groups of dots connected by the pairs (i[k], j[k]), a dot without any pair being a
+        group of its own
+
+        count: the number of dots
+    '''
+    # every dot points to the smallest dot of its group found so far, the pairs merge the groups of their dots
+    # until nothing changes
+    labels = np.arange(count)
+    while True:
+        first, second = labels[i], labels[j]
+        smallest = np.minimum(first, second)
+        merged = labels.copy()
+        np.minimum.at(merged, first, smallest)
+        np.minimum.at(merged, second, smallest)
+        # follows the pointers up to the smallest dot of each group
+        while True:
+            followed = merged[merged]
+            if np.array_equal(followed, merged):
+                break
+            merged = followed
+        if np.array_equal(merged, labels):
+            return int(np.count_nonzero(labels == np.arange(count)))
+        labels = merged
+
+
+def measure(simulation: Simulation) -> dict:
+    '''
+        Returns the mean speed of the dots, the number of clusters (the groups of dots connected by pairs within
+        max_distance of the force law, or within the length of the lines for a long-range force law) and the number
+        of active pairs of the last step
+    '''
+    store = simulation.store
+    distance = simulation.dot_force_calculator.max_distance
+    if math.isinf(distance):
+        distance = simulation.grid.cell_size
+    i, j, _ = simulation.grid.pairs_within(store.x, store.y, distance)
+    return {
+        'mean_speed': float(np.mean(np.hypot(store.vx, store.vy))) if store.count else 0.0,
+        'clusters': count_clusters(store.count, i, j),
+        'active_pairs': simulation.active_pairs(),
+    }
+
+
+def run_one(scenario: Scenario, seed: int, steps: int, delta_time: float, width: float, height: float,
+            options: dict) -> dict:
+    '''
+        Runs the simulation of a scenario and seed for steps steps of delta_time
+
+        options: the other arguments of create_simulation (e.g. force_engine or physics_backend)
+
+        Returns the metrics of the run, see METRICS
+    '''
+    simulation = create_simulation(width, height, seed=seed, scenario=scenario, **options)
+    steps_per_second = run(simulation, steps, delta_time)
+    return dict(measure(simulation), steps_per_second=steps_per_second)
+
+
+def _warm_up(scenario: Scenario, options: dict):
+    '''
+        Protected function, the initializer of the worker processes: one step of a few dots compiles the numba
+        functions of the backend (or loads them from the cache), so the first run is not slower than the others
+
+        scenario: a scenario of the sweep, so the force law fits the options (e.g. a long-range law for barnes-hut)
+    '''
+    create_simulation(200, 200, dot_count=10, seed=0, scenario=scenario, **options).step(1/120)
+
+
+def run_sweep(grid: dict, seeds: list, steps: int = 1000, delta_time: float = 1/120, width: float = 1920,
+              height: float = 1080, scenario: Scenario = DEFAULT_SCENARIO, processes: int = None,
+              options: dict = None) -> list:
+    '''
+        Runs every combination of the values of grid (see parameter_grid and scenario_with) with every seed
+
+        processes: the number of worker processes, defaults to the number of cores. With 1 process, the runs are
+            done in this process
+        options: the other arguments of create_simulation, the same for every run
+
+        Returns one dictionary per run with the values of the run, its seed and its metrics
+    '''
+    options = dict(options or {})
+    # every scenario is checked before the first run, so a bad value does not stop the sweep halfway
+    combinations = [(parameters, scenario_with(scenario, parameters)) for parameters in parameter_grid(grid)]
+    runs = [(parameters, combination_scenario, seed) for parameters, combination_scenario in combinations
+            for seed in seeds]
+
+    def arguments(combination_scenario: Scenario, seed: int) -> tuple:
+        return combination_scenario, seed, steps, delta_time, width, height, options
+
+    # the first scenario of the sweep, not the default one, whose force law may not fit the options
+    warm_up_scenario = combinations[0][1] if combinations else scenario
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        _warm_up(warm_up_scenario, options)
+        metrics = [run_one(*arguments(combination_scenario, seed)) for _, combination_scenario, seed in runs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(processes, len(runs)) or 1,
+                                 mp_context=multiprocessing.get_context('spawn'), initializer=_warm_up,
+                                 initargs=(warm_up_scenario, options)) as pool:
+            futures = [pool.submit(run_one, *arguments(combination_scenario, seed))
+                       for _, combination_scenario, seed in runs]
+            metrics = [future.result() for future in futures]
+
+    return [dict(parameters, seed=seed, **run_metrics) for (parameters, _, seed), run_metrics in zip(runs, metrics)]
+
+
+def summarize(results: list, names: list) -> list:
+    '''
+        Averages the metrics of the runs of run_sweep which have the same values of names, over their seeds
+
+        Returns one dictionary per combination of values, in the order of the runs, with the number of runs
+    '''
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(result[name] for name in names), []).append(result)
+
+    rows = []
+    for values, group in groups.items():
+        row = dict(zip(names, values), runs=len(group))
+        for metric in METRICS:
+            row[metric] = sum(result[metric] for result in group) / len(group)
+        rows.append(row)
+    return rows
+
+
+def format_table(rows: list, names: list) -> str:
+    '''
+        Returns the rows of summarize as an aligned text table
+    '''
+    headings = names + ['runs'] + list(METRICS.values())
+    cells = [[f'{row[name]:g}' if isinstance(row[name], float) else str(row[name]) for name in names] +
+             [str(row['runs']), f'{row["mean_speed"]:.2f}', f'{row["clusters"]:.1f}', f'{row["active_pairs"]:.0f}',
+              f'{row["steps_per_second"]:.1f}'] for row in rows]
+    widths = [max(len(line[column]) for line in [headings] + cells) for column in range(len(headings))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(line, widths)) for line in [headings] + cells)
+
+
+def write_results(path: str, results: list):
+    '''
+        Writes the runs of run_sweep to a JSON file, or to a CSV file for any other extension
+    '''
+    if path.endswith('.json'):
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+        return
+
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(results[0]) if results else [])
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _value(text: str):
+    '''
+        Protected function to read a value of --param as an int when it is one, else as a float or a string
+    '''
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def main(arguments: list = None):
+    parser = argparse.ArgumentParser(description='Runs the simulation for a grid of scenario values and seeds')
+    parser.add_argument('--param', nargs='+', action='append', default=[], metavar=('NAME', 'VALUE'),
+                        help='a scenario value and the values it takes, e.g. --param force.max_distance 100 150')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0], help='seeds of the random dots')
+    parser.add_argument('--scenario', default=None, help='TOML file of the values which are not swept')
+    parser.add_argument('--steps', type=int, default=1000, help='number of steps of each run')
+    parser.add_argument('--dt', type=float, default=1/120, help='time step of the simulation')
+    parser.add_argument('--width', type=float, default=1920, help='width of the area of the dots')
+    parser.add_argument('--height', type=float, default=1080, help='height of the area of the dots')
+    parser.add_argument('--force-engine', choices=['numpy', 'lines', 'barnes-hut'], default='numpy',
+                        help='how the forces between the dots are applied')
+    parser.add_argument('--backend', choices=['python', 'numba'], default='python',
+                        help='runs the physics step in Python/NumPy or with numba (each process is one core already)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes, defaults to the number of cores')
+    parser.add_argument('--output', default=None, help='CSV or JSON file to which every run is written')
+    args = parser.parse_args(arguments)
+
+    for param in args.param:
+        if len(param) < 2:
+            parser.error(f'--param {param[0]} needs at least one value')
+    grid = {param[0]: [_value(text) for text in param[1:]] for param in args.param}
+    scenario = load_scenario(args.scenario) if args.scenario is not None else DEFAULT_SCENARIO
+
+    results = run_sweep(grid, args.seeds, steps=args.steps, delta_time=args.dt, width=args.width,
+                        height=args.height, scenario=scenario, processes=args.processes,
+                        options={'force_engine': args.force_engine, 'physics_backend': args.backend})
+    print(format_table(summarize(results, list(grid)), list(grid)))
+    if args.output is not None:
+        write_results(args.output, results)
+        print(f'{len(results)} runs written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
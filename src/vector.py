@@ -5,6 +5,9 @@ import math
 
 
 class TwoDimensionalVector:
+    # no __dict__ per vector, which makes them smaller and their attributes faster
+    __slots__ = ('x', 'y')
+
     def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
@@ -17,22 +20,57 @@ class TwoDimensionalVector:
         return TwoDimensionalVector(self.x - other.x, self.y - other.y)
 
     def __truediv__(self, other: float) -> TwoDimensionalVector:
-        return self * (1 / other)
+        scale = 1 / other
+        return TwoDimensionalVector(self.x * scale, self.y * scale)
 
     # This is needed for TwoDimensionalVector * float
     def __mul__(self, other: Union[TwoDimensionalVector, float]) -> TwoDimensionalVector:
         if isinstance(other, TwoDimensionalVector):
             return TwoDimensionalVector(self.x * other.x, self.y * other.y)
         else:
-            return self * TwoDimensionalVector(other, other)
+            return TwoDimensionalVector(self.x * other, self.y * other)
 
     # This is needed for float * TwoDimensionalVector
     def __rmul__(self, other: float) -> TwoDimensionalVector:
         return self * other
 
+    # The in-place operations change the vector instead of creating a new one
+    def __iadd__(self, other: TwoDimensionalVector) -> TwoDimensionalVector:
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other: TwoDimensionalVector) -> TwoDimensionalVector:
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, other: float) -> TwoDimensionalVector:
+        self.x *= other
+        self.y *= other
+        return self
+
+    def scale_add(self, scale: float, other: TwoDimensionalVector) -> TwoDimensionalVector:
+        '''
+            Adds scale * other to the vector in place (axpy), without creating a vector for scale * other
+
+            Returns the vector itself
+        '''
+        self.x += scale * other.x
+        self.y += scale * other.y
+        return self
+
     def distance(self, other: TwoDimensionalVector) -> float:
         return math.sqrt((self.x - other.x) ** 2 + (self.y - other.y) ** 2)
 
+    def distance_squared(self, other: TwoDimensionalVector) -> float:
+        '''
+            Same as distance ** 2, without the square root, e.g. to compare a distance to a threshold
+        '''
+        dx = self.x - other.x
+        dy = self.y - other.y
+        return dx * dx + dy * dy
+
     def __repr__(self):
         return f'TwoDimensionalVector({self.x}, {self.y})'
 
@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+import random
+from particle_store import ParticleStore
+from line import DotForceCalculator, ForceLaw, SoftenedGravity
+from force_engine import NumpyForceEngine
+from barnes_hut import QuadTree, BarnesHutForceEngine, accuracy_report
+from simulation import create_simulation
+#  Unit test the Barnes-Hut force engine
+
+def random_store(count, seed=0):
+    rng = random.Random(seed)
+    store = ParticleStore()
+    for _ in range(count):
+        store.add(rng.random() * 800, rng.random() * 600, 0.0, 0.0, 1.0)
+    return store
+
+def test_quad_tree_leaves_hold_every_dot_once():
+    store = random_store(500)
+    tree = QuadTree(store.x, store.y, leaf_size=8)
+
+    assert sorted(tree.order) == list(range(500))
+    leaf_counts = tree.end[tree.leaf] - tree.start[tree.leaf]
+    assert leaf_counts.sum() == 500
+    assert leaf_counts.max() <= 8
+    assert tree.mass[0] == 500
+    assert tree.mass_x[0] == pytest.approx(store.x.mean())
+
+def test_theta_zero_gives_the_exact_forces():
+    store = random_store(300)
+    law = SoftenedGravity(strength=2000, softening=30)
+    NumpyForceEngine(law).apply(store)
+    exact_x, exact_y = store.fx.copy(), store.fy.copy()
+    store.clear_forces()
+
+    BarnesHutForceEngine(law, theta=0).apply(store)
+
+    assert store.fx == pytest.approx(exact_x)
+    assert store.fy == pytest.approx(exact_y)
+
+def test_accuracy_report():
+    rows = accuracy_report(random_store(1000), SoftenedGravity(strength=2000, softening=30), thetas=(0.3, 1.0))
+
+    assert rows[0]['max_error'] < 0.01
+    assert rows[0]['max_error'] < rows[1]['max_error']
+    assert rows[1]['interactions'] < rows[0]['interactions'] < 1000 * 999
+
+def test_gravity_needs_a_long_range_engine():
+    simulation = create_simulation(800, 600, dot_count=50, force_engine='barnes-hut', force_law='gravity', seed=2)
+    simulation.step(1/120)
+    assert np.all(np.isfinite(simulation.store.x))
+
+    with pytest.raises(ValueError):
+        create_simulation(800, 600, dot_count=50, force_law='gravity', physics_backend='numba')
+
+def test_barnes_hut_needs_a_long_range_law_and_the_python_backend():
+    with pytest.raises(ValueError, match='long-range'):
+        create_simulation(800, 600, dot_count=50, force_engine='barnes-hut', force_law='spring')
+    with pytest.raises(ValueError, match='long-range'):
+        BarnesHutForceEngine(DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02))
+    with pytest.raises(ValueError, match='python backend'):
+        create_simulation(800, 600, dot_count=50, force_engine='barnes-hut', physics_backend='numba')
+
+def test_incomplete_force_law_cannot_be_created():
+    class Incomplete(ForceLaw):
+        def calculate(self, distance):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,27 @@
+import pytest
+from simulation import create_simulation
+from benchmark import compare, run_benchmarks, time_steps
+#  Unit test the benchmark harness
+
+def test_seed_creates_the_same_dots():
+    first = create_simulation(800, 600, dot_count=10, seed=5)
+    second = create_simulation(800, 600, dot_count=10, seed=5)
+    assert list(first.store.x) == list(second.store.x)
+    assert list(first.store.radius) == list(second.store.radius)
+
+def test_run_benchmarks():
+    results = run_benchmarks(sizes=(20,), backends=('numpy', 'lines'), steps=1, draw=False)
+    assert set(results['results']) == {'physics/numpy/20', 'physics/lines/20'}
+    assert results['meta']['seed'] == 0
+
+def test_compare_flags_slowdowns():
+    old = {'results': {'a': {'median_seconds': 1.0}, 'b': {'median_seconds': 1.0}, 'c': None}}
+    new = {'results': {'a': {'median_seconds': 1.05}, 'b': {'median_seconds': 1.5}, 'c': {'median_seconds': 1.0},
+                       'd': {'median_seconds': 1.0}}}
+    assert compare(old, new, threshold=0.1) == [('a', 1.0, 1.05, False), ('b', 1.0, 1.5, True)]
+
+def test_setup_runs_untimed_before_each_call():
+    calls = []
+    result = time_steps(lambda: calls.append('call'), steps=2, warmup=1, setup=lambda: calls.append('setup'))
+    assert calls == ['setup', 'call'] * 3
+    assert set(result) == {'median_seconds', 'min_seconds', 'mean_seconds'}
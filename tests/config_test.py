@@ -0,0 +1,35 @@
+import os
+import pytest
+from config import DEFAULT_SCENARIO, load_scenario, scenario_from_dict
+from simulation import create_simulation
+#  Unit test the scenario files
+
+SCENARIOS = os.path.join(os.path.dirname(__file__), '..', 'scenarios')
+
+def test_default_file_matches_the_defaults():
+    assert load_scenario(os.path.join(SCENARIOS, 'default.toml')) == DEFAULT_SCENARIO
+
+def test_scenario_drives_the_simulation(tmp_path):
+    path = tmp_path / 'small.toml'
+    path.write_text('[dots]\ncount = 12\nseed = 7\n\n[force]\nmax_distance = 90\n\n[environment]\nmax_speed = 20\n')
+    scenario = load_scenario(path)
+    assert (scenario.force.max_distance, scenario.environment.max_speed) == (90, 20)
+
+    simulation = create_simulation(800, 600, scenario=scenario)
+    assert (len(simulation.dots), simulation.seed) == (12, 7)
+    assert simulation.dot_force_calculator.max_distance == 90
+    assert simulation.dot_updater.max_speed == 20
+    # the arguments override the scenario
+    assert len(create_simulation(800, 600, dot_count=3, scenario=scenario).dots) == 3
+
+@pytest.mark.parametrize('data, message', [
+    ({'dots': {'count': -1}}, 'count'),
+    ({'dots': {'min_size': 10, 'max_size': 5}}, 'min_size'),
+    ({'force': {'law': 'magnetic'}}, 'law'),
+    ({'lines': {'color': [255, 255, 255]}}, 'color'),
+    ({'lines': {'cutoff': 3}}, 'Unknown key cutoff'),
+    ({'mouse': {}}, 'Unknown section'),
+])
+def test_invalid_scenarios_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        scenario_from_dict(data)
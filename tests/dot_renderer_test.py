@@ -0,0 +1,58 @@
+import ctypes
+import numpy as np
+from types import SimpleNamespace
+from dot_renderer import DotRenderer
+#  Unit test the dot renderer without a window, on fake vertex domains
+
+class FakeAttribute:
+    def __init__(self, vertices):
+        self.buffer = SimpleNamespace(data=(ctypes.c_float * (3 * vertices))())
+        self.regions = []
+
+    def get_region(self, buffer, start, count):
+        return SimpleNamespace(invalidate=lambda: self.regions.append((start, count)))
+
+class FakeDomain:
+    def __init__(self, vertices):
+        self.version = 0
+        self.attribute_names = {'translate': FakeAttribute(vertices)}
+
+    def translate(self):
+        return np.ctypeslib.as_array(self.attribute_names['translate'].buffer.data).reshape(-1, 3)
+
+def fake_dot(index, domain, start):
+    vertex_list = SimpleNamespace(domain=domain, start=start)
+    return SimpleNamespace(index=index, sprite=SimpleNamespace(_vertex_list=vertex_list))
+
+def test_sprites_are_moved_per_domain():
+    first, second = FakeDomain(16), FakeDomain(8)
+    # the sprites of the dots 0 and 2 are in order in the first domain, the sprites of the dots 1 and 3 are swapped
+    # in the second one, and the dot 4 has no sprite
+    dots = [fake_dot(0, first, 4), fake_dot(1, second, 4), fake_dot(2, first, 8), fake_dot(3, second, 0),
+            SimpleNamespace(index=4, sprite=None)]
+    renderer = DotRenderer(dots)
+    assert len(renderer._domains) == 2
+    assert renderer._domains[0].rows == slice(4, 12)
+
+    x = np.array([10.0, 11.0, 12.0, 13.0, 14.0])
+    y = -x
+    renderer.update(x, y)
+
+    translate = first.translate()
+    assert translate[4:8, 0].tolist() == [10.0] * 4 and translate[8:12, 1].tolist() == [-12.0] * 4
+    assert (translate[:4] == 0).all() and (translate[12:] == 0).all()
+    translate = second.translate()
+    assert translate[0:4, 0].tolist() == [13.0] * 4 and translate[4:8, 0].tolist() == [11.0] * 4
+    assert first.attribute_names['translate'].regions == [(4, 8)]
+    assert second.attribute_names['translate'].regions == [(0, 8)]
+
+def test_grown_domain_is_read_again():
+    domain = FakeDomain(4)
+    renderer = DotRenderer([fake_dot(0, domain, 0)])
+    renderer.update(np.array([1.0]), np.array([2.0]))
+
+    # the domain reallocates its buffers when it grows
+    domain.attribute_names['translate'] = FakeAttribute(8)
+    domain.version += 1
+    renderer.update(np.array([3.0]), np.array([4.0]))
+    assert domain.translate()[:4, :2].tolist() == [[3.0, 4.0]] * 4
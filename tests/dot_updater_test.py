@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import random
+from vector import TwoDimensionalVector
+from particle_store import ParticleStore
+from dot import Dot
+from dot_updater import EnvironmentDotUpdater
+from mouse import Mouse
+#  Unit test the bulk environment update against the update of each dot
+
+def create_store(count, seed):
+    rng = random.Random(seed)
+    store = ParticleStore()
+    dots = [Dot(TwoDimensionalVector(rng.uniform(-200, 800), rng.uniform(-200, 600)),
+                TwoDimensionalVector(rng.uniform(-80, 80), rng.uniform(-80, 80)), 1.0, sprite=None, store=store)
+            for _ in range(count)]
+    for k, dot in enumerate(dots):
+        dot.force = TwoDimensionalVector(k * 0.5, -k * 0.25)
+    return store, dots
+
+@pytest.mark.parametrize('pressed', [False, True])
+def test_update_all_matches_update(pressed):
+    updater = EnvironmentDotUpdater(600, 400)
+    mouse = Mouse()
+    mouse.pressed = pressed
+    mouse.position = TwoDimensionalVector(300.0, 200.0)
+
+    reference_store, dots = create_store(200, seed=3)
+    store, _ = create_store(200, seed=3)
+    for dot in dots:
+        updater.update(dot, mouse)
+    updater.update_all((store.x, store.y), (store.vx, store.vy), (store.fx, store.fy), mouse)
+
+    # the wrap does the same operations, the forces are added in another order
+    assert np.array_equal(store.x, reference_store.x)
+    assert np.array_equal(store.y, reference_store.y)
+    assert store.fx == pytest.approx(reference_store.fx)
+    assert store.fy == pytest.approx(reference_store.fy)
+
+def test_dot_under_the_mouse_gets_no_force():
+    store = ParticleStore()
+    store.add(300.0, 200.0, 0.0, 0.0, 1.0)
+    mouse = Mouse()
+    mouse.pressed = True
+    mouse.position = TwoDimensionalVector(300.0, 200.0)
+    EnvironmentDotUpdater(600, 400).update_all((store.x, store.y), (store.vx, store.vy), (store.fx, store.fy), mouse)
+    assert (store.fx[0], store.fy[0]) == (0.0, 0.0)
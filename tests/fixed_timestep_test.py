@@ -0,0 +1,28 @@
+import pytest
+import numpy as np
+from fixed_timestep import FixedTimestep, interpolate
+#  Unit test the fixed timestep loop
+
+def test_steps_are_fixed_whatever_the_frame_time():
+    steps = []
+    timestep = FixedTimestep(steps.append, rate=100, max_steps=5)
+
+    assert timestep.advance(0.025) == 2
+    assert timestep.alpha == pytest.approx(0.5)
+    assert timestep.advance(0.005) == 1
+    assert timestep.alpha == pytest.approx(0.0, abs=1e-9)
+    assert steps == [0.01] * 3
+
+def test_time_beyond_the_catch_up_steps_is_dropped():
+    steps = []
+    timestep = FixedTimestep(steps.append, rate=100, max_steps=3)
+
+    assert timestep.advance(1.005) == 3
+    assert 0 <= timestep.alpha < 1
+    assert timestep.advance(0.0) == 0
+
+def test_interpolation_skips_wrapped_positions():
+    previous = np.array([10.0, 990.0])
+    current = np.array([20.0, 5.0])
+
+    assert interpolate(previous, current, 0.5, 1000) == pytest.approx([15.0, 5.0])
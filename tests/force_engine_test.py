@@ -0,0 +1,39 @@
+import pytest
+import numpy as np
+import random
+from vector import TwoDimensionalVector
+from particle_store import ParticleStore
+from dot import Dot
+from line import Line, DotForceCalculator
+from spatial_grid import SpatialGrid
+from force_engine import NumpyForceEngine
+#  Unit test the NumPy force engine against the per-Line path
+
+def create_dots(store, count, seed):
+    rng = random.Random(seed)
+    return [Dot(TwoDimensionalVector(rng.random() * 600, rng.random() * 400), TwoDimensionalVector(0.0, 0.0),
+                1.0, sprite=None, store=store) for _ in range(count)]
+
+@pytest.mark.parametrize('use_grid', [False, True])
+def test_numpy_engine_matches_lines(use_grid):
+    calculator = DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02)
+
+    line_store = ParticleStore()
+    dots = create_dots(line_store, 60, seed=1)
+    for i in range(len(dots)):
+        for j in range(i + 1, len(dots)):
+            Line(dots[i], dots[j], calculator).update_state()
+
+    engine_store = ParticleStore()
+    create_dots(engine_store, 60, seed=1)
+    grid = SpatialGrid(150, -50, -50, 650, 450) if use_grid else None
+    NumpyForceEngine(calculator, grid=grid).apply(engine_store)
+
+    assert np.abs(line_store.fx).max() > 0
+    assert engine_store.fx == pytest.approx(line_store.fx)
+    assert engine_store.fy == pytest.approx(line_store.fy)
+
+def test_calculate_many_matches_calculate():
+    calculator = DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02)
+    distance = np.array([0.0, 10.0, 75.0, 150.0, 150.5, 300.0])
+    assert list(calculator.calculate_many(distance)) == [calculator.calculate(d) for d in distance]
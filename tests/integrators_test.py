@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+from particle_store import ParticleStore
+from integrators import INTEGRATORS, substeps
+from mouse import Mouse
+from simulation import create_simulation
+from profiler import FrameProfiler
+#  Unit test the integrators on a spring: force = -x
+
+def spring(store):
+    store.clear_forces()
+    store.fx -= store.x
+
+def energy_error(name, steps=1000, delta_time=0.1):
+    store = ParticleStore()
+    store.add(1.0, 0.0, 0.0, 0.0, 1.0)
+    integrator = INTEGRATORS[name]
+    for _ in range(steps):
+        spring(store)
+        integrator(store, spring, delta_time)
+    return abs(0.5 * (store.x[0] ** 2 + store.vx[0] ** 2) - 0.5)
+
+def test_higher_order_integrators_keep_the_energy():
+    errors = {name: energy_error(name) for name in INTEGRATORS}
+
+    assert errors['euler'] > 1
+    assert errors['semi-implicit'] < 0.1
+    assert errors['verlet'] < 0.01
+    assert errors['rk4'] < errors['verlet']
+
+def test_substeps_follow_the_largest_acceleration():
+    store = ParticleStore()
+    store.add(0.0, 0.0, 0.0, 0.0, 1.0)
+    store.add(0.0, 0.0, 0.0, 0.0, 1.0)
+    assert substeps(store, 0.1, 0.5, 8) == 1
+
+    store.fx[1] = 400.0
+    # a * h^2 / 2 <= 0.5 needs h <= 0.05
+    assert substeps(store, 0.1, 0.5, 8) == 2
+    assert substeps(store, 10, 0.5, 8) == 8
+
+@pytest.mark.parametrize('integrator', list(INTEGRATORS))
+def test_simulation_with_substeps(integrator):
+    mouse = Mouse()
+    simulation = create_simulation(800, 600, dot_count=30, mouse=mouse, seed=1, integrator=integrator,
+                                   max_displacement=0.1)
+    mouse.pressed = True
+    mouse.position.x, mouse.position.y = simulation.store.x[0] + 1, simulation.store.y[0]
+
+    simulation.step(1/30)
+
+    assert simulation.substeps > 1
+    assert np.all(np.isfinite(simulation.store.x))
+    assert np.all(simulation.store.fx == 0)
+
+@pytest.mark.parametrize('integrator', ['verlet', 'rk4'])
+def test_stages_do_not_wrap_the_dots(integrator):
+    simulation = create_simulation(800, 600, dot_count=10, seed=1, integrator=integrator)
+    store = simulation.store
+    # a dot leaving the window on the right, which the stages see at x > 850
+    store.x[0], store.vx[0] = 849.0, 600.0
+    stage_x = []
+    evaluate = simulation._evaluate_forces
+
+    def record_stage(stage_store):
+        stage_x.append(stage_store.x[0])
+        evaluate(stage_store)
+
+    simulation._evaluate_forces = record_stage
+    simulation.profiler = FrameProfiler()
+    simulation.step(1/60)
+
+    assert max(stage_x) > 850
+    # the dot is wrapped once, after the integration
+    assert -50 <= store.x[0] < 0
+    frame = simulation.profiler.frame
+    assert frame['integration'] >= 0 and frame['forces'] > 0
@@ -0,0 +1,55 @@
+import numpy as np
+from particle_store import ParticleStore
+from dot import Dot
+from vector import TwoDimensionalVector
+from line import DotForceCalculator
+from line_pool import LinePool, pair_index
+#  Unit test the pool of lines
+
+def create_dots(count):
+    store = ParticleStore()
+    return [Dot(TwoDimensionalVector(float(k), 0.0), TwoDimensionalVector(0.0, 0.0), 5, None, store=store)
+            for k in range(count)]
+
+def test_pair_index_follows_the_pairs_in_order():
+    i, j = np.triu_indices(5, 1)
+    assert list(pair_index(i, j, 5)) == list(range(10))
+    assert list(pair_index(j, i, 5)) == list(range(10))
+
+def test_lines_are_created_on_demand_and_reused():
+    dots = create_dots(5)
+    pool = LinePool(dots, DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02))
+
+    lines = pool.update(np.array([3, 0]), np.array([1, 2]))
+    assert [(line.start, line.end) for line in lines] == [(dots[0], dots[2]), (dots[1], dots[3])]
+    assert pool.created == 2
+
+    # the line of (0, 2) is kept, the one of (1, 3) is reused for (2, 4)
+    kept = lines[0]
+    lines = pool.update(np.array([0, 2]), np.array([2, 4]))
+    assert lines[0] is kept
+    assert (lines[1].start, lines[1].end) == (dots[2], dots[4])
+    assert pool.created == 2
+    assert len(pool) == 2
+
+    assert pool.update(np.array([], dtype=int), np.array([], dtype=int)) == []
+    assert len(pool) == 0
+
+def test_the_pair_distances_are_shared_by_the_lines():
+    dots = create_dots(3)
+    pool = LinePool(dots, DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02))
+
+    shared = pool.update(np.array([0]), np.array([2]), np.array([2.0]))[0]
+    assert shared.distance == 2.0
+    shared.update_state()
+    shared_force = (dots[0].force.x, dots[2].force.x)
+
+    # the same line without a known distance measures it itself
+    dots[0].force.x = dots[2].force.x = 0.0
+    shared.distance = None
+    shared.update_state()
+    assert (dots[0].force.x, dots[2].force.x) == shared_force
+
+    # a released line forgets the distance of its old pair
+    pool.update(np.array([], dtype=int), np.array([], dtype=int))
+    assert shared.distance is None
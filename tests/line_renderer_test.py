@@ -0,0 +1,60 @@
+import ctypes
+import numpy as np
+import pytest
+from line import AlphaTable
+from line_renderer import LineRenderer
+#  Unit test the batched line renderer without a window, on a fake vertex list
+
+class FakeVertexList:
+    def __init__(self, count):
+        self.vertices = (ctypes.c_float * (2 * count))()
+        self.colors = (ctypes.c_ubyte * (4 * count))()
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+@pytest.fixture
+def renderer(monkeypatch):
+    monkeypatch.setattr(LineRenderer, '_create_vertex_list', lambda self, count: FakeVertexList(count))
+    return LineRenderer(None, (255, 128, 0, 255), 10, 150, capacity=2)
+
+def uploaded(renderer):
+    vertices = np.ctypeslib.as_array(renderer._vertex_list.vertices).reshape(-1, LineRenderer.VERTICES, 2)
+    colors = np.ctypeslib.as_array(renderer._vertex_list.colors).reshape(-1, LineRenderer.VERTICES, 4)
+    return vertices, colors
+
+def test_alphas_match_the_alpha_table(renderer):
+    distance = np.array([0.0, 10.0, 80.0, 150.0, 200.0])
+    table = AlphaTable((255, 128, 0, 255), 10, 150)
+    assert renderer.alphas(distance).tolist() == table.colors_of(distance)[:, 3].tolist()
+
+def test_quads_of_the_lines(renderer):
+    # a horizontal line of width 2 from (0, 0) to (10, 0), and a line which is too long to be drawn
+    renderer.update(np.array([0.0, 0.0]), np.array([0.0, 0.0]), np.array([10.0, 300.0]), np.array([0.0, 0.0]),
+                    np.array([2.0, 2.0]), np.array([10.0, 300.0]))
+    vertices, colors = uploaded(renderer)
+    assert renderer.count == 1
+    assert vertices[0].tolist() == [[0, -1], [10, -1], [10, 1], [0, -1], [10, 1], [0, 1]]
+    assert (colors[0] == (255, 128, 0, 255)).all()
+    assert (vertices[1] == 0).all() and (colors[1] == 0).all()
+
+def test_capacity_grows_and_unused_slots_are_cleared(renderer):
+    count = 5
+    ones = np.ones(count)
+    first_list = renderer._vertex_list
+    renderer.update(np.zeros(count), np.arange(count, dtype=float), ones * 20, np.arange(count, dtype=float),
+                    ones, ones * 20)
+    assert first_list.deleted
+    assert renderer.capacity == 5 and renderer.count == 5
+    assert (uploaded(renderer)[1][:, :, 3] > 0).all()
+
+    # with fewer lines, the slots of the lines which are gone become empty triangles
+    renderer.update(np.zeros(2), np.zeros(2), ones[:2] * 20, np.zeros(2), ones[:2], ones[:2] * 20)
+    vertices, colors = uploaded(renderer)
+    assert renderer.count == 2 and renderer.capacity == 5
+    assert (vertices[2:] == 0).all() and (colors[2:] == 0).all()
+    assert (colors[:2, :, 3] > 0).all()
+
+    renderer.update(np.zeros(7), np.zeros(7), np.ones(7) * 20, np.zeros(7), np.ones(7), np.ones(7) * 20)
+    assert renderer.capacity == 10
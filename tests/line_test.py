@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from line import AlphaTable, LineDrawObject
+#  Unit test the colors of the lines
+
+def test_alpha_table_matches_the_scaling_of_the_lines():
+    table = AlphaTable((255, 128, 0, 255), 10, 150)
+    draw_object = LineDrawObject(None, 1, (255, 128, 0, 255), 10, 150, alpha_table=table)
+    distance = np.random.default_rng(0).uniform(0, 200, 1000)
+
+    expected = [int(255 * draw_object._scaling(d)) for d in distance]
+    colors = table.colors_of(distance)
+    assert colors[:, 3].tolist() == expected
+    assert (colors[:, :3] == (255, 128, 0)).all()
+    assert [draw_object._get_color(d) for d in distance[:20]] == [tuple(row) for row in colors[:20].tolist()]
+
+def test_alpha_table_steps_are_configurable():
+    table = AlphaTable((255, 255, 255, 255), 10, 150, steps=4)
+    assert table.alphas.tolist() == [255, 191, 127, 63, 0]
+    assert table.colors_of(np.array([0.0, 10.0, 11.0, 150.0, 300.0]))[:, 3].tolist() == [255, 255, 191, 0, 0]
+    assert table.color_of(45.0) == (255, 255, 255, 191)
+
+    with pytest.raises(ValueError):
+        AlphaTable((255, 255, 255, 255), 10, 150, steps=0)
@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+from spatial_grid import SpatialGrid
+from neighbour_list import NeighbourList
+from profiler import FrameProfiler
+from simulation import create_simulation
+#  Unit test the Verlet neighbour list against the grid
+
+def pair_set(i, j):
+    return set(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist()))
+
+def test_pairs_stay_exact_between_rebuilds():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0, 1000, 500)
+    y = rng.uniform(0, 800, 500)
+    grid = SpatialGrid(150, -50, -50, 1050, 850)
+    neighbours = NeighbourList(grid, cutoff=150, skin=20)
+
+    for _ in range(30):
+        i, j, _ = neighbours.pairs_within(x, y, 150)
+        expected_i, expected_j, _ = grid.pairs_within(x, y, 150)
+        assert pair_set(i, j) == pair_set(expected_i, expected_j)
+        x = x + rng.uniform(-1, 1, 500)
+        y = y + rng.uniform(-1, 1, 500)
+
+    # the dots move at most sqrt(2) per step, so a rebuild is needed at most every 7 steps
+    assert 1 < neighbours.rebuilds < 30
+
+def test_rebuild_only_after_moving_half_the_skin():
+    grid = SpatialGrid(150, 0, 0, 300, 300)
+    neighbours = NeighbourList(grid, cutoff=150, skin=20)
+    x = np.array([10.0, 100.0])
+    y = np.array([10.0, 10.0])
+
+    neighbours.pairs(x, y)
+    neighbours.pairs(x + 9.9, y)
+    assert neighbours.rebuilds == 1
+    neighbours.pairs(x + np.array([0.0, 10.1]), y)
+    assert neighbours.rebuilds == 2
+
+@pytest.mark.parametrize('physics_backend', ['python', 'numba'])
+def test_simulation_with_a_neighbour_list(physics_backend):
+    reference = create_simulation(800, 600, dot_count=60, seed=5, physics_backend=physics_backend)
+    simulation = create_simulation(800, 600, dot_count=60, seed=5, physics_backend=physics_backend, skin=15)
+    simulation.profiler = FrameProfiler()
+
+    for _ in range(20):
+        reference.step(1/120)
+        simulation.step(1/120)
+        simulation.profiler.end_frame()
+
+    assert simulation.store.x == pytest.approx(reference.store.x)
+    assert simulation.store.vy == pytest.approx(reference.store.vy)
+    # each frame counts the rebuilds of its step
+    rebuilds = [frame['neighbour_rebuilds'] for frame in simulation.profiler.frames]
+    assert sum(rebuilds) == simulation.neighbour_list.rebuilds >= 1
+    assert max(rebuilds) == 1
+
+def test_skin_needs_an_engine_which_uses_the_neighbour_list():
+    for force_engine, force_law in (('lines', 'spring'), ('barnes-hut', 'gravity')):
+        with pytest.raises(ValueError, match='neighbour list'):
+            create_simulation(800, 600, dot_count=10, force_engine=force_engine, force_law=force_law, skin=15)
@@ -0,0 +1,76 @@
+import pytest
+import random
+from vector import TwoDimensionalVector
+from particle_store import ParticleStore
+from dot import Dot
+from line import Line, DotForceCalculator
+from dot_updater import EnvironmentDotUpdater
+from mouse import Mouse
+from spatial_grid import SpatialGrid
+from numba_backend import NumbaPhysicsBackend, ParallelPhysicsBackend, MAX_WORKERS, NUMBA_AVAILABLE
+#  Unit test the numba backend against the Line, EnvironmentDotUpdater and Dot path
+
+def create_dots(store, count, seed):
+    rng = random.Random(seed)
+    return [Dot(TwoDimensionalVector(rng.random() * 600, rng.random() * 400),
+                TwoDimensionalVector((rng.random() - 0.5) * 150, (rng.random() - 0.5) * 150),
+                1.0, sprite=None, store=store) for _ in range(count)]
+
+def test_step_matches_reference_path():
+    calculator = DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02)
+    dot_updater = EnvironmentDotUpdater(600, 400)
+    mouse = Mouse()
+    mouse.pressed = True
+    mouse.position = TwoDimensionalVector(300.0, 200.0)
+
+    reference_store = ParticleStore()
+    dots = create_dots(reference_store, 50, seed=2)
+    lines = [Line(dots[i], dots[j], calculator) for i in range(len(dots)) for j in range(i + 1, len(dots))]
+
+    store = ParticleStore()
+    create_dots(store, 50, seed=2)
+    grid = SpatialGrid(150, -50, -50, 650, 450)
+    backend = NumbaPhysicsBackend(calculator, dot_updater, grid)
+
+    for _ in range(5):
+        for line in lines:
+            line.update_state()
+        for dot in dots:
+            dot_updater.update(dot, mouse)
+            dot.update_state(0.01)
+        backend.step(store, mouse, 0.01)
+
+    assert store.x == pytest.approx(reference_store.x)
+    assert store.y == pytest.approx(reference_store.y)
+    assert store.vx == pytest.approx(reference_store.vx)
+    assert store.vy == pytest.approx(reference_store.vy)
+
+def test_parallel_forces_match_serial_forces():
+    calculator = DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02)
+    grid = SpatialGrid(150, -50, -50, 650, 450)
+
+    serial_store = ParticleStore()
+    create_dots(serial_store, 200, seed=3)
+    NumbaPhysicsBackend(calculator, EnvironmentDotUpdater(600, 400), grid).apply_forces(serial_store)
+
+    parallel_store = ParticleStore()
+    create_dots(parallel_store, 200, seed=3)
+    backend = ParallelPhysicsBackend(calculator, EnvironmentDotUpdater(600, 400), grid,
+                                     workers=min(2, MAX_WORKERS))
+    backend.apply_forces(parallel_store)
+
+    assert parallel_store.fx == pytest.approx(serial_store.fx)
+    assert parallel_store.fy == pytest.approx(serial_store.fy)
+    assert backend.measure_speedup(parallel_store, repeats=1) > 0
+    # measuring does not change the forces
+    assert parallel_store.fx == pytest.approx(serial_store.fx)
+
+def test_parallel_workers_are_checked():
+    grid = SpatialGrid(150, -50, -50, 650, 450)
+    calculator = DotForceCalculator(neutral_distance=75, max_distance=150, force_coefficient=0.02)
+    # the workers which are reported are the ones which run
+    assert ParallelPhysicsBackend(calculator, EnvironmentDotUpdater(600, 400), grid).workers == MAX_WORKERS
+    if NUMBA_AVAILABLE:
+        for workers in (0, MAX_WORKERS + 1):
+            with pytest.raises(ValueError, match='workers'):
+                ParallelPhysicsBackend(calculator, EnvironmentDotUpdater(600, 400), grid, workers=workers)
@@ -0,0 +1,53 @@
+import pytest
+from vector import TwoDimensionalVector
+from particle_store import ParticleStore
+from dot import Dot
+#  Unit test particle store and the Dot view on top of it
+
+def test_add_grows_store():
+    store = ParticleStore(capacity=2)
+    for i in range(5):
+        assert store.add(i, 2 * i, 0.0, 0.0, 1.0) == i
+    assert len(store) == 5
+    assert list(store.x) == [0, 1, 2, 3, 4]
+    assert list(store.y) == [0, 2, 4, 6, 8]
+
+def test_dot_writes_through_to_store():
+    store = ParticleStore()
+    dot = Dot(TwoDimensionalVector(1.0, 2.0), TwoDimensionalVector(3.0, 4.0), 5.0, sprite=None, store=store)
+    dot.position.x = 10.0
+    dot.force += TwoDimensionalVector(1.0, -1.0)
+    dot.add_force(TwoDimensionalVector(1.0, -1.0))
+    assert store.x[dot.index] == 10.0
+    assert store.fx[dot.index] == 2.0
+    assert store.fy[dot.index] == -2.0
+    assert dot.radius == 5.0
+
+def test_dot_without_store():
+    dot = Dot(TwoDimensionalVector(1.0, 2.0), TwoDimensionalVector(0.0, 0.0), 5.0, sprite=None)
+    assert len(dot.store) == 1
+    assert dot.position.y == 2.0
+
+def test_integrate_matches_dot_update_state():
+    store = ParticleStore()
+    reference_store = ParticleStore()
+    dots = []
+    reference_dots = []
+    for i in range(3):
+        position = TwoDimensionalVector(i, -i)
+        velocity = TwoDimensionalVector(0.5 * i, 1.0)
+        dots.append(Dot(position, velocity, 1.0, sprite=None, store=store))
+        reference_dots.append(Dot(position, velocity, 1.0, sprite=None, store=reference_store))
+
+    for dot, reference_dot in zip(dots, reference_dots):
+        dot.add_force(TwoDimensionalVector(1.0, 2.0))
+        reference_dot.add_force(TwoDimensionalVector(1.0, 2.0))
+        reference_dot.update_state(0.1)
+    store.integrate(0.1)
+
+    for dot, reference_dot in zip(dots, reference_dots):
+        assert dot.position.x == pytest.approx(reference_dot.position.x)
+        assert dot.position.y == pytest.approx(reference_dot.position.y)
+        assert dot.velocity.x == pytest.approx(reference_dot.velocity.x)
+        assert dot.velocity.y == pytest.approx(reference_dot.velocity.y)
+        assert dot.force.x == 0.0
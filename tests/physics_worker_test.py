@@ -0,0 +1,50 @@
+import pytest
+import time
+from mouse import Mouse
+from physics_worker import PhysicsWorker, SEQUENCE
+from simulation import create_simulation
+#  Unit test the physics worker process
+
+def test_worker_publishes_the_steps_of_the_simulation():
+    worker = PhysicsWorker(800, 600, dot_count=30, rate=240, seed=3)
+    reference = create_simulation(800, 600, dot_count=30, seed=3)
+    try:
+        worker.send_mouse(Mouse())
+        worker.start(reference.store.x, reference.store.y)
+        x, _ = worker.positions()
+        assert x == pytest.approx(reference.store.x)
+
+        deadline = time.time() + 30
+        while worker.tick < 10 and time.time() < deadline:
+            time.sleep(0.01)
+        worker.stop()
+
+        for _ in range(worker.tick):
+            reference.step(1/240)
+        x, y = worker.positions()
+        assert worker.tick >= 10
+        assert x == pytest.approx(reference.store.x)
+        assert y == pytest.approx(reference.store.y)
+    finally:
+        worker.close()
+
+def test_torn_copy_shows_the_last_frame_again():
+    worker = PhysicsWorker(800, 600, dot_count=3)
+    try:
+        header, buffers = worker._header, worker._buffers
+        buffers[0] = [[1, 2, 3], [4, 5, 6]]
+        x, y = worker.positions()
+        assert list(x) == [1, 2, 3] and list(y) == [4, 5, 6]
+
+        # the worker is writing the front buffer: the copy is not kept
+        header[SEQUENCE] = 1
+        buffers[0, 0] = [7, 8, 9]
+        x, y = worker.positions()
+        assert list(x) == [1, 2, 3]
+
+        # the write is done
+        header[SEQUENCE] = 2
+        x, y = worker.positions()
+        assert list(x) == [7, 8, 9]
+    finally:
+        worker.close()
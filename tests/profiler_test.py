@@ -0,0 +1,53 @@
+import pytest
+import csv
+import json
+from profiler import FrameProfiler, NullProfiler
+from simulation import create_simulation
+#  Unit test the frame profiler
+
+def test_phases_add_up_within_a_frame():
+    profiler = FrameProfiler(history=2)
+    for _ in range(3):
+        with profiler.phase('forces'):
+            pass
+        with profiler.phase('forces'):
+            pass
+        profiler.count('active_pairs', 4)
+        profiler.end_frame()
+
+    assert len(profiler.frames) == 2
+    assert set(profiler.frames[0]) == {'forces', 'active_pairs', 'frame'}
+    assert profiler.averages()['active_pairs'] == 4
+    assert 'active_pairs: 4' in profiler.report()
+
+@pytest.mark.parametrize('file_name', ['profile.csv', 'profile.json'])
+def test_log(tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    profiler = FrameProfiler(log_path=path, log_every=2)
+    for _ in range(2):
+        with profiler.phase('integration'):
+            pass
+        profiler.end_frame()
+
+    with open(path) as file:
+        frames = json.load(file) if file_name.endswith('.json') else list(csv.DictReader(file))
+    assert len(frames) == 2
+    assert 'integration' in frames[0]
+
+def test_null_profiler():
+    profiler = NullProfiler()
+    assert profiler.phase('forces') is profiler.phase('integration')
+    with profiler.phase('forces'):
+        profiler.count('active_pairs', 1)
+    profiler.end_frame()
+
+@pytest.mark.parametrize('force_engine', ['numpy', 'lines'])
+def test_simulation_phases(force_engine):
+    simulation = create_simulation(400, 300, dot_count=30, force_engine=force_engine, seed=1)
+    simulation.profiler = FrameProfiler()
+    simulation.step(1/120)
+    simulation.profiler.end_frame()
+
+    frame = simulation.profiler.frames[-1]
+    assert {'forces', 'environment', 'integration', 'active_pairs'} <= set(frame)
+    assert frame['active_pairs'] > 0
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from simulation import create_simulation
+from recorder import TrajectoryRecorder, TrajectoryReader
+#  Unit test recording and reading trajectories
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_reader_returns_every_recorded_tick(tmp_path, compress):
+    simulation = create_simulation(800, 600, dot_count=30, seed=4)
+    recorder = TrajectoryRecorder(tmp_path / 'run', simulation.store, chunk_ticks=8, chunks=2, compress=compress,
+                                  dtype=np.float64, metadata={'width': 800})
+    expected = []
+    for _ in range(21):
+        simulation.step(0.01)
+        recorder.record(simulation.store)
+        store = simulation.store
+        expected.append((store.x.copy(), store.y.copy(), store.vx.copy(), store.vy.copy()))
+    recorder.close()
+
+    reader = TrajectoryReader(tmp_path / 'run')
+    assert len(reader) == 21
+    assert reader.metadata['width'] == 800
+    assert np.array_equal(reader.radius, simulation.store.radius)
+    # random access, across the chunks and in the last partial chunk
+    for tick in (20, 3, 8, 15, 0):
+        x, y = reader.positions(tick)
+        vx, vy = reader.velocities(tick)
+        assert np.array_equal(x, expected[tick][0]) and np.array_equal(y, expected[tick][1])
+        assert np.array_equal(vx, expected[tick][2]) and np.array_equal(vy, expected[tick][3])
+
+    with pytest.raises(IndexError):
+        reader.tick(21)
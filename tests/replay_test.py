@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from simulation import create_simulation
+from recorder import TrajectoryRecorder, TrajectoryReader
+from replay import Replay
+#  Unit test playing recordings back
+
+@pytest.fixture
+def reader(tmp_path):
+    simulation = create_simulation(800, 600, dot_count=10, seed=1)
+    recorder = TrajectoryRecorder.for_simulation(tmp_path / 'run', simulation, 0.01, chunk_ticks=4,
+                                                 dtype=np.float64)
+    for _ in range(10):
+        simulation.step(0.01)
+        recorder.record(simulation.store)
+    recorder.close()
+    return TrajectoryReader(tmp_path / 'run')
+
+def test_replay_plays_seeks_and_pauses(reader):
+    replay = Replay(reader, 900, 700, speed=2.0)
+    replay.advance(0.015)
+    assert replay.position == pytest.approx(3.0)
+    assert np.array_equal(replay.positions()[0], reader.positions(3)[0])
+
+    replay.toggle_pause()
+    replay.advance(1.0)
+    assert replay.position == pytest.approx(3.0)
+    replay.toggle_pause()
+
+    # halfway between two ticks (of different chunks)
+    replay.seek(3.5)
+    x, _ = replay.positions()
+    assert x == pytest.approx((reader.positions(3)[0] + reader.positions(4)[0]) / 2)
+
+    replay.seek(100)
+    assert replay.tick == 9
+    # the end of the recording loops back to the start
+    replay.advance(0.005)
+    assert replay.position == pytest.approx(0.0)
+
+def test_replay_snapshot_continues_the_simulation(reader):
+    snapshot = reader.snapshot(4)
+    assert snapshot.tick == 5
+    simulation = create_simulation(800, 600, snapshot=snapshot)
+    for _ in range(5):
+        simulation.step(0.01)
+    assert np.array_equal(simulation.store.x, reader.positions(9)[0])
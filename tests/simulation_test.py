@@ -0,0 +1,48 @@
+import pytest
+import random
+from simulation import create_simulation
+from sim import main
+#  Unit test the simulation without a window
+
+@pytest.mark.parametrize('physics_backend', ['python', 'numba'])
+def test_numpy_engine_and_backends_match_lines(physics_backend):
+    random.seed(4)
+    reference = create_simulation(800, 600, dot_count=40, force_engine='lines')
+    random.seed(4)
+    simulation = create_simulation(800, 600, dot_count=40, physics_backend=physics_backend)
+
+    assert simulation.lines is None
+
+    for _ in range(10):
+        reference.step(1/120)
+        simulation.step(1/120)
+
+    assert simulation.store.x == pytest.approx(reference.store.x)
+    assert simulation.store.vy == pytest.approx(reference.store.vy)
+    # only the lines of nearby dots were created
+    assert len(reference.lines) <= reference.lines.created < 40 * 39 // 2
+
+def test_headless_cli(capsys):
+    main(['--dots', '20', '--steps', '5'])
+    assert 'steps/sec' in capsys.readouterr().out
+
+def test_lines_share_the_pairs_of_the_step_with_the_drawing():
+    random.seed(5)
+    simulation = create_simulation(800, 600, dot_count=40, force_engine='lines')
+    grid = simulation.grid
+    pairs_within = grid.pairs_within
+    calls = []
+    grid.pairs_within = lambda *arguments: calls.append(arguments) or pairs_within(*arguments)
+
+    simulation.step(1/120)
+    lines = simulation.nearby_lines()
+    simulation.active_pairs()
+    # the force pass found the pairs, the drawing and the count reuse them
+    assert len(calls) == 1
+    assert all(line.distance is not None for line in lines)
+
+    # a dot which wraps around the window has other neighbours, the pairs are found again
+    simulation.store.x[0] = -1000
+    simulation.step(1/120)
+    simulation.nearby_lines()
+    assert len(calls) == 3
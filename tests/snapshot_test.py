@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from simulation import create_simulation
+from snapshot import Snapshot, load_snapshot, save_snapshot
+#  Unit test saving and restoring simulations
+
+def test_snapshot_round_trip(tmp_path):
+    simulation = create_simulation(800, 600, dot_count=20, force_law='gravity', seed=3)
+    simulation.step(0.01)
+    save_snapshot(tmp_path / 'state.npz', Snapshot.of(simulation))
+
+    snapshot = load_snapshot(tmp_path / 'state.npz')
+    assert (snapshot.seed, snapshot.tick, snapshot.width, snapshot.height) == (3, 1, 800, 600)
+    assert snapshot.force_law == 'gravity'
+    assert snapshot.force_parameters == {'strength': 2000, 'softening': 30}
+    for column in ('x', 'y', 'vx', 'vy', 'radius'):
+        assert np.array_equal(getattr(snapshot, column), getattr(simulation.store, column))
+
+@pytest.mark.parametrize('force_engine', ['numpy', 'lines'])
+def test_restored_simulation_continues_like_the_original(tmp_path, force_engine):
+    reference = create_simulation(800, 600, dot_count=40, force_engine=force_engine)
+    for _ in range(10):
+        reference.step(0.01)
+    save_snapshot(tmp_path / 'state.npz', Snapshot.of(reference))
+
+    restored = create_simulation(800, 600, force_engine=force_engine, snapshot=load_snapshot(tmp_path / 'state.npz'))
+    assert len(restored.dots) == 40
+    assert restored.seed == reference.seed
+    for _ in range(10):
+        reference.step(0.01)
+        restored.step(0.01)
+
+    assert restored.tick == 20
+    assert np.array_equal(restored.store.x, reference.store.x)
+    assert np.array_equal(restored.store.vy, reference.store.vy)
+
+def test_restored_simulation_creates_its_dots_lazily(tmp_path):
+    reference = create_simulation(800, 600, dot_count=40, seed=2)
+    save_snapshot(tmp_path / 'state.npz', Snapshot.of(reference))
+    # the random dots are only created in the store too
+    assert reference.dots.created == 0
+
+    restored = create_simulation(800, 600, snapshot=load_snapshot(tmp_path / 'state.npz'))
+    for _ in range(3):
+        restored.step(0.01)
+    # a run without a window works on the store only
+    assert restored.dots.created == 0
+
+    dot = restored.dots[5]
+    assert (dot.index, dot.position.x) == (5, restored.store.x[5])
+    assert restored.dots[5] is dot and restored.dots[-1].index == 39
+    assert restored.dots.created == 2
+    assert [dot.index for dot in restored.dots] == list(range(40))
+    with pytest.raises(IndexError):
+        restored.dots[40]
@@ -0,0 +1,42 @@
+import pytest
+import numpy as np
+from spatial_grid import SpatialGrid
+#  Unit test the spatial grid against checking all the pairs
+
+def brute_force_pairs(x, y, distance):
+    pairs = set()
+    for i in range(len(x)):
+        for j in range(i + 1, len(x)):
+            if np.hypot(x[j] - x[i], y[j] - y[i]) <= distance:
+                pairs.add((i, j))
+    return pairs
+
+def test_pairs_within_matches_brute_force():
+    rng = np.random.default_rng(0)
+    # some of the dots are outside the grid, like dots that have not been wrapped yet
+    x = rng.uniform(-80, 1080, 400)
+    y = rng.uniform(-80, 880, 400)
+    grid = SpatialGrid(150, -50, -50, 1050, 850)
+
+    i, j, distance = grid.pairs_within(x, y, 150)
+    pairs = set(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist()))
+
+    assert len(pairs) == len(i)
+    assert pairs == brute_force_pairs(x, y, 150)
+    assert distance == pytest.approx(np.hypot(x[j] - x[i], y[j] - y[i]))
+
+def test_candidate_pairs_are_unique():
+    x = np.array([0.0, 1.0, 2.0, 160.0, 320.0])
+    y = np.zeros(5)
+    grid = SpatialGrid(150, 0, 0, 450, 150)
+
+    i, j = grid.candidate_pairs(x, y)
+    pairs = sorted(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist()))
+
+    # dot 4 is two cells away from dots 0, 1 and 2
+    assert pairs == [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3), (3, 4)]
+
+def test_empty_grid():
+    grid = SpatialGrid(150, 0, 0, 300, 300)
+    i, j = grid.candidate_pairs(np.zeros(0), np.zeros(0))
+    assert len(i) == 0 and len(j) == 0
@@ -0,0 +1,44 @@
+import pytest
+from config import DEFAULT_SCENARIO
+from sweep import count_clusters, parameter_grid, run_sweep, scenario_with, summarize
+import numpy as np
+#  Unit test the parameter sweep
+
+def test_parameter_grid_and_scenarios():
+    grid = parameter_grid({'dots.count': [10, 20], 'force.max_distance': [100, 150]})
+    assert grid == [{'dots.count': 10, 'force.max_distance': 100}, {'dots.count': 10, 'force.max_distance': 150},
+                    {'dots.count': 20, 'force.max_distance': 100}, {'dots.count': 20, 'force.max_distance': 150}]
+
+    scenario = scenario_with(DEFAULT_SCENARIO, grid[1])
+    assert (scenario.dots.count, scenario.force.max_distance) == (10, 150)
+    assert scenario.lines == DEFAULT_SCENARIO.lines
+    with pytest.raises(ValueError, match='Unknown scenario value'):
+        scenario_with(DEFAULT_SCENARIO, {'max_distance': 100})
+    with pytest.raises(ValueError, match='neutral_distance'):
+        scenario_with(DEFAULT_SCENARIO, {'force.max_distance': 50})
+
+def test_count_clusters():
+    # 0-1-2 and 3-4 are connected, 5 is alone
+    assert count_clusters(6, np.array([2, 4, 0]), np.array([1, 3, 1])) == 3
+    assert count_clusters(4, np.array([], dtype=int), np.array([], dtype=int)) == 4
+
+def test_sweep_runs_in_worker_processes():
+    grid = {'dots.count': [10, 20]}
+    serial = run_sweep(grid, seeds=[1, 2], steps=5, width=400, height=300, processes=1)
+    pooled = run_sweep(grid, seeds=[1, 2], steps=5, width=400, height=300, processes=2)
+    assert [(run['dots.count'], run['seed']) for run in pooled] == [(10, 1), (10, 2), (20, 1), (20, 2)]
+    for first, second in zip(serial, pooled):
+        assert (first['mean_speed'], first['clusters']) == (second['mean_speed'], second['clusters'])
+
+    rows = summarize(pooled, ['dots.count'])
+    assert [(row['dots.count'], row['runs']) for row in rows] == [(10, 2), (20, 2)]
+    assert rows[0]['clusters'] == (pooled[0]['clusters'] + pooled[1]['clusters']) / 2
+
+def test_sweep_with_barnes_hut_and_gravity():
+    # the warm-up of the worker processes uses the swept scenario, whose long-range law barnes-hut needs
+    grid = {'force.law': ['gravity'], 'dots.count': [10]}
+    options = {'force_engine': 'barnes-hut'}
+    serial = run_sweep(grid, seeds=[1], steps=3, width=400, height=300, processes=1, options=options)
+    pooled = run_sweep(grid, seeds=[1, 2], steps=3, width=400, height=300, processes=2, options=options)
+    assert [run['seed'] for run in pooled] == [1, 2]
+    assert serial[0]['mean_speed'] == pooled[0]['mean_speed']
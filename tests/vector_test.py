@@ -1,4 +1,5 @@
 import pytest
+import timeit
 from src.vector import TwoDimensionalVector
 #  Unit test two dimensional vector
 
@@ -48,3 +49,48 @@ def test_distance():
 
 
 
+
+def test_slots():
+    vector = TwoDimensionalVector(1.0, 2.0)
+    assert not hasattr(vector, '__dict__')
+    with pytest.raises(AttributeError):
+        vector.z = 3.0
+
+def test_in_place_operations():
+    vector = TwoDimensionalVector(1.0, 2.0)
+    same = vector
+    vector += TwoDimensionalVector(1.0, 1.0)
+    vector -= TwoDimensionalVector(0.5, 0.0)
+    vector *= 2.0
+    assert vector is same
+    assert (vector.x, vector.y) == (3.0, 6.0)
+
+def test_scale_add_and_distance_squared():
+    vector = TwoDimensionalVector(1.0, 1.0)
+    assert vector.scale_add(2.0, TwoDimensionalVector(1.0, -1.0)) is vector
+    assert (vector.x, vector.y) == (3.0, -1.0)
+    assert vector.distance_squared(TwoDimensionalVector(0.0, 3.0)) == 25.0
+
+#  Micro-benchmarks: the in-place operations must be faster than the ones creating vectors. They compare wall-clock
+#  times, so they only run when selected with pytest -m benchmark
+
+def best_time(statement, setup):
+    return min(timeit.repeat(statement, setup, number=20000, repeat=5, globals=globals()))
+
+@pytest.mark.benchmark
+def test_scale_add_is_faster_than_creating_vectors():
+    setup = ('force = TwoDimensionalVector(0.0, 0.0); a = TwoDimensionalVector(1.0, 2.0); '
+             'b = TwoDimensionalVector(3.0, 5.0)')
+    allocating = best_time('force = force + 0.5 * (b - a) / 2.0', setup)
+    in_place = best_time('force.scale_add(0.25, b); force.scale_add(-0.25, a)', setup)
+    assert in_place < allocating
+
+@pytest.mark.benchmark
+def test_in_place_add_is_faster_than_add():
+    setup = 'force = TwoDimensionalVector(0.0, 0.0); a = TwoDimensionalVector(1.0, 2.0)'
+    assert best_time('force += a', setup) < best_time('force = force + a', setup)
+
+@pytest.mark.benchmark
+def test_distance_squared_is_faster_than_distance():
+    setup = 'a = TwoDimensionalVector(1.0, 2.0); b = TwoDimensionalVector(3.0, 5.0)'
+    assert best_time('a.distance_squared(b) > 100.0', setup) < best_time('a.distance(b) > 10.0', setup)